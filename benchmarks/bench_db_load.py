@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Compare the row-by-row and bulk paths for loading scores into SQLite.
+
+The scores of every saved season page in the given directory are parsed,
+repeated until the frame holds ``--rows`` matches and loaded into a fresh
+database file with both paths:
+
+* ``iterrows``: a tuple per ``DataFrame.iterrows()`` row turned into a dict
+  per row, as ``sqla.CopyToTable`` did with the old ``rows`` methods.
+* ``bulk``: :func:`gamblor.db.bulk_insert` on the column arrays.
+
+Example:
+    $ python benchmarks/bench_db_load.py pages/ --rows 100000
+
+"""
+import argparse
+import glob
+import itertools
+import os
+import tempfile
+import sys
+import time
+
+import pandas as pd
+import sqlalchemy
+
+# Run from a checkout without installing the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gamblor import BULK_CHUNK_SIZE, LUIGI_SCORES_TABLE_COLUMNS, SCORES_TABLE_COLUMNS
+from gamblor.data_collection import SeasonParse
+from gamblor.db import bulk_insert
+
+def scores_frame(pages,
+                 rows):
+    frames = []
+    for path in sorted(glob.glob(os.path.join(pages, "*.html"))):
+        year = int(os.path.splitext(os.path.basename(path))[0])
+        with open(path, "rb") as page:
+            parse = SeasonParse(year, page.read())
+        frames.extend(parse.round_scores(rnd) for rnd in parse.rounds)
+
+    scores_df = pd.concat(frames, ignore_index=True)
+    scores_df["GameTime"] = scores_df["GameTime"].dt.strftime("%Y-%m-%d %H:%M")
+    scores_df["HomeTeam"] = scores_df["HomeTeam"].cat.codes
+    scores_df["AwayTeam"] = scores_df["AwayTeam"].cat.codes
+    repeats = -(-rows // len(scores_df))
+    return pd.concat([scores_df] * repeats, ignore_index=True).iloc[:rows][SCORES_TABLE_COLUMNS]
+
+def iterrows_load(conn,
+                  table,
+                  scores_df):
+    scores_df = scores_df.astype(object).where(scores_df.notna(), None)
+    keys = ["_" + column.key for column in table.columns]
+    rows = ((None,) + tuple(match[column] for column in SCORES_TABLE_COLUMNS)
+            for _, match in scores_df.iterrows())
+    bound = dict((column, sqlalchemy.bindparam("_" + column.key)) for column in table.columns)
+    insert = table.insert().values(bound)
+
+    chunk = [dict(zip(keys, row)) for row in itertools.islice(rows, BULK_CHUNK_SIZE)]
+    while chunk:
+        conn.execute(insert, chunk)
+        chunk = [dict(zip(keys, row)) for row in itertools.islice(rows, BULK_CHUNK_SIZE)]
+
+def bulk_load(conn,
+              table,
+              scores_df):
+    bulk_insert(conn, table, scores_df)
+
+LOADERS = {"iterrows": iterrows_load,
+           "bulk": bulk_load}
+
+def time_loader(loader,
+                scores_df,
+                repeat):
+    best = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            engine = sqlalchemy.create_engine("sqlite:///" + os.path.join(tmp_dir, "stats.db"))
+            metadata = sqlalchemy.MetaData()
+            table = sqlalchemy.Table("Scores", metadata,
+                                     *[sqlalchemy.Column(*args, **kwargs)
+                                       for args, kwargs in LUIGI_SCORES_TABLE_COLUMNS])
+            metadata.create_all(engine)
+
+            start = time.perf_counter()
+            with engine.begin() as conn:
+                loader(conn, table, scores_df)
+            elapsed = time.perf_counter() - start
+
+            with engine.connect() as conn:
+                count = conn.execute(sqlalchemy.text("SELECT COUNT(*) FROM Scores")).scalar()
+            engine.dispose()
+
+        assert count == len(scores_df)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main(args):
+    scores_df = scores_frame(args.pages,
+                             args.rows)
+    print("{:<10}{:>12}{:>14}".format("path", "time (s)", "rows/sec"))
+    for name, loader in LOADERS.items():
+        elapsed = time_loader(loader,
+                              scores_df,
+                              args.repeat)
+        print("{:<10}{:>12.3f}{:>14,.0f}".format(name, elapsed, len(scores_df) / elapsed))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scores table loading benchmark.")
+    parser.add_argument("pages",
+                        type=str,
+                        help="Directory of saved season pages named <year>.html.")
+    parser.add_argument("--rows", "-n",
+                        type=int,
+                        default=50000,
+                        help="Number of matches to load.")
+    parser.add_argument("--repeat", "-r",
+                        type=int,
+                        default=3,
+                        help="Number of timed loads per path.")
+
+    main(parser.parse_args())
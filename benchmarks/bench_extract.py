@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Compare season page parsing engines on saved AFL Tables pages.
+
+Each page in the given directory must be named after its season, e.g.
+``2015.html``. Every page is parsed with both :class:`SeasonParse` engines,
+the resulting frames are checked against each other and the best of
+``--repeat`` timings is reported.
+
+Example:
+    $ python benchmarks/bench_extract.py pages/ --repeat 5
+
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+# Run from a checkout without installing the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gamblor.data_collection import SeasonParse
+
+ENGINES = ["read_html", "lxml"]
+
+def time_engine(year,
+                content,
+                engine,
+                repeat):
+    best = None
+    parse = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse = SeasonParse(year, content, engine=engine)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, parse
+
+def same_rows(left,
+              right):
+    if sorted(left) != sorted(right):
+        return False
+    for rnd in left:
+        columns = list(left[rnd].columns)
+        if _records(left[rnd][columns]) != _records(right[rnd][columns]):
+            return False
+    return True
+
+def _records(df):
+    # Compare values rather than dtypes, with every kind of missing as None.
+    values = df.astype(object)
+    return values.where(values.notna(), None).values.tolist()
+
+def main(args):
+    paths = sorted(glob.glob(os.path.join(args.pages, "*.html")))
+    print("{:<8}{:>14}{:>14}{:>10}{:>8}".format("season", "read_html (s)", "lxml (s)", "speedup", "same"))
+    for path in paths:
+        year = int(os.path.splitext(os.path.basename(path))[0])
+        with open(path, "rb") as page:
+            content = page.read()
+
+        timings = {}
+        parses = {}
+        for engine in ENGINES:
+            timings[engine], parses[engine] = time_engine(year,
+                                                          content,
+                                                          engine,
+                                                          args.repeat)
+
+        same = same_rows(parses["read_html"].scores, parses["lxml"].scores) and \
+               same_rows(parses["read_html"].ladders, parses["lxml"].ladders)
+        print("{:<8}{:>14.3f}{:>14.3f}{:>9.1f}x{:>8}".format(year,
+                                                           timings["read_html"],
+                                                           timings["lxml"],
+                                                           timings["read_html"] / timings["lxml"],
+                                                           str(same)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Season page parsing benchmark.")
+    parser.add_argument("pages",
+                        type=str,
+                        help="Directory of saved season pages named <year>.html.")
+    parser.add_argument("--repeat", "-r",
+                        type=int,
+                        default=3,
+                        help="Number of timed parses per engine.")
+
+    main(parser.parse_args())
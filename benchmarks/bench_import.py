@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Time importing gamblor modules in fresh interpreters.
+
+Each module is imported ``--repeat`` times, every time in a new interpreter
+started in an empty directory, and the best wall time is reported with the
+best time of the bare interpreter subtracted. The run fails when importing
+``gamblor`` itself takes longer than ``--budget`` milliseconds, when a module
+in ``ALLOWED_HEAVY`` pulls in a heavy library it is not allowed, or when an
+import leaves anything behind in the directory it was started from.
+
+The pipeline CLI needs Luigi and SQLAlchemy to declare its tasks, but the
+scraping and modelling modules, and NumPy and pandas with them, should only
+load once a task runs.
+
+Example:
+    $ python benchmarks/bench_import.py gamblor gamblor.pipeline --budget 20
+
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ["bs4", "luigi", "lxml", "numpy", "pandas", "pyarrow", "sqlalchemy"]
+
+ALLOWED_HEAVY = {"gamblor": [],
+                 "gamblor.data_collection": [],
+                 "gamblor.pipeline": ["luigi", "sqlalchemy"]}
+
+CHECK_SCRIPT = """
+import sys
+import {module}
+print(",".join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+def time_import(module,
+                repeat,
+                env):
+    best = None
+    loaded = ""
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            start = time.perf_counter()
+            output = subprocess.run([sys.executable, "-c", CHECK_SCRIPT.format(module=module,
+                                                                               heavy=HEAVY_MODULES)],
+                                    cwd=tmp_dir,
+                                    env=env,
+                                    stdout=subprocess.PIPE,
+                                    check=True).stdout
+            elapsed = time.perf_counter() - start
+            leftovers = os.listdir(tmp_dir)
+
+        loaded = output.decode().strip()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, loaded, leftovers
+
+def main(args):
+    env = dict(os.environ)
+    # Import the checkout being benchmarked from whatever directory the
+    # interpreter starts in.
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+
+    baseline, _, _ = time_import("sys",
+                                 args.repeat,
+                                 env)
+    print("{:<24}{:>12}  {}".format("module", "import (ms)", "heavy modules loaded"))
+
+    failures = []
+    for module in args.modules:
+        elapsed, loaded, leftovers = time_import(module,
+                                                 args.repeat,
+                                                 env)
+        milliseconds = (elapsed - baseline) * 1000
+        print("{:<24}{:>12.1f}  {}".format(module, milliseconds, loaded or "-"))
+
+        if module == "gamblor" and milliseconds > args.budget:
+            failures.append("importing gamblor took {:.1f} ms, over the {:.1f} ms budget".format(milliseconds,
+                                                                                                  args.budget))
+        if module in ALLOWED_HEAVY:
+            unexpected = [name for name in loaded.split(",") if name and name not in ALLOWED_HEAVY[module]]
+            if unexpected:
+                failures.append("importing {} loaded {}".format(module, ", ".join(unexpected)))
+        if leftovers:
+            failures.append("importing {} created {}".format(module, ", ".join(sorted(leftovers))))
+
+    for failure in failures:
+        print("FAIL: " + failure)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Package import time benchmark.")
+    parser.add_argument("modules",
+                        type=str,
+                        nargs="*",
+                        default=["gamblor", "gamblor.data_collection", "gamblor.pipeline"],
+                        help="Modules to import.")
+    parser.add_argument("--repeat", "-r",
+                        type=int,
+                        default=5,
+                        help="Number of timed imports per module.")
+    parser.add_argument("--budget", "-b",
+                        type=float,
+                        default=20.0,
+                        help="Most milliseconds importing gamblor may take.")
+
+    main(parser.parse_args())
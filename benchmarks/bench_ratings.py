@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Time rating a long match history with :func:`gamblor.ratings.rate_matches`.
+
+The fixtures of every saved season page in the given directory are repeated,
+one copy per season, until the history covers ``--seasons`` seasons. Each
+copy gets fresh random scores, and the whole history is rated from scratch.
+
+Example:
+    $ python benchmarks/bench_ratings.py pages/ --seasons 120
+
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Run from a checkout without installing the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gamblor.data_collection import SeasonParse
+from gamblor.db import scores_db_frame
+from gamblor.ratings import rate_matches
+
+def history_frame(pages,
+                  seasons):
+    frames = []
+    for path in sorted(glob.glob(os.path.join(pages, "*.html"))):
+        year = int(os.path.splitext(os.path.basename(path))[0])
+        with open(path, "rb") as page:
+            parse = SeasonParse(year, page.read())
+        frames.append(pd.concat([parse.round_scores(rnd) for rnd in parse.rounds],
+                                ignore_index=True))
+
+    random = np.random.default_rng(0)
+    history = []
+    for season in range(seasons):
+        season_df = scores_db_frame(frames[season % len(frames)])
+        season_df["Year"] = 1900 + season
+        season_df["GameTime"] += (season - season % len(frames)) * 365 * 24 * 60 * 60
+        season_df["HomeFinalScore"] = random.integers(30, 150, len(season_df))
+        season_df["AwayFinalScore"] = random.integers(30, 150, len(season_df))
+        history.append(season_df)
+
+    history_df = pd.concat(history, ignore_index=True)
+    history_df.insert(0, "MatchID", np.arange(1, len(history_df) + 1))
+    return history_df
+
+def main(args):
+    history_df = history_frame(args.pages,
+                               args.seasons)
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        rate_matches(history_df)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    print("{:<10}{:>10}{:>12}{:>14}".format("seasons", "matches", "time (s)", "matches/sec"))
+    print("{:<10}{:>10}{:>12.3f}{:>14,.0f}".format(args.seasons, len(history_df), best, len(history_df) / best))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Elo rating benchmark.")
+    parser.add_argument("pages",
+                        type=str,
+                        help="Directory of saved season pages named <year>.html.")
+    parser.add_argument("--seasons", "-s",
+                        type=int,
+                        default=120,
+                        help="Number of seasons in the rated history.")
+    parser.add_argument("--repeat", "-r",
+                        type=int,
+                        default=3,
+                        help="Number of timed runs.")
+
+    main(parser.parse_args())
@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+"""Offline benchmark suite over recorded AFL Tables pages and Betfair odds.
+
+``record`` saves the season pages and the Betfair workbooks of some seasons
+into a fixtures directory, each workbook trimmed to the pre-match match odds
+of those seasons::
+
+    fixtures/afl/<year>.html
+    fixtures/betfair/<path of the workbook under BETFAIR_URL>
+
+``run`` serves a fixtures directory from a local server, points
+``GAMBLOR_AFL_TABLES_URL`` and ``GAMBLOR_BETFAIR_URL`` at it, keeps all
+data in a temporary ``GAMBLOR_DATA_DIR`` and times, for every recorded
+season:
+
+* ``scrape_score_table``, ``scrape_ladder_table``: every round, from the
+  cached page with no parse kept in memory.
+* ``convert_workbook``: the season's workbook into its Parquet store.
+* ``scrape_odds_table``: every round, from the converted workbook with no
+  odds index kept in memory.
+* ``WriteScoresToDB.frame``, ``WriteLadderToDB.frame``,
+  ``WriteOddsToDB.frame``: every round's stored rows from its partition.
+* ``pipeline``: :func:`gamblor.pipeline.main` over the whole season in
+  range mode, from an empty data directory.
+
+Each case is set up afresh before every timed run and the results are
+written as JSON. ``compare`` lines up two result files, e.g. from two
+commits.
+
+A small fixture set ships in ``benchmarks/fixtures``, which ``record`` and
+``run`` use unless given another directory. It is synthetic rather than
+recorded: its pages are in the AFL Tables layout the parser reads, with
+generated results, and its workbook is trimmed to the matches on them. Its
+README says how it was made.
+
+Example:
+    Time the shipped fixtures before and after a change::
+
+        $ python benchmarks/bench_suite.py run --output before.json
+        $ python benchmarks/bench_suite.py run --output after.json
+        $ python benchmarks/bench_suite.py compare before.json after.json
+
+    Record other seasons into a directory of their own::
+
+        $ python benchmarks/bench_suite.py record fixtures/ --years 2017 2018
+        $ python benchmarks/bench_suite.py run fixtures/
+
+"""
+import argparse
+import datetime
+import functools
+import glob
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCHMARKS_DIR,
+                            "fixtures")
+
+# Run from a checkout without installing the package.
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+CASES = ["scrape_score_table", "scrape_ladder_table", "convert_workbook", "scrape_odds_table",
+         "WriteScoresToDB.frame", "WriteLadderToDB.frame", "WriteOddsToDB.frame", "pipeline"]
+
+PACKAGES = ["numpy", "pandas", "pyarrow", "sqlalchemy", "luigi", "lxml"]
+
+def trim_workbook(content,
+                  path,
+                  years,
+                  header_row=0):
+    """Save a Betfair workbook with only the pre-match match odds of `years`."""
+    import pandas as pd
+
+    raw = pd.read_excel(io.BytesIO(content),
+                        header=None)
+    columns = [str(column).lower() for column in raw.iloc[header_row]]
+    rows = raw.iloc[header_row + 1:]
+    text = rows.astype(str).agg(" ".join, axis=1)
+    keep = ((rows[columns.index("event_name")] == "Match Odds")
+            & (rows[columns.index("inplay")] == "N")
+            & text.str.contains("|".join(str(year) for year in years)))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pd.concat([raw.iloc[:header_row + 1], rows[keep]]).to_excel(path,
+                                                               header=False,
+                                                               index=False)
+
+def record(args):
+    from gamblor import BETFAIR_URL, CHROME_USER_AGENT, ODDS_URL_DICT
+    from gamblor.data_collection import season_url
+    from gamblor.fetch import Fetcher
+    from gamblor.odds import WORKBOOK_HEADER_ROWS
+
+    fetcher = Fetcher()
+    for year in args.years:
+        response = fetcher.get(season_url(year))
+        response.raise_for_status()
+        path = os.path.join(args.fixtures, "afl", "{}.html".format(year))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as page:
+            page.write(response.content)
+        print("recorded", path)
+
+    for url in sorted(set(ODDS_URL_DICT[year] for year in args.years if year in ODDS_URL_DICT)):
+        response = fetcher.get(url,
+                               headers=CHROME_USER_AGENT)
+        response.raise_for_status()
+        path = os.path.join(args.fixtures, "betfair", *url[len(BETFAIR_URL):].split("/"))
+        trim_workbook(response.content,
+                      path,
+                      args.years,
+                      header_row=WORKBOOK_HEADER_ROWS.get(os.path.basename(path), 0))
+        print("recorded", path)
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+def serve(directory):
+    """Serve `directory` on a free local port from a background thread."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                 functools.partial(_QuietHandler, directory=directory))
+    thread = threading.Thread(target=server.serve_forever,
+                              daemon=True)
+    thread.start()
+    return server
+
+def forget_state(data_dir=None):
+    """Drop what gamblor keeps in memory, and on disk when `data_dir` is given."""
+    from luigi.contrib import sqla
+    from gamblor import data_collection, db, odds
+
+    data_collection._SEASON_PARSES.clear()
+    odds._ODDS_INDEXES.clear()
+    if data_dir is None:
+        return
+
+    db.dispose_all()
+    for connection in sqla.SQLAlchemyTarget._engine_dict.values():
+        connection.engine.dispose()
+    sqla.SQLAlchemyTarget._engine_dict.clear()
+    shutil.rmtree(data_dir, ignore_errors=True)
+    os.makedirs(data_dir)
+
+def no_sources(year):
+    return None
+
+def load_sources(year):
+    from gamblor.data_collection import prefetch_sources, season_parse
+
+    prefetch_sources([year])
+    return season_parse(year).rounds
+
+def load_season(year):
+    import luigi
+    from gamblor import pipeline
+
+    rounds = load_sources(year)
+    pipeline.create_tables()
+    tasks = [task_class(year, rnd) for rnd in rounds
+             for task_class in (pipeline.CreateScoresFile, pipeline.CreateLadderFile, pipeline.CreateOddsFile)]
+    luigi.build(tasks,
+                workers=1,
+                local_scheduler=True)
+    return rounds
+
+def scrape_rounds(scrape,
+                  year,
+                  rounds):
+    return sum(len(scrape(scrape_year=year, scrape_rnd=rnd)) for rnd in rounds)
+
+def convert(year,
+            rounds):
+    import pandas as pd
+    from gamblor import ODDS_URL_DICT
+    from gamblor.odds import convert_workbook
+
+    return len(pd.read_parquet(convert_workbook(ODDS_URL_DICT[year])))
+
+def frame_rounds(task_name,
+                 year,
+                 rounds):
+    from gamblor import pipeline
+
+    task_class = getattr(pipeline, task_name)
+    return sum(len(task_class(year, rnd).frame()) for rnd in rounds)
+
+def pipeline_season(year,
+                    rounds):
+    import sqlalchemy
+    from gamblor import LIVE_POLL_INTERVAL, STATS_CONN
+    from gamblor import pipeline
+    from gamblor.db import connect
+
+    pipeline.main(argparse.Namespace(start_date="{}-01-01".format(year),
+                                     end_date="{}-12-31".format(year),
+                                     mode="range",
+                                     workers=1,
+                                     interval=LIVE_POLL_INTERVAL,
+                                     report=None))
+    with connect(STATS_CONN) as conn:
+        return conn.execute(sqlalchemy.text("SELECT COUNT(*) FROM Scores WHERE Year = :year"),
+                            {"year": year}).scalar()
+
+def case_steps(case):
+    """Return the set up and timed steps of `case`, both called with the year."""
+    from gamblor import data_collection
+
+    if case == "scrape_score_table":
+        return load_sources, functools.partial(scrape_rounds, data_collection.scrape_score_table)
+    if case == "scrape_ladder_table":
+        return load_sources, functools.partial(scrape_rounds, data_collection.scrape_ladder_table)
+    if case == "convert_workbook":
+        return load_sources, convert
+    if case == "scrape_odds_table":
+        return load_season, functools.partial(scrape_rounds, data_collection.scrape_odds_table)
+    if case.endswith(".frame"):
+        return load_season, functools.partial(frame_rounds, case.split(".")[0])
+    if case == "pipeline":
+        return no_sources, pipeline_season
+    raise ValueError("Unknown case {}".format(case))
+
+def time_case(case,
+              year,
+              data_dir,
+              repeat):
+    from gamblor import ODDS_URL_DICT
+
+    if case in ("convert_workbook", "scrape_odds_table", "WriteOddsToDB.frame") and year not in ODDS_URL_DICT:
+        return None
+
+    setup, timed = case_steps(case)
+    runs = []
+    rows = None
+    for _ in range(repeat):
+        forget_state(data_dir)
+        rounds = setup(year)
+        forget_state()
+
+        start = time.perf_counter()
+        rows = timed(year, rounds)
+        runs.append(time.perf_counter() - start)
+
+    return {"case": case,
+            "year": year,
+            "rows": int(rows),
+            "runs": runs,
+            "best": min(runs),
+            "median": statistics.median(runs)}
+
+def environment():
+    from importlib import metadata
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"],
+                                capture_output=True,
+                                text=True,
+                                check=True,
+                                cwd=BENCHMARKS_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+
+    return {"created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "packages": versions}
+
+def run(args):
+    pages = sorted(glob.glob(os.path.join(args.fixtures, "afl", "*.html")))
+    years = args.years or [int(os.path.splitext(os.path.basename(path))[0]) for path in pages]
+    cases = args.cases or CASES
+
+    server = serve(os.path.abspath(args.fixtures))
+    address = "http://127.0.0.1:{}/".format(server.server_address[1])
+    data_dir = tempfile.mkdtemp(prefix="gamblor-bench-")
+    # Set before gamblor is first imported, as it reads them at import.
+    os.environ["GAMBLOR_AFL_TABLES_URL"] = address + "afl/"
+    os.environ["GAMBLOR_BETFAIR_URL"] = address + "betfair/"
+    os.environ["GAMBLOR_FETCH_HOST_INTERVAL"] = "0"
+    os.environ["GAMBLOR_DATA_DIR"] = data_dir
+    os.environ.pop("GAMBLOR_STATS_CONN", None)
+
+    import luigi
+    luigi.configuration.get_config().set("core", "log_level", "WARNING")
+    logging.getLogger("luigi-interface").setLevel(logging.WARNING)
+
+    results = []
+    try:
+        print("{:<24}{:>6}{:>8}{:>10}{:>10}".format("case", "year", "rows", "best (s)", "median"))
+        for case in cases:
+            for year in years:
+                result = time_case(case,
+                                   year,
+                                   data_dir,
+                                   args.repeat)
+                if result is None:
+                    continue
+                results.append(result)
+                print("{:<24}{:>6}{:>8}{:>10.3f}{:>10.3f}".format(case, year, result["rows"],
+                                                                  result["best"], result["median"]))
+    finally:
+        server.shutdown()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = environment()
+    report["repeat"] = args.repeat
+    report["results"] = results
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+def compare(args):
+    with open(args.before) as before:
+        before = json.load(before)
+    with open(args.after) as after:
+        after = json.load(after)
+
+    best = dict(((result["case"], result["year"]), result["best"]) for result in before["results"])
+    print("{:<24}{:>6}{:>12}{:>12}{:>10}".format("case", "year", "before (s)", "after (s)", "speedup"))
+    for result in after["results"]:
+        key = (result["case"], result["year"])
+        if key in best:
+            print("{:<24}{:>6}{:>12.3f}{:>12.3f}{:>9.2f}x".format(result["case"], result["year"], best[key],
+                                                                result["best"], best[key] / result["best"]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark suite.")
+    commands = parser.add_subparsers(dest="command",
+                                     required=True)
+
+    record_parser = commands.add_parser("record",
+                                        help="Record season pages and trimmed odds workbooks.")
+    record_parser.add_argument("fixtures",
+                               nargs="?",
+                               default=FIXTURES_DIR,
+                               type=str,
+                               help="Directory to record into, benchmarks/fixtures by default.")
+    record_parser.add_argument("--years", "-y",
+                               type=int,
+                               nargs="+",
+                               required=True,
+                               help="Seasons to record.")
+    record_parser.set_defaults(handler=record)
+
+    run_parser = commands.add_parser("run",
+                                     help="Time every case against recorded fixtures.")
+    run_parser.add_argument("fixtures",
+                            nargs="?",
+                            default=FIXTURES_DIR,
+                            type=str,
+                            help="Directory of recorded fixtures, benchmarks/fixtures by default.")
+    run_parser.add_argument("--years", "-y",
+                            type=int,
+                            nargs="+",
+                            help="Seasons to time, every recorded season by default.")
+    run_parser.add_argument("--cases", "-c",
+                            type=str,
+                            nargs="+",
+                            choices=CASES,
+                            help="Cases to time, all of them by default.")
+    run_parser.add_argument("--repeat", "-r",
+                            type=int,
+                            default=3,
+                            help="Number of timed runs per case and season.")
+    run_parser.add_argument("--output", "-o",
+                            type=str,
+                            help="File to write the results to as JSON.")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser("compare",
+                                         help="Compare the best timings of two result files.")
+    compare_parser.add_argument("before",
+                                type=str,
+                                help="Results of the baseline.")
+    compare_parser.add_argument("after",
+                                type=str,
+                                help="Results to compare with the baseline.")
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    args.handler(args)
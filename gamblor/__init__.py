@@ -1,34 +1,93 @@
 import os
 
-from sqlalchemy import Text, Integer, Float
-
 MIN_YEAR = 2014
 
 NUM_TEAMS = 18
 
-DATA_DIR = "./data"
-if not os.path.isdir(DATA_DIR):
-    os.mkdir(DATA_DIR)
+# Teams that qualify for the finals.
+FINALS_TEAMS = 8
+
+# Premiership points for a win, a draw and a bye. In seasons with an odd
+# number of teams, such as 2011, one team had a bye every round and it was
+# worth a win; the mid-season byes since 2012 are worth nothing.
+WIN_POINTS = 4
+DRAW_POINTS = 2
+BYE_POINTS = 0
+ODD_SEASON_BYE_POINTS = WIN_POINTS
+
+# Game type of a match cancelled without a result, whose points were shared
+# as for a draw, such as Adelaide v Geelong in round 14 of 2015.
+CANCELLED_GAME_TYPE = "NR"
+
+# Week of the finals series each final is played in.
+FINALS_WEEKS = {"Qualifying Final": 1,
+                "Elimination Final": 1,
+                "Semi Final": 2,
+                "Preliminary Final": 3,
+                "Grand Final": 4}
+
+# Data directories are only named here. Each is created by whatever first
+# writes to it, so importing the package never touches the filesystem.
+DATA_DIR = os.environ.get("GAMBLOR_DATA_DIR",
+                          "./data")
 
-SCORE_DIR = os.path.join(DATA_DIR,
+# Intermediate frames are kept as Parquet datasets partitioned by
+# Year=/Round=, one dataset per table.
+STORE_DIR = os.path.join(DATA_DIR,
+                         "store")
+
+SCORE_DIR = os.path.join(STORE_DIR,
                          "scores")
-if not os.path.isdir(SCORE_DIR):
-    os.mkdir(SCORE_DIR)
 
-LADDER_DIR = os.path.join(DATA_DIR,
+LADDER_DIR = os.path.join(STORE_DIR,
                           "ladder")
-if not os.path.isdir(LADDER_DIR):
-    os.mkdir(LADDER_DIR)
 
-ODDS_DIR = os.path.join(DATA_DIR,
-                          "odds")
-if not os.path.isdir(ODDS_DIR):
-    os.mkdir(ODDS_DIR)
+ODDS_DIR = os.path.join(STORE_DIR,
+                        "odds")
+
+FEATURES_DIR = os.path.join(STORE_DIR,
+                            "features")
+
+BETFAIR_DIR = os.path.join(DATA_DIR,
+                           "betfair")
+
+HTTP_CACHE_DIR = os.path.join(DATA_DIR,
+                              "http_cache")
+HTTP_CACHE_TTL = 24 * 60 * 60
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+FETCH_WORKERS = 4
+FETCH_HOST_INTERVAL = float(os.environ.get("GAMBLOR_FETCH_HOST_INTERVAL",
+                                            1.0))
+FETCH_RETRIES = 3
+FETCH_BACKOFF = 1.0
+FETCH_TIMEOUT = 60
+
+SIMULATIONS_DIR = os.path.join(DATA_DIR,
+                               "simulations")
+
+FIXTURES_PATH = os.path.join(DATA_DIR,
+                             "fixtures.json")
 
 STATS_DB = "stats.db"
 STATS_DB_PATH = os.path.join(DATA_DIR,
                              STATS_DB)
-STATS_CONN = "sqlite:///" + STATS_DB_PATH
+STATS_CONN = os.environ.get("GAMBLOR_STATS_CONN",
+                            "sqlite:///" + STATS_DB_PATH)
+
+LIVE_POLL_INTERVAL = 300
+FINGERPRINT_TABLE = "RoundFingerprints"
+
+SQLITE_PRAGMAS = {"journal_mode": "WAL",
+                  "synchronous": "NORMAL",
+                  "busy_timeout": 30000}
+PIPELINE_WORKERS = 1
+BULK_CHUNK_SIZE = 5000
+
+# JSON lines file the run report of :mod:`gamblor.instrument` is appended
+# to; instrumentation is off when unset.
+INSTRUMENT_PATH = os.environ.get("GAMBLOR_INSTRUMENT_PATH")
+DB_POOL_SIZE = 5
 
 SCORES_TABLE_COLUMNS = ["Year", "Round", "GameType", "Venue", "GameTime",
                         "HomeTeam", "AwayTeam", "HomeFinalScore", "AwayFinalScore",
@@ -37,63 +96,188 @@ SCORES_TABLE_COLUMNS = ["Year", "Round", "GameType", "Venue", "GameTime",
                         "AwayQ1Goals", "AwayQ1Points", "AwayQ2Goals", "AwayQ2Points",
                         "AwayQ3Goals", "AwayQ3Points", "AwayQ4Goals", "AwayQ4Points"]
 
-LUIGI_SCORES_TABLE_COLUMNS = [(["MatchID", Integer()], {"primary_key": True}),
-                              (["Year", Integer()], {}),
-                              (["Round", Integer()], {}),
-                              (["GameType", Text()], {}),
-                              (["Venue", Text()], {}),
-                              (["GameTime", Text()], {}),
-                              (["HomeTeam", Text()], {}),
-                              (["AwayTeam", Text()], {}),
-                              (["HomeFinalScore", Integer()], {}),
-                              (["AwayFinalScore", Integer()], {}),
-                              (["HomeQ1Goals", Integer()], {}),
-                              (["HomeQ1Points", Integer()], {}),
-                              (["HomeQ2Goals", Integer()], {}),
-                              (["HomeQ2Points", Integer()], {}),
-                              (["HomeQ3Goals", Integer()], {}),
-                              (["HomeQ3Points", Integer()], {}),
-                              (["HomeQ4Goals", Integer()], {}),
-                              (["HomeQ4Points", Integer()], {}),
-                              (["AwayQ1Goals", Integer()], {}),
-                              (["AwayQ1Points", Integer()], {}),
-                              (["AwayQ2Goals", Integer()], {}),
-                              (["AwayQ2Points", Integer()], {}),
-                              (["AwayQ3Goals", Integer()], {}),
-                              (["AwayQ3Points", Integer()], {}),
-                              (["AwayQ4Goals", Integer()], {}),
-                              (["AwayQ4Points", Integer()], {})]
+SCORES_TABLE_DTYPES = {"Year": "int64",
+                       "Round": "int64",
+                       "GameType": "object",
+                       "Venue": "object",
+                       "GameTime": "datetime64[ns]",
+                       "HomeTeam": "team",
+                       "AwayTeam": "team"}
+SCORES_TABLE_DTYPES.update({column: "Int64" for column in SCORES_TABLE_COLUMNS[7:]})
+
+def _luigi_scores_table_columns():
+    """Return the ``sqla.CopyToTable`` column specs of the scores table."""
+    from sqlalchemy import Integer, Text
+
+    return [(["MatchID", Integer()], {"primary_key": True}),
+            (["Year", Integer()], {}),
+            (["Round", Integer()], {}),
+            (["GameType", Text()], {}),
+            (["Venue", Text()], {}),
+            (["GameTime", Integer()], {}),
+            (["HomeTeam", Integer()], {}),
+            (["AwayTeam", Integer()], {}),
+            (["HomeFinalScore", Integer()], {}),
+            (["AwayFinalScore", Integer()], {}),
+            (["HomeQ1Goals", Integer()], {}),
+            (["HomeQ1Points", Integer()], {}),
+            (["HomeQ2Goals", Integer()], {}),
+            (["HomeQ2Points", Integer()], {}),
+            (["HomeQ3Goals", Integer()], {}),
+            (["HomeQ3Points", Integer()], {}),
+            (["HomeQ4Goals", Integer()], {}),
+            (["HomeQ4Points", Integer()], {}),
+            (["AwayQ1Goals", Integer()], {}),
+            (["AwayQ1Points", Integer()], {}),
+            (["AwayQ2Goals", Integer()], {}),
+            (["AwayQ2Points", Integer()], {}),
+            (["AwayQ3Goals", Integer()], {}),
+            (["AwayQ3Points", Integer()], {}),
+            (["AwayQ4Goals", Integer()], {}),
+            (["AwayQ4Points", Integer()], {})]
+
+SCORES_TABLE_INDEXES = {"ix_Scores_Year_Round": ["Year", "Round"]}
+
+# Columns identifying a row of each table, used to upsert changed rows.
+SCORES_TABLE_KEYS = ["Year", "Round", "HomeTeam", "AwayTeam"]
+LADDER_TABLE_KEYS = ["Year", "Round", "Team"]
+ODDS_TABLE_KEYS = ["MatchID", "Team"]
 
 LADDER_TABLE_COLUMNS = ["Year", "Round", "Team", "GamesPlayed", "Points", "Percentage"]
 
-LUIGI_LADDER_TABLE_COLUMNS = [(["Year", Integer()], {"primary_key": True}),
-                              (["Round", Integer()], {"primary_key": True}),
-                              (["Team", Text()], {"primary_key": True}),
-                              (["GamesPlayed", Integer()], {}),
-                              (["Points", Integer()], {}),
-                              (["Percentage", Float()], {})
-                             ]
-
-ODDS_TABLE_COLUMNS = ["Year", "Round", "GameTime", "Team", "Odds"]
-
-LUIGI_ODDS_TABLE_COLUMNS = [(["MatchID", Integer()], {"primary_key": True}),
-                            (["Year", Integer()], {}),
-                            (["Round", Integer()], {}),
-                            (["GameTime", Text()], {}),
-                            (["Team", Text()], {"primary_key": True}),
-                            (["Odds", Float()], {}),
-                             ]
-
-AFL_TABLES_URL = "https://afltables.com/afl/seas/"
-
-ODDS_URL_DICT = {2011: "http://www.betfair.com.au/hub/wp-content/uploads/sites/2/2018/06/AFL-2011-2016.xlsx",
-                 2012: "http://www.betfair.com.au/hub/wp-content/uploads/sites/2/2018/06/AFL-2011-2016.xlsx",
-                 2013: "http://www.betfair.com.au/hub/wp-content/uploads/sites/2/2018/06/AFL-2011-2016.xlsx",
-                 2014: "http://www.betfair.com.au/hub/wp-content/uploads/sites/2/2018/06/AFL-2011-2016.xlsx",
-                 2015: "http://www.betfair.com.au/hub/wp-content/uploads/sites/2/2018/06/AFL-2011-2016.xlsx",
-                 2016: "http://www.betfair.com.au/hub/wp-content/uploads/sites/2/2018/06/AFL-2011-2016.xlsx",
-                 2017: "http://www.betfair.com.au/hub/wp-content/uploads/sites/2/2019/03/AFL-Data-Dump-2017.xlsx",
-                 2018: "http://www.betfair.com.au/hub/wp-content/uploads/sites/2/2019/03/AFL-Data-Dump-2018-2.xlsx"
+LADDER_TABLE_DTYPES = {"Year": "int64",
+                       "Round": "int64",
+                       "Team": "team",
+                       "GamesPlayed": "int64",
+                       "Points": "int64",
+                       "Percentage": "float64"}
+
+def _luigi_ladder_table_columns():
+    """Return the ``sqla.CopyToTable`` column specs of the ladder table."""
+    from sqlalchemy import Float, Integer
+
+    return [(["Year", Integer()], {"primary_key": True}),
+            (["Round", Integer()], {"primary_key": True}),
+            (["Team", Integer()], {"primary_key": True}),
+            (["GamesPlayed", Integer()], {}),
+            (["Points", Integer()], {}),
+            (["Percentage", Float()], {})
+           ]
+
+ODDS_TABLE_COLUMNS = ["MatchID", "Year", "Round", "GameTime", "Team", "Odds"]
+
+ODDS_TABLE_DTYPES = {"MatchID": "int64",
+                     "Year": "int64",
+                     "Round": "int64",
+                     "GameTime": "datetime64[ns]",
+                     "Team": "team",
+                     "Odds": "float64"}
+
+def _luigi_odds_table_columns():
+    """Return the ``sqla.CopyToTable`` column specs of the odds table."""
+    from sqlalchemy import Float, Integer
+
+    return [(["MatchID", Integer()], {"primary_key": True}),
+            (["Year", Integer()], {}),
+            (["Round", Integer()], {}),
+            (["GameTime", Integer()], {}),
+            (["Team", Integer()], {"primary_key": True}),
+            (["Odds", Float()], {}),
+           ]
+
+# Matches each team's form features are averaged over.
+FEATURE_WINDOW = 5
+
+FEATURES_TABLE_COLUMNS = ["MatchID", "Year", "Round", "GameTime", "Team", "Opponent", "Home",
+                          "Margin", "ShotsFor", "ShotsAgainst",
+                          "Q1Margin", "Q2Margin", "Q3Margin", "Q4Margin",
+                          "FormGames", "FormMargin", "FormShotsFor", "FormShotsAgainst",
+                          "FormQ1Margin", "FormQ2Margin", "FormQ3Margin", "FormQ4Margin",
+                          "LadderPosition", "LadderPoints", "LadderPercentage", "DaysRest"]
+
+FEATURES_TABLE_DTYPES = {"MatchID": "int64",
+                         "Year": "int64",
+                         "Round": "int64",
+                         "GameTime": "datetime64[ns]",
+                         "Team": "team",
+                         "Opponent": "team",
+                         "Home": "bool",
+                         "FormGames": "int64",
+                         "LadderPosition": "Int64",
+                         "LadderPoints": "Int64"}
+FEATURES_TABLE_DTYPES.update({column: "Int64" for column in FEATURES_TABLE_COLUMNS[7:14]})
+FEATURES_TABLE_DTYPES.update({column: "float64" for column in FEATURES_TABLE_COLUMNS[15:22] + ["LadderPercentage", "DaysRest"]})
+
+# Elo ratings: starting rating, update step, rating points of home advantage
+# for a team that has played all of its matches at the venue against one that
+# never has, and the share of each rating's distance from the mean given up
+# between seasons.
+ELO_INITIAL = 1500.0
+ELO_K = 20.0
+ELO_HOME_ADVANTAGE = 60.0
+ELO_SEASON_REVERT = 0.25
+
+RATINGS_TABLE_COLUMNS = ["MatchID", "Year", "Round", "HomeRating", "AwayRating", "HomeAdvantage",
+                         "HomeWinProbability", "HomeRatingAfter", "AwayRatingAfter"]
+
+def _luigi_ratings_table_columns():
+    """Return the ``sqla.CopyToTable`` column specs of the ratings table."""
+    from sqlalchemy import Float, Integer
+
+    return [(["MatchID", Integer()], {"primary_key": True}),
+            (["Year", Integer()], {}),
+            (["Round", Integer()], {}),
+            (["HomeRating", Float()], {}),
+            (["AwayRating", Float()], {}),
+            (["HomeAdvantage", Float()], {}),
+            (["HomeWinProbability", Float()], {}),
+            (["HomeRatingAfter", Float()], {}),
+            (["AwayRatingAfter", Float()], {})]
+
+RATINGS_TABLE_INDEXES = {"ix_Ratings_Year_Round": ["Year", "Round"]}
+
+RATINGS_TABLE_KEYS = ["MatchID"]
+
+# Season simulations: spread of the margin around its expected value, mean
+# and spread of the two teams' combined score, and how the simulations are
+# split into independently seeded chunks.
+SIMULATION_MARGIN_SD = 38.0
+SIMULATION_TOTAL_MEAN = 170.0
+SIMULATION_TOTAL_SD = 28.0
+SIMULATIONS = 100000
+SIMULATION_CHUNK = 10000
+SIMULATION_SEED = 0
+
+# Source sites can be pointed elsewhere, e.g. at a local server holding
+# recorded pages, through the environment.
+AFL_TABLES_URL = os.environ.get("GAMBLOR_AFL_TABLES_URL",
+                                "https://afltables.com/afl/seas/")
+
+BETFAIR_URL = os.environ.get("GAMBLOR_BETFAIR_URL",
+                             "http://www.betfair.com.au/hub/wp-content/uploads/sites/2/")
+
+ODDS_URL_DICT = {2011: BETFAIR_URL + "2018/06/AFL-2011-2016.xlsx",
+                 2012: BETFAIR_URL + "2018/06/AFL-2011-2016.xlsx",
+                 2013: BETFAIR_URL + "2018/06/AFL-2011-2016.xlsx",
+                 2014: BETFAIR_URL + "2018/06/AFL-2011-2016.xlsx",
+                 2015: BETFAIR_URL + "2018/06/AFL-2011-2016.xlsx",
+                 2016: BETFAIR_URL + "2018/06/AFL-2011-2016.xlsx",
+                 2017: BETFAIR_URL + "2019/03/AFL-Data-Dump-2017.xlsx",
+                 2018: BETFAIR_URL + "2019/03/AFL-Data-Dump-2018-2.xlsx"
                 }
 
 CHROME_USER_AGENT = {'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/56.0.2924.76 Safari/537.36'} 
+
+# Column specs holding SQLAlchemy types are built on first access, so only
+# the modules that use them pay for importing SQLAlchemy.
+_LAZY_ATTRIBUTES = {"LUIGI_SCORES_TABLE_COLUMNS": _luigi_scores_table_columns,
+                    "LUIGI_LADDER_TABLE_COLUMNS": _luigi_ladder_table_columns,
+                    "LUIGI_ODDS_TABLE_COLUMNS": _luigi_odds_table_columns,
+                    "LUIGI_RATINGS_TABLE_COLUMNS": _luigi_ratings_table_columns}
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = _LAZY_ATTRIBUTES[name]()
+    globals()[name] = value
+    return value
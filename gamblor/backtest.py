@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""Walk-forward betting backtests against the stored Betfair prices.
+
+Seasons are replayed a round at a time. Before each round every strategy
+sizes its bets from its bankroll after the previous round, using only the
+model's probabilities and the prices of the round's matches, so no result
+is known before its round is settled. By default the model is the Elo
+win probability stored in ``Ratings``, which is computed from earlier
+matches only.
+
+Each match is bet on the side with the larger expected return, and only if
+that return is above the strategy's minimum edge. Strategies are rows of a
+grid:
+
+* ``"flat"``: stake `Fraction` of the starting bankroll on every bet.
+* ``"kelly"``: stake `Fraction` of the Kelly stake, a share of the
+  current bankroll, so ``Fraction=1`` is full Kelly and smaller values are
+  fractional Kelly.
+
+When a round's stakes add up to more than the bankroll they are scaled
+down to it. A backed side loses on a draw, as Betfair's AFL Match Odds
+markets settle a draw on their own Draw selection; the half win a draw
+counts as in ``HomeWin`` is only used for calibration. Every strategy and
+match of a round is settled with one set of array operations, so the cost
+of a backtest grows with the number of rounds rather than with strategies
+times matches.
+
+Example:
+    Compare a few thousand strategies over the stored seasons::
+
+        matches_df = load_matches(range(2011, 2019))
+        strategies_df = strategy_grid(kelly_fractions=np.linspace(0.05, 1, 20),
+                                      flat_stakes=np.linspace(0.005, 0.05, 10),
+                                      min_edges=np.linspace(0, 0.2, 100))
+        report = backtest(matches_df, strategies_df)
+        report.strategies.sort_values("ROI").tail()
+
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from sqlalchemy import text
+
+from gamblor import STATS_CONN
+from gamblor.db import connect
+
+BacktestReport = namedtuple("BacktestReport", ["strategies", "bankrolls", "calibration", "scores"])
+
+STRATEGY_KINDS = ["flat", "kelly"]
+
+def load_matches(years,
+                 conn_info=STATS_CONN):
+    """Read every priced match of `years` with its result and rating.
+
+    Args:
+        years (iterable of int): Seasons to read.
+        conn_info (str): String containing the statistics database connection info.
+
+    Returns:
+        DataFrame: One row per match with ``MatchID``, ``Year``, ``Round``,
+        ``GameTime``, ``HomeOdds``, ``AwayOdds``, ``HomeWin`` (1 for a home
+        win, 0.5 for a draw and 0 for a loss) and the Elo
+        ``HomeWinProbability``, in playing order.
+
+    """
+    years = sorted(set(years))
+    with connect(conn_info) as conn:
+        matches_df = pd.read_sql_query(text("""SELECT Scores.MatchID, Scores.Year, Scores.Round, Scores.GameTime,
+                                                      Scores.HomeFinalScore, Scores.AwayFinalScore,
+                                                      HomeOdds.Odds AS HomeOdds, AwayOdds.Odds AS AwayOdds,
+                                                      Ratings.HomeWinProbability
+                                               FROM Scores
+                                               JOIN Odds AS HomeOdds
+                                                 ON HomeOdds.MatchID = Scores.MatchID AND HomeOdds.Team = Scores.HomeTeam
+                                               JOIN Odds AS AwayOdds
+                                                 ON AwayOdds.MatchID = Scores.MatchID AND AwayOdds.Team = Scores.AwayTeam
+                                               LEFT JOIN Ratings ON Ratings.MatchID = Scores.MatchID
+                                               WHERE Scores.Year BETWEEN :first AND :last
+                                                 AND Scores.HomeFinalScore IS NOT NULL
+                                                 AND Scores.AwayFinalScore IS NOT NULL
+                                            """),
+                                       conn,
+                                       params={"first": years[0], "last": years[-1]},
+                                       parse_dates={"GameTime": "s"})
+
+    matches_df = matches_df[matches_df["Year"].isin(years)]
+    margins = matches_df["HomeFinalScore"] - matches_df["AwayFinalScore"]
+    matches_df["HomeWin"] = np.sign(margins) * 0.5 + 0.5
+    columns = ["MatchID", "Year", "Round", "GameTime", "HomeOdds", "AwayOdds", "HomeWin", "HomeWinProbability"]
+    return matches_df[columns].sort_values(["Year", "Round", "GameTime", "MatchID"],
+                                           kind="mergesort").reset_index(drop=True)
+
+def strategy_grid(kelly_fractions=(),
+                  flat_stakes=(),
+                  min_edges=(0.0,)):
+    """Return every combination of staking rule and minimum edge.
+
+    Args:
+        kelly_fractions (iterable of float): Shares of the Kelly stake.
+        flat_stakes (iterable of float): Flat stakes as shares of the
+            starting bankroll.
+        min_edges (iterable of float): Smallest expected return per unit
+            staked worth betting on.
+
+    Returns:
+        DataFrame: One strategy per row with ``Strategy``, ``Fraction`` and
+        ``MinEdge``.
+
+    """
+    kinds = (["kelly"] * len(kelly_fractions)) + (["flat"] * len(flat_stakes))
+    fractions = list(kelly_fractions) + list(flat_stakes)
+    min_edges = np.asarray(min_edges, dtype=float)
+    return pd.DataFrame({"Strategy": np.repeat(kinds, len(min_edges)),
+                         "Fraction": np.repeat(np.asarray(fractions, dtype=float), len(min_edges)),
+                         "MinEdge": np.tile(min_edges, len(fractions))})
+
+def backtest(matches_df,
+             strategies_df,
+             bankroll=1.0,
+             probabilities=None,
+             bins=10):
+    """Replay the matches round by round for every strategy.
+
+    Args:
+        matches_df (DataFrame): Matches as returned by :func:`load_matches`.
+        strategies_df (DataFrame): Strategies as returned by
+            :func:`strategy_grid`.
+        bankroll (float): Starting bankroll of every strategy.
+        probabilities (:obj:`Series`, optional): Home win probability of
+            each match indexed by ``MatchID``, replacing
+            ``HomeWinProbability``. They must only use what was known
+            before each match.
+        bins (int): Number of probability bins in the calibration table.
+
+    Returns:
+        BacktestReport: ``strategies`` is `strategies_df` with ``Bets``,
+        ``Staked``, ``Profit``, ``ROI``, ``Bankroll`` and ``MaxDrawdown``;
+        ``bankrolls`` holds each strategy's bankroll before the first round
+        and after every round, with shape ``(strategies, rounds + 1)``;
+        ``calibration`` and ``scores`` are as returned by
+        :func:`calibration`.
+
+    """
+    matches_df = matches_df.copy()
+    if probabilities is not None:
+        matches_df["HomeWinProbability"] = matches_df["MatchID"].map(probabilities)
+    matches_df = matches_df.dropna(subset=["HomeOdds", "AwayOdds", "HomeWin", "HomeWinProbability"])
+    matches_df = matches_df.sort_values(["Year", "Round", "GameTime", "MatchID"],
+                                        kind="mergesort")
+
+    # Back the side with the larger expected return.
+    home_probability = matches_df["HomeWinProbability"].to_numpy(dtype=float)
+    home_win = matches_df["HomeWin"].to_numpy(dtype=float)
+    prices = matches_df[["HomeOdds", "AwayOdds"]].to_numpy(dtype=float)
+    probabilities = np.column_stack([home_probability, 1 - home_probability])
+    outcomes = np.column_stack([home_win, 1 - home_win])
+    edges = probabilities * prices - 1
+    sides = np.argmax(edges, axis=1)
+    rows = np.arange(len(sides))
+    edge = edges[rows, sides]
+    price = prices[rows, sides]
+    # Paid out per unit staked, nothing on a draw.
+    payout = np.where(outcomes[rows, sides] == 1, price, 0)
+    kelly = np.clip(edge / (price - 1), 0, 1)
+
+    kinds = strategies_df["Strategy"].to_numpy()
+    unknown = set(kinds) - set(STRATEGY_KINDS)
+    if unknown:
+        raise ValueError("Unknown strategies: {}".format(sorted(unknown)))
+    fractions = strategies_df["Fraction"].to_numpy(dtype=float)
+    kelly_fractions = np.where(kinds == "kelly", fractions, 0)[:, None]
+    flat_stakes = np.where(kinds == "flat", fractions * bankroll, 0)[:, None]
+    min_edges = strategies_df["MinEdge"].to_numpy(dtype=float)[:, None]
+
+    keys = matches_df["Year"].to_numpy(dtype=np.int64) * 1000 + matches_df["Round"].to_numpy(dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=np.int64)
+    stops = np.r_[starts[1:], len(keys)].astype(np.int64)
+
+    bankrolls = np.empty((len(strategies_df), len(starts) + 1))
+    bankrolls[:, 0] = bankroll
+    current = bankrolls[:, 0].copy()
+    staked = np.zeros(len(strategies_df))
+    bets = np.zeros(len(strategies_df), dtype=np.int64)
+    for position, (start, stop) in enumerate(zip(starts, stops)):
+        chosen = edge[None, start:stop] > min_edges
+        stakes = np.where(chosen,
+                          kelly_fractions * kelly[None, start:stop] * current[:, None] + flat_stakes,
+                          0)
+        # Never stake more in a round than the bankroll going into it.
+        total = stakes.sum(axis=1)
+        available = np.maximum(current, 0)
+        scale = np.where(total > available, available / np.where(total > 0, total, 1), 1)
+        stakes *= scale[:, None]
+
+        current = current + (stakes * (payout[start:stop] - 1)).sum(axis=1)
+        staked += stakes.sum(axis=1)
+        bets += (stakes > 0).sum(axis=1)
+        bankrolls[:, position + 1] = current
+
+    peaks = np.maximum.accumulate(bankrolls, axis=1)
+    drawdowns = 1 - bankrolls / peaks
+
+    strategies_df = strategies_df.copy()
+    strategies_df["Bets"] = bets
+    strategies_df["Staked"] = staked
+    strategies_df["Profit"] = current - bankroll
+    strategies_df["ROI"] = np.where(staked > 0, (current - bankroll) / np.where(staked > 0, staked, 1), np.nan)
+    strategies_df["Bankroll"] = current
+    strategies_df["MaxDrawdown"] = drawdowns.max(axis=1)
+
+    calibration_df, scores_df = calibration(matches_df,
+                                            bins=bins)
+    return BacktestReport(strategies_df,
+                          bankrolls,
+                          calibration_df,
+                          scores_df)
+
+def calibration(matches_df,
+                bins=10):
+    """Compare the model's and the market's home win probabilities with results.
+
+    The market's probability is the normalised inverse of the two prices.
+
+    Args:
+        matches_df (DataFrame): Matches as returned by :func:`load_matches`.
+        bins (int): Number of equal width probability bins.
+
+    Returns:
+        tuple of DataFrame: Per ``Source`` and probability ``Bin``, the
+        ``Matches``, mean ``Predicted`` probability and ``Observed`` home
+        win rate; and per ``Source`` the ``Brier`` score and ``LogLoss``.
+
+    """
+    home_win = matches_df["HomeWin"].to_numpy(dtype=float)
+    inverse = 1 / matches_df[["HomeOdds", "AwayOdds"]].to_numpy(dtype=float)
+    sources = {"model": matches_df["HomeWinProbability"].to_numpy(dtype=float),
+               "market": inverse[:, 0] / inverse.sum(axis=1)}
+
+    tables = []
+    scores = []
+    for source, predicted in sources.items():
+        bin_index = np.clip((predicted * bins).astype(np.int64), 0, bins - 1)
+        counts = np.bincount(bin_index, minlength=bins)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            tables.append(pd.DataFrame({"Source": source,
+                                        "Bin": np.arange(bins),
+                                        "Matches": counts,
+                                        "Predicted": np.bincount(bin_index, predicted, minlength=bins) / counts,
+                                        "Observed": np.bincount(bin_index, home_win, minlength=bins) / counts}))
+
+        clipped = np.clip(predicted, 1e-12, 1 - 1e-12)
+        scores.append({"Source": source,
+                       "Brier": np.mean((predicted - home_win) ** 2),
+                       "LogLoss": -np.mean(home_win * np.log(clipped) + (1 - home_win) * np.log(1 - clipped))})
+
+    return (pd.concat(tables, ignore_index=True),
+            pd.DataFrame(scores).set_index("Source"))
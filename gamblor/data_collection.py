@@ -32,252 +32,248 @@ Todo:
    http://google.github.io/styleguide/pyguide.html
 
 """
-import sqlalchemy
-import requests
+import hashlib
 import io
+import logging
 import os
-import ntpath
 
-from datetime import date, datetime, timedelta
-from bs4 import BeautifulSoup
-from sqlalchemy.exc import OperationalError
+from datetime import datetime
 
-import pandas as pd
+from gamblor import MIN_YEAR, STATS_CONN, AFL_TABLES_URL, ODDS_URL_DICT, SCORES_TABLE_COLUMNS, CANCELLED_GAME_TYPE
+from gamblor.instrument import stage
 
-from gamblor import MIN_YEAR, NUM_TEAMS, STATS_CONN, AFL_TABLES_URL, ODDS_URL_DICT, SCORES_TABLE_COLUMNS, LADDER_TABLE_COLUMNS, ODDS_TABLE_COLUMNS, CHROME_USER_AGENT, ODDS_DIR
+# NumPy, pandas, SQLAlchemy and the parsing modules are imported where they
+# are used, as the pipeline CLI imports this module before any work starts.
 
-def round_before(search_date=date.today(),
-                 conn_info=STATS_CONN):
-    """Calculate the year and round that preceeded the input date.
+logger = logging.getLogger(__name__)
 
-    `PEP 484`_ type annotations are supported. If attribute, parameter, and
-    return types are annotated according to `PEP 484`_, they do not need to be
-    included in the docstring:
+class SeasonParse(object):
+    """Every round's match and ladder rows from a single pass over a season page.
 
-    Args:
-        search_date (datetime): Datetime object denoting the date you wish to
-            find the round immediately preceeding.
-        conn_info (str): String containing the statistics database connection info.
-
-    Returns:
-        int, int: Year and round immediately precceding the input date.
-
-    .. _PEP 484:
-        https://www.python.org/dev/peps/pep-0484/
-
-    """
-    year = None
-    rnd = None
-
-    engine = sqlalchemy.create_engine(conn_info,
-                                      echo=False)
-
-    try:
-        connection = engine.connect()
-    except Exception as e:
-        print(e)
-
-    SQL_QUERY = """SELECT Scores.Year, Scores.Round, Scores.GameTime
-                   FROM Scores
-                """.format(search_date)
-
-    try:
-        match_df = pd.read_sql_query(SQL_QUERY,
-                                     connection,
-                                     parse_dates=["GameTime"])
-        previous_matches_df = match_df[match_df["GameTime"] < pd.Timestamp(search_date)]
-
-        if len(previous_matches_df) < 1:
-            year = MIN_YEAR
-            rnd = 1
-        else:
-            last_match_idx = previous_matches_df["GameTime"].values.argmax()
-            last_match_df = previous_matches_df.iloc[last_match_idx, :]
-            year = last_match_df["Year"]
-            rnd = last_match_df["Round"]
-    except OperationalError as error:
-        year = MIN_YEAR
-        rnd = 1
-
-    return year, rnd
-
-def next_round(year,
-               rnd):
-    next_year = None
-    next_round = None
-
-    if rnd < 23:
-        next_year = year
-        next_round = rnd + 1
-    elif rnd == 23:
-        next_year = year + 1
-        next_round = 1
-
-    return next_year, next_round
-
-def next_match_date(conn_info=STATS_CONN,
-                    year=MIN_YEAR,
-                    rnd=1):
-    """Calculate the year and round that preceeded the input date.
-
-    `PEP 484`_ type annotations are supported. If attribute, parameter, and
-    return types are annotated according to `PEP 484`_, they do not need to be
-    included in the docstring:
+    The season page lists each round's matches followed by the ladder after
+    that round. Walking the table list once and keeping every round means a
+    season costs one parse, however many rounds are later asked for.
 
-    Args:
-        search_date (datetime): Datetime object denoting the date you wish to
-            find the round immediately preceeding.
-        conn_info (str): String containing the statistics database connection info.
-
-    Returns:
-        int, int: Year and round immediately precceding the input date.
+    Two engines are available. ``"lxml"`` walks the page tree directly with
+    :func:`gamblor.extract.iter_season_rows`; ``"read_html"`` is the original
+    BeautifulSoup and ``pd.read_html`` route, kept for comparison.
 
-    .. _PEP 484:
-        https://www.python.org/dev/peps/pep-0484/
+    Attributes:
+        year (int): Season the page belongs to.
+        scores (dict): Match frames keyed by round, columns as in
+            ``SCORES_TABLE_COLUMNS``.
+        ladders (dict): Ladder frames keyed by round, columns as in
+            ``LADDER_TABLE_COLUMNS``.
 
     """
-    next_match = None
-
-    engine = sqlalchemy.create_engine(conn_info,
-                                      echo=False)
-
-    try:
-        connection = engine.connect()
-    except Exception as e:
-        print(e)
-
-    SQL_QUERY = """SELECT Scores.Year, Scores.Round, Scores.GameTime
-                   FROM Scores
-                   WHERE Scores.Year < {year} OR
-                         (Scores.Round <= {rnd} AND Scores.Year = {year})
-                """.format(year=year, rnd=rnd)
-
-    try:
-        match_df = pd.read_sql_query(SQL_QUERY,
-                                     connection,
-                                     parse_dates=["GameTime"])
-        if rnd == 23:
-            next_match = datetime.strptime("{}-03-01".format(year+1),
-                                           "%Y-%m-%d").date()
+    def __init__(self,
+                 year,
+                 content,
+                 engine="lxml"):
+        self.year = year
+        self.scores = {}
+        self.ladders = {}
+
+        if engine == "lxml":
+            self._parse_lxml(content)
+        elif engine == "read_html":
+            self._parse(content)
         else:
-            next_match = match_df["GameTime"].max().date() + timedelta(days=7)
-    except OperationalError as error:
-        next_match = datetime.strptime("{}-01-01".format(MIN_YEAR),
-                                       "%Y-%m-%d").date()
-
-    return next_match
-
-def scrape_score_table(scrape_year=MIN_YEAR,
-                       scrape_rnd=1):
-    """Example function with types documented in the docstring.
-
-    `PEP 484`_ type annotations are supported. If attribute, parameter, and
-    return types are annotated according to `PEP 484`_, they do not need to be
-    included in the docstring:
-
-    Args:
-        param1 (int): The first parameter.
-        param2 (str): The second parameter.
-
-    Returns:
-        bool: The return value. True for success, False otherwise.
-
-    .. _PEP 484:
-        https://www.python.org/dev/peps/pep-0484/
-
-    """
-    web_site = AFL_TABLES_URL + str(scrape_year) + ".html"
-    response = requests.get(web_site)
-    soup = BeautifulSoup(response.content, "lxml")
-    table = soup.find_all("table")
-    df_list = pd.read_html(str(table))
-
-    score_df = pd.DataFrame(columns=SCORES_TABLE_COLUMNS)
-    is_finals = False
-    rnd = None
-    for df in df_list:
-        if "Finals" in df.iloc[0, :].values:
-            is_finals = True
-            rnd = None
-            break
-        elif "Round" in df.iloc[0, :].values[0]:
-            is_finals = False
-            rnd = int(df.iloc[0, :].values[0].split()[-1])
-            continue
-        elif "Ladder" in df.iloc[0, :].values[0].split():
-            continue
-        elif "Ladder" in df.iloc[0, :].values[1].split():
-            continue
-        if isinstance(df.iloc[0, :].index, pd.core.index.MultiIndex):
-            break
-        elif rnd == scrape_rnd:
-            if is_finals:
-                match_type = "F"
+            raise ValueError("Unknown season parse engine {}".format(engine))
+
+    @property
+    def rounds(self):
+        """list of int: Rounds that have matches on the season page."""
+        return sorted(self.scores)
+
+    def round_scores(self,
+                     rnd):
+        """Return the matches played in round `rnd`.
+
+        Args:
+            rnd (int): Round of the season.
+
+        Returns:
+            DataFrame: One row per match or bye, empty if the round is unknown.
+
+        """
+        from gamblor.table_builder import scores_builder
+
+        if rnd not in self.scores:
+            return scores_builder().to_frame()
+        return self.scores[rnd].copy()
+
+    def season_scores(self):
+        """Return the matches of every round.
+
+        Returns:
+            DataFrame: One row per match or bye, in round order.
+
+        """
+        import pandas as pd
+        from gamblor.table_builder import scores_builder
+
+        return pd.concat([scores_builder().to_frame()] + [self.scores[rnd] for rnd in self.rounds],
+                         ignore_index=True)
+
+    def round_ladder(self,
+                     rnd):
+        """Return the ladder as it stood after round `rnd`.
+
+        Args:
+            rnd (int): Round of the season.
+
+        Returns:
+            DataFrame: One row per team, empty if the round is unknown.
+
+        """
+        from gamblor.table_builder import ladder_builder
+
+        if rnd not in self.ladders:
+            return ladder_builder().to_frame()
+        return self.ladders[rnd].copy()
+
+    def _parse(self,
+               content):
+        # Only this comparison route needs BeautifulSoup.
+        import pandas as pd
+        from bs4 import BeautifulSoup
+        from gamblor.table_builder import scores_builder, ladder_builder
+
+        soup = BeautifulSoup(content, "lxml")
+        table = soup.find_all("table")
+        df_list = pd.read_html(io.StringIO(str(table)))
+
+        match_builders = {}
+        ladder_builders = {}
+        rnd = None
+        for df in df_list:
+            first_row = df.iloc[0, :].values
+            if "Finals" in first_row:
+                # Finals are not collected, so the walk stops here.
+                break
+            elif "Round" in first_row[0]:
+                rnd = int(first_row[0].split()[-1])
+                continue
+            elif "Ladder" in first_row[0].split():
+                if rnd is not None:
+                    builder = ladder_builders.setdefault(rnd, ladder_builder())
+                    builder.extend(_scrape_round_ladder(self.year,
+                                                        rnd,
+                                                        df))
+                continue
+            elif "Ladder" in str(first_row[1]).split():
+                continue
+            if isinstance(df.columns, pd.MultiIndex):
+                break
+            elif rnd is not None:
+                builder = match_builders.setdefault(rnd, scores_builder())
+                builder.append(_scrape_match(self.year,
+                                             rnd,
+                                             "IS",
+                                             df))
+
+        for match_rnd, builder in match_builders.items():
+            self.scores[match_rnd] = builder.to_frame().drop_duplicates()
+        for ladder_rnd, builder in ladder_builders.items():
+            self.ladders[ladder_rnd] = builder.to_frame().drop_duplicates()
+
+    def _parse_lxml(self,
+                    content):
+        from gamblor.extract import iter_season_rows, LadderRow
+        from gamblor.table_builder import ladder_builder
+
+        match_rows = []
+        ladder_rows = []
+        for row in iter_season_rows(content, self.year):
+            if isinstance(row, LadderRow):
+                ladder_rows.append(row)
             else:
-                match_type = "IS"
+                match_rows.append(row)
 
-            match_df = scrape_match(scrape_year,
-                                    rnd,
-                                    match_type,
-                                    df)
-            score_df = score_df.append(match_df,
-                                       ignore_index=True,
-                                       sort=False)
+        scores_df = _season_scores_frame(match_rows)
+        for match_rnd, round_df in scores_df.groupby("Round", sort=True):
+            self.scores[match_rnd] = round_df.reset_index(drop=True).drop_duplicates()
 
-    score_df = score_df.drop_duplicates()
+        builder = ladder_builder()
+        builder.extend(ladder_rows)
+        ladder_df = builder.to_frame()
+        for ladder_rnd, round_df in ladder_df.groupby("Round", sort=True):
+            self.ladders[ladder_rnd] = round_df.reset_index(drop=True).drop_duplicates()
 
-    return score_df
+def _scrape_match(year,
+                  rnd,
+                  match_type,
+                  match_df):
+    from gamblor.extract import is_cancelled
 
-def scrape_match(year,
-                 rnd,
-                 match_type,
-                 match_df):
     if len(match_df) == 1:
-        score_df = scrape_bye(year,
-                              rnd,
-                              match_df)
+        score_record = _scrape_bye(year,
+                                   rnd,
+                                   match_df)
+    elif is_cancelled(*[match_df.iloc[row, :].fillna("").astype(str).tolist() for row in (0, 1)]):
+        score_record = _scrape_cancelled_match(year,
+                                               rnd,
+                                               match_df)
     else:
-        score_df = scrape_played_match(year,
-                                       rnd,
-                                       match_type,
-                                       match_df)
-    return score_df
-
-def scrape_bye(year,
-               rnd,
-               match_df):
-    score_df = pd.DataFrame({"Year": [year,],
-                             "Round": [rnd,],
-                             "Venue": [None,],
-                             "GameType": ["IS",],
-                             "GameTime": [None,],
-                             "HomeTeam": [match_df.iloc[0, 0],],
-                             "AwayTeam": ["Bye",],
-                             "HomeFinalScore": [None,],
-                             "AwayFinalScore": [None,],
-                             "HomeQ1Goals": [None,],
-                             "HomeQ1Points": [None,],
-                             "HomeQ2Goals": [None,],
-                             "HomeQ2Points": [None,],
-                             "HomeQ3Goals": [None,],
-                             "HomeQ3Points": [None,],
-                             "HomeQ4Goals": [None,],
-                             "HomeQ4Points": [None,],
-                             "AwayQ1Goals": [None,],
-                             "AwayQ1Points": [None,],
-                             "AwayQ2Goals": [None,],
-                             "AwayQ2Points": [None,],
-                             "AwayQ3Goals": [None,],
-                             "AwayQ3Points": [None,],
-                             "AwayQ4Goals": [None,],
-                             "AwayQ4Points": [None,]})
-
-    return score_df
-
-def scrape_played_match(year,
-                        rnd,
-                        match_type,
-                        match_df):
+        score_record = _scrape_played_match(year,
+                                            rnd,
+                                            match_type,
+                                            match_df)
+    return score_record
+
+def _scrape_bye(year,
+                rnd,
+                match_df):
+    score_record = {"Year": year,
+                    "Round": rnd,
+                    "Venue": None,
+                    "GameType": "IS",
+                    "GameTime": None,
+                    "HomeTeam": match_df.iloc[0, 0],
+                    "AwayTeam": "Bye",
+                    "HomeFinalScore": None,
+                    "AwayFinalScore": None,
+                    "HomeQ1Goals": None,
+                    "HomeQ1Points": None,
+                    "HomeQ2Goals": None,
+                    "HomeQ2Points": None,
+                    "HomeQ3Goals": None,
+                    "HomeQ3Points": None,
+                    "HomeQ4Goals": None,
+                    "HomeQ4Points": None,
+                    "AwayQ1Goals": None,
+                    "AwayQ1Points": None,
+                    "AwayQ2Goals": None,
+                    "AwayQ2Points": None,
+                    "AwayQ3Goals": None,
+                    "AwayQ3Points": None,
+                    "AwayQ4Goals": None,
+                    "AwayQ4Points": None}
+
+    return score_record
+
+def _scrape_cancelled_match(year,
+                            rnd,
+                            match_df):
+    info = match_df.iloc[0, 3]
+    date_string = " ".join(info.split(" ")[:4])
+
+    score_record = _scrape_bye(year,
+                               rnd,
+                               match_df)
+    score_record.update({"Venue": info.split(":")[-1].strip(),
+                         "GameType": CANCELLED_GAME_TYPE,
+                         "GameTime": datetime.strptime(date_string,
+                                                       "%a %d-%b-%Y %I:%M %p"),
+                         "AwayTeam": match_df.iloc[1, 0]})
+
+    return score_record
+
+def _scrape_played_match(year,
+                         rnd,
+                         match_type,
+                         match_df):
 
     home_df = match_df.iloc[0, :]
     home_team = home_df[0]
@@ -314,280 +310,294 @@ def scrape_played_match(year,
     game_time = datetime.strptime(date_string, 
                                   "%a %d-%b-%Y %I:%M %p")
 
-    score_df = pd.DataFrame({"Year": [int(year),],
-                             "Round": [int(rnd),],
-                             "Venue": [venue,],
-                             "GameType": [match_type,],
-                             "GameTime": [game_time,],
-                             "HomeTeam": [home_team,],
-                             "AwayTeam": [away_team,],
-                             "HomeFinalScore": [home_final,],
-                             "AwayFinalScore": [away_final,],
-                             "HomeQ1Goals": [home_q1g,],
-                             "HomeQ1Points": [home_q1p,],
-                             "HomeQ2Goals": [home_q2g,],
-                             "HomeQ2Points": [home_q2p,],
-                             "HomeQ3Goals": [home_q3g,],
-                             "HomeQ3Points": [home_q3p,],
-                             "HomeQ4Goals": [home_q4g,],
-                             "HomeQ4Points": [home_q4p,],
-                             "AwayQ1Goals": [away_q1g,],
-                             "AwayQ1Points": [away_q1p,],
-                             "AwayQ2Goals": [away_q2g,],
-                             "AwayQ2Points": [away_q2p,],
-                             "AwayQ3Goals": [away_q3g,],
-                             "AwayQ3Points": [away_q3p,],
-                             "AwayQ4Goals": [away_q4g,],
-                             "AwayQ4Points": [away_q4p,]})
-
-    return score_df
-
-def wierd_2015_round_14():
-    # There was some weird shit in Round 14 2015
-    score_df = pd.DataFrame({"Year": [2015,],
-                             "Round": [14,],
-                             "Venue": [None,],
-                             "GameType": ["IS",],
-                             "GameTime": [None,],
-                             "HomeTeam": ["Adelaide",],
-                             "AwayTeam": ["Bye",],
-                             "HomeFinalScore": [None,],
-                             "AwayFinalScore": [None,],
-                             "HomeQ1Goals": [None,],
-                             "HomeQ1Points": [None,],
-                             "HomeQ2Goals": [None,],
-                             "HomeQ2Points": [None,],
-                             "HomeQ3Goals": [None,],
-                             "HomeQ3Points": [None,],
-                             "HomeQ4Goals": [None,],
-                             "HomeQ4Points": [None,],
-                             "AwayQ1Goals": [None,],
-                             "AwayQ1Points": [None,],
-                             "AwayQ2Goals": [None,],
-                             "AwayQ2Points": [None,],
-                             "AwayQ3Goals": [None,],
-                             "AwayQ3Points": [None,],
-                             "AwayQ4Goals": [None,],
-                             "AwayQ4Points": [None,]})
-    score_df = score_df.append({"Year": 2015,
-                                "Round": 14,
-                                "Venue": None,
-                                "GameType": "IS",
-                                "GameTime": None,
-                                "HomeTeam": "Geelong",
-                                "AwayTeam": "Bye",
-                                "HomeFinalScore": None,
-                                "AwayFinalScore": None,
-                                "HomeQ1Goals": None,
-                                "HomeQ1Points": None,
-                                "HomeQ2Goals": None,
-                                "HomeQ2Points": None,
-                                "HomeQ3Goals": None,
-                                "HomeQ3Points": None,
-                                "HomeQ4Goals": None,
-                                "HomeQ4Points": None,
-                                "AwayQ1Goals": None,
-                                "AwayQ1Points": None,
-                                "AwayQ2Goals": None,
-                                "AwayQ2Points": None,
-                                "AwayQ3Goals": None,
-                                "AwayQ3Points": None,
-                                "AwayQ4Goals": None,
-                                "AwayQ4Points": None},
-                               ignore_index=True)
-
-    return score_df
+    score_record = {"Year": int(year),
+                    "Round": int(rnd),
+                    "Venue": venue,
+                    "GameType": match_type,
+                    "GameTime": game_time,
+                    "HomeTeam": home_team,
+                    "AwayTeam": away_team,
+                    "HomeFinalScore": home_final,
+                    "AwayFinalScore": away_final,
+                    "HomeQ1Goals": home_q1g,
+                    "HomeQ1Points": home_q1p,
+                    "HomeQ2Goals": home_q2g,
+                    "HomeQ2Points": home_q2p,
+                    "HomeQ3Goals": home_q3g,
+                    "HomeQ3Points": home_q3p,
+                    "HomeQ4Goals": home_q4g,
+                    "HomeQ4Points": home_q4p,
+                    "AwayQ1Goals": away_q1g,
+                    "AwayQ1Points": away_q1p,
+                    "AwayQ2Goals": away_q2g,
+                    "AwayQ2Points": away_q2p,
+                    "AwayQ3Goals": away_q3g,
+                    "AwayQ3Points": away_q3p,
+                    "AwayQ4Goals": away_q4g,
+                    "AwayQ4Points": away_q4p}
+
+    return score_record
+
+def _scrape_round_ladder(year,
+                         rnd,
+                         round_df):
+    ladder_records = []
+    # A row per team below the heading, as seasons differ in their number.
+    for t in range(len(round_df) - 1):
+        team = round_df.iloc[t+1, 0]
+        num_games = round_df.iloc[t+1, 1]
+        points = round_df.iloc[t+1, 2]
+        percentage = round_df.iloc[t+1, 3]
+        ladder_records.append({"Year": year,
+                               "Round": rnd,
+                               "Team": team,
+                               "GamesPlayed": int(num_games),
+                               "Points": int(points),
+                               "Percentage": float(percentage)})
+
+    return ladder_records
+
+def _season_scores_frame(match_rows):
+    """Build the scores of a whole season, parsing every breakdown at once."""
+    import numpy as np
+    import pandas as pd
+    from gamblor.extract import parse_quarter_scores, MatchRow
+    from gamblor.table_builder import scores_builder
+
+    rows_df = pd.DataFrame.from_records(match_rows,
+                                        columns=MatchRow._fields)
+    played = rows_df["home_breakdown"].notna().to_numpy()
+    num_played = int(played.sum())
+
+    breakdowns = pd.concat([rows_df["home_breakdown"][played],
+                            rows_df["away_breakdown"][played]])
+    finals = np.concatenate([rows_df["home_final"][played].to_numpy(),
+                             rows_df["away_final"][played].to_numpy()])
+    quarters = parse_quarter_scores(breakdowns,
+                                    finals)
+
+    columns = {"Year": rows_df["year"],
+               "Round": rows_df["rnd"],
+               "GameType": rows_df["game_type"],
+               "Venue": rows_df["venue"],
+               "GameTime": rows_df["game_time"],
+               "HomeTeam": rows_df["home_team"],
+               "AwayTeam": rows_df["away_team"],
+               "HomeFinalScore": rows_df["home_final"],
+               "AwayFinalScore": rows_df["away_final"]}
+    for c, column in enumerate(SCORES_TABLE_COLUMNS[9:]):
+        side, q = divmod(c, 8)
+        values = np.full(len(rows_df), None, dtype=object)
+        values[played] = quarters[side * num_played:(side + 1) * num_played, q]
+        columns[column] = values
+
+    builder = scores_builder()
+    if len(rows_df) > 0:
+        builder.extend_columns(columns)
+
+    return builder.to_frame()
+
+_SEASON_PARSES = {}
+
+def season_url(year):
+    """Return the address of the AFL Tables page for `year`."""
+    return AFL_TABLES_URL + str(year) + ".html"
+
+def prefetch_sources(years):
+    """Download every source page and workbook needed for `years` at once.
+
+    The downloads run concurrently on the shared fetcher and land in the page
+    cache and Betfair directory, where the per-round scrapes pick them up.
+
+    Args:
+        years (iterable of int): Seasons to fetch.
 
-def scrape_ladder_table(scrape_year=MIN_YEAR,
-                        scrape_rnd=1):
-    """Example function with types documented in the docstring.
+    """
+    from gamblor.fetch import default_fetcher
+    from gamblor.http_cache import fetch_many
+    from gamblor.odds import download_workbook
+
+    years = sorted(set(years))
+    with stage("prefetch_pages") as fetched:
+        for _, content in fetch_many([season_url(year) for year in years]):
+            fetched.add(bytes=len(content))
+
+    workbooks = sorted(set(ODDS_URL_DICT[year] for year in years if year in ODDS_URL_DICT))
+    with stage("prefetch_workbooks") as fetched:
+        for _, path in default_fetcher().map_completed(download_workbook, workbooks):
+            fetched.add(bytes=os.path.getsize(path))
+
+def season_parse(year,
+                 content=None):
+    """Fetch and parse the AFL Tables page for `year`, reusing earlier parses.
 
-    `PEP 484`_ type annotations are supported. If attribute, parameter, and
-    return types are annotated according to `PEP 484`_, they do not need to be
-    included in the docstring:
+    Parses are remembered per season and page digest, so every round task in
+    a process shares one parse until the page itself changes.
 
     Args:
-        param1 (int): The first parameter.
-        param2 (str): The second parameter.
+        year (int): Season to parse.
+        content (:obj:`bytes`, optional): Page already fetched by the caller,
+            fetched through the page cache when not given.
 
     Returns:
-        bool: The return value. True for success, False otherwise.
+        SeasonParse: The parsed season.
 
-    .. _PEP 484:
-        https://www.python.org/dev/peps/pep-0484/
+    """
+    if content is None:
+        from gamblor.http_cache import fetch
+
+        with stage("fetch", year) as fetched:
+            content = fetch(season_url(year))
+            fetched.add(bytes=len(content))
+    digest = hashlib.sha256(content).hexdigest()
+
+    parse = _SEASON_PARSES.get(year)
+    if parse is None or parse[0] != digest:
+        with stage("parse", year) as parsed:
+            parse = (digest, SeasonParse(year, content))
+            parsed.add(bytes=len(content),
+                       rows=sum(len(df) for df in parse[1].scores.values()))
+        _SEASON_PARSES[year] = parse
+
+    return parse[1]
+
+def scrape_score_table(scrape_year=MIN_YEAR,
+                       scrape_rnd=1):
+    """Collect the matches played in one round of a season.
+
+    Args:
+        scrape_year (int): Season to collect.
+        scrape_rnd (int): Round of the season to collect.
+
+    Returns:
+        DataFrame: One row per match or bye with ``SCORES_TABLE_COLUMNS``.
 
     """
-    web_site = AFL_TABLES_URL + str(scrape_year) + ".html"
-    response = requests.get(web_site)
-    soup = BeautifulSoup(response.content, "lxml")
-    table = soup.find_all("table")
-    df_list = pd.read_html(str(table))
-
-    ladder_df = pd.DataFrame(columns=LADDER_TABLE_COLUMNS)
-    is_finals = False
-    rnd = None
-    for df in df_list:
-        if "Finals" in df.iloc[0, :].values:
-            is_finals = True
-            rnd = None
-            break
-        elif "Round" in df.iloc[0, :].values[0]:
-            is_finals = False
-            is_ladder = False
-            rnd = int(df.iloc[0, :].values[0].split()[-1])
-            continue
-        elif "Ladder" in df.iloc[0, :].values[0].split() and rnd == scrape_rnd:
-            round_df = scrape_round_ladder(scrape_year,
-                                           scrape_rnd,
-                                           df)
-            ladder_df = ladder_df.append(round_df,
-                                         ignore_index=True,
-                                         sort=False)
-        elif "Ladder" in df.iloc[0, :].values[1].split():
-            continue
-        if isinstance(df.iloc[0, :].index, pd.core.index.MultiIndex):
-            break
-        elif rnd == scrape_rnd and is_ladder:
-            pass
+    with stage("scrape", scrape_year, scrape_rnd, table="Scores") as scraped:
+        scores_df = season_parse(scrape_year).round_scores(scrape_rnd)
+        scraped.add(rows=len(scores_df))
+    return scores_df
 
-    ladder_df = ladder_df.drop_duplicates()
+def scrape_ladder_table(scrape_year=MIN_YEAR,
+                        scrape_rnd=1):
+    """Collect the ladder as it stood after one round of a season.
 
-    return ladder_df
+    Args:
+        scrape_year (int): Season to collect.
+        scrape_rnd (int): Round of the season to collect.
 
-def scrape_round_ladder(year,
-                        rnd,
-                        round_df):
-    ladder_df = pd.DataFrame(columns=LADDER_TABLE_COLUMNS)
-    for t in range(NUM_TEAMS):
-        team = round_df.iloc[t+1, 0]
-        num_games = round_df.iloc[t+1, 1]
-        points = round_df.iloc[t+1, 2]
-        percentage = round_df.iloc[t+1, 3]
-        team_df = pd.DataFrame({"Year": [year,],
-                                  "Round": [rnd,],
-                                  "Team": [team,],
-                                  "GamesPlayed": [int(num_games),],
-                                  "Points": [int(points),],
-                                  "Percentage": [float(percentage),]})
-        ladder_df = ladder_df.append(team_df,
-                                         ignore_index=True,
-                                         sort=False)
+    Returns:
+        DataFrame: One row per team with ``LADDER_TABLE_COLUMNS``.
 
+    """
+    with stage("scrape", scrape_year, scrape_rnd, table="Ladder") as scraped:
+        ladder_df = season_parse(scrape_year).round_ladder(scrape_rnd)
+        scraped.add(rows=len(ladder_df))
     return ladder_df
 
 def scrape_odds_table(scrape_year=MIN_YEAR,
                       scrape_rnd=1):
-    """Example function with types documented in the docstring.
+    """Collect the pre-match prices of every match in one round.
 
-    `PEP 484`_ type annotations are supported. If attribute, parameter, and
-    return types are annotated according to `PEP 484`_, they do not need to be
-    included in the docstring:
+    The round's matches are read from the ``Scores`` table and each one is
+    looked up directly in the season's :class:`gamblor.odds.OddsIndex`.
 
     Args:
-        param1 (int): The first parameter.
-        param2 (str): The second parameter.
+        scrape_year (int): Season to collect.
+        scrape_rnd (int): Round of the season to collect.
 
     Returns:
-        bool: The return value. True for success, False otherwise.
-
-    .. _PEP 484:
-        https://www.python.org/dev/peps/pep-0484/
+        DataFrame: One row per team with ``ODDS_TABLE_COLUMNS``.
 
     """
-    historical_df = pd.DataFrame(columns=ODDS_TABLE_COLUMNS)
-    url = ODDS_URL_DICT[scrape_year]
-    filename = ntpath.basename(url)
-    filepath = os.path.join(ODDS_DIR,
-                            filename)
-    if not os.path.isfile(filepath):
-        response = requests.get(url, headers=CHROME_USER_AGENT)
-        with open(filepath, "wb") as excel_file:
-            excel_file.write(response.content)
-
-    header_row = 0
-    if filename == "AFL-Data-Dump-2017.xlsx":
-        header_row = 3
-    odds_df = pd.read_excel(filepath,
-                            header=header_row)
-    odds_df.columns = [x.lower() for x in odds_df.columns]
-        
-    if filename == "AFL-2011-2016.xlsx":
-        odds_df.rename(columns={"path": "paths"}, 
-                       inplace=True)
-
-    odds_df = odds_df[(odds_df["inplay"] == "N") & \
-                      (odds_df["event_name"] == "Match Odds")]
-    odds_df = odds_df[odds_df["paths"].str.contains("AFL")]
-    odds_df = odds_df[~odds_df["paths"].str.contains("WAFL", regex=False)]
-    odds_df = odds_df[~odds_df["selection_name"].str.contains("(W)", regex=False)]
-        
-    if filename == "AFL-2011-2016.xlsx":
-        odds_df["Year"] = odds_df["paths"].str.split("/", expand=True)[0].str.split(" ", expand=True)[1].astype(int)
-    else:
-        odds_df["Year"] = odds_df["sett_date"].dt.year.astype(int)
-    
-    odds_df["HomeTeam"] = odds_df["parent_event_name"].str.split("v", expand=True)[0]
-    odds_df["HomeTeam"] = odds_df["HomeTeam"].str.strip()
-    odds_df["AwayTeam"] = odds_df["parent_event_name"].str.split("v", expand=True)[1]
-    odds_df["AwayTeam"] = odds_df["AwayTeam"].str.strip()
-
-    # Fix wierd names
-    wierd_name_dict = {"Port Adelaide Power": "Port Adelaide",
-                       "Adelaide Crows": "Adelaide",
-                       "Melbourne Demons": "Melbourne",
-                       "Gold Coast Suns": "Gold Coast",
-                       "Geelong Cats": "Geelong",
-                       "Sydney Swans": "Sydney",
-                       "GWS Giants": "Greater Western Sydney",
-                       "GWS": "Greater Western Sydney",
-                       "West Coast Eagles": "West Coast",
-                       "Brisbane": "Brisbane Lions",
-                      }
-    for wierd_name, fixed_name in wierd_name_dict.items():
-        odds_df.loc[odds_df["HomeTeam"] == wierd_name, "HomeTeam"] = fixed_name
-        odds_df.loc[odds_df["AwayTeam"] == wierd_name, "AwayTeam"] = fixed_name
-
-    try:
-        engine = sqlalchemy.create_engine(STATS_CONN,
-                                          echo=False)
-        connection = engine.connect()
-    except Exception as e:
-        print(e)
-
-    SQL_QUERY = """ SELECT Scores.MatchID, Scores.Year, Scores.Round, Scores.GameTime, Scores.HomeTeam, Scores.AwayTeam
-                    FROM Scores
-                    WHERE Scores.Round = {0}
-                    AND Scores.Year = {1}
-                """.format(scrape_rnd,
-                           scrape_year)
+    from gamblor.db import connect
+
+    with stage("scrape", scrape_year, scrape_rnd, table="Odds") as scraped:
+        with connect(STATS_CONN) as connection:
+            scores_df = stored_matches(connection,
+                                       scrape_year,
+                                       scrape_rnd)
 
-    scores_df = pd.read_sql_query(SQL_QUERY,
-                                  connection,
-                                  parse_dates=["GameTime"])
+        odds_df = odds_table(scrape_year,
+                             scores_df)
+        scraped.add(rows=len(odds_df))
+    return odds_df
 
-    scores_df = scores_df.set_index(["Year", "HomeTeam", "AwayTeam"],
-                                    drop=True)
+def stored_matches(connection,
+                   year,
+                   rnd=None):
+    """Read the matches of a season, or one of its rounds, from ``Scores``.
 
-    odds_df = odds_df.join(scores_df,
-                           on=["Year", "HomeTeam", "AwayTeam"],
-                           how="inner")
+    Args:
+        connection (:obj:`sqlalchemy.engine.Connection`): Open connection.
+        year (int): Season to read.
+        rnd (:obj:`int`, optional): Round to read, every round if not given.
 
-    url_df = pd.DataFrame({"MatchID": odds_df["MatchID"].values,
-                           "Year": odds_df["Year"].values,
-                           "Round": odds_df["Round"].values,
-                           "GameTime": odds_df["GameTime"].values,
-                           "Team": odds_df["selection_name"],
-                           "Odds": odds_df["wap"]})
+    Returns:
+        DataFrame: ``MatchID``, ``Year``, ``Round``, ``GameType``,
+        ``GameTime``, ``HomeTeam`` and ``AwayTeam`` as stored, teams as
+        codes.
 
-    for wierd_name, fixed_name in wierd_name_dict.items():
-        url_df.loc[url_df["Team"] == wierd_name, "Team"] = fixed_name
+    """
+    import pandas as pd
+    from sqlalchemy import text
 
-    historical_df = historical_df.append(url_df,
-                                         ignore_index=True,
-                                         sort=False)
+    SQL_QUERY = """ SELECT Scores.MatchID, Scores.Year, Scores.Round, Scores.GameType, Scores.GameTime,
+                           Scores.HomeTeam, Scores.AwayTeam
+                    FROM Scores
+                    WHERE Scores.Year = :year
+                """
+    params = {"year": year}
+    if rnd is not None:
+        SQL_QUERY += "AND Scores.Round = :rnd"
+        params["rnd"] = rnd
+
+    return pd.read_sql_query(text(SQL_QUERY),
+                             connection,
+                             params=params,
+                             parse_dates={"GameTime": "s"})
+
+def odds_table(year,
+               scores_df):
+    """Look up the pre-match prices of stored matches.
 
-    historical_df = historical_df.drop_duplicates(subset="Team",
-                                                  keep="first")
+    Args:
+        year (int): Season the matches belong to.
+        scores_df (DataFrame): Matches as returned by :func:`stored_matches`.
 
+    Returns:
+        DataFrame: One row per team per round with ``ODDS_TABLE_COLUMNS``.
+
+    """
+    from gamblor.odds import odds_index
+    from gamblor.table_builder import odds_builder
+    from gamblor.teams import TEAMS
+
+    index = odds_index(year)
+
+    builder = odds_builder()
+    for match in scores_df.itertuples(index=False):
+        prices = index.lookup(match.HomeTeam,
+                              match.AwayTeam,
+                              match.GameTime)
+        if prices is None:
+            if TEAMS[match.AwayTeam] == "Bye" or match.GameType == CANCELLED_GAME_TYPE:
+                continue
+            logger.warning("No pre-match odds for %s v %s in round %s of %s",
+                           TEAMS[match.HomeTeam],
+                           TEAMS[match.AwayTeam],
+                           match.Round,
+                           match.Year)
+            continue
+        for team, price in zip((TEAMS[match.HomeTeam], TEAMS[match.AwayTeam]), prices):
+            builder.append({"MatchID": match.MatchID,
+                            "Year": match.Year,
+                            "Round": match.Round,
+                            "GameTime": match.GameTime,
+                            "Team": team,
+                            "Odds": price})
+
+    historical_df = builder.to_frame().drop_duplicates(subset=["Round", "Team"],
+                                                       keep="first")
 
     return historical_df
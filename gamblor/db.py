@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""Database helpers shared by the pipeline tasks.
+
+Every module reaches the database through :func:`get_engine` or
+:func:`connect`, which hand out one pooled engine per connection string and
+process. Connections are returned to the pool when the ``with`` block ends
+and all engines are disposed of when the interpreter exits.
+
+SQLite connections opened by any engine in the process are switched to
+write-ahead logging with ``synchronous=NORMAL`` as they are created, which
+keeps readers unblocked while a task is loading and avoids an fsync per
+transaction.
+
+Frames are loaded with :func:`bulk_insert`, which hands whole column arrays
+to the driver's ``executemany`` in chunks instead of building a dict per row.
+
+Example:
+    Query the statistics database and load a frame in one transaction::
+
+        with connect(STATS_CONN) as conn:
+            scores_df = pd.read_sql_query("SELECT * FROM Scores", conn)
+
+        with get_engine(STATS_CONN).begin() as conn:
+            bulk_insert(conn, table, frame)
+
+"""
+import atexit
+import itertools
+import os
+import sqlite3
+import threading
+
+from contextlib import contextmanager
+
+import pandas as pd
+import sqlalchemy
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from gamblor import BULK_CHUNK_SIZE, DB_POOL_SIZE, SQLITE_PRAGMAS, STATS_CONN
+from gamblor import SCORES_TABLE_COLUMNS, LADDER_TABLE_COLUMNS, ODDS_TABLE_COLUMNS
+
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+
+_EPOCH = pd.Timestamp(0)
+
+@sqlalchemy.event.listens_for(Engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection,
+                        connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute("PRAGMA {}={}".format(pragma, value))
+    cursor.close()
+
+def get_engine(conn_info=STATS_CONN):
+    """Return the shared engine for `conn_info`, creating it on first use.
+
+    Engines are kept per process: a worker forked from a process that
+    already holds an engine gets its own rather than sharing the parent's
+    pooled connections.
+
+    Args:
+        conn_info (str): Database connection string.
+
+    Returns:
+        :obj:`sqlalchemy.engine.Engine`: Pooled engine.
+
+    """
+    pid = os.getpid()
+    with _ENGINES_LOCK:
+        engine, owner = _ENGINES.get(conn_info, (None, None))
+        if engine is None or owner != pid:
+            engine = _create_engine(conn_info)
+            _ENGINES[conn_info] = (engine, pid)
+    return engine
+
+@contextmanager
+def connect(conn_info=STATS_CONN):
+    """Borrow a pooled connection for the duration of a ``with`` block.
+
+    Args:
+        conn_info (str): Database connection string.
+
+    Yields:
+        :obj:`sqlalchemy.engine.Connection`: Connection from the pool.
+
+    """
+    connection = get_engine(conn_info).connect()
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+def dispose_all():
+    """Close every pooled connection held by this process."""
+    pid = os.getpid()
+    with _ENGINES_LOCK:
+        for conn_info, (engine, owner) in list(_ENGINES.items()):
+            if owner == pid:
+                engine.dispose()
+            del _ENGINES[conn_info]
+
+atexit.register(dispose_all)
+
+def _create_engine(conn_info):
+    url = sqlalchemy.engine.make_url(conn_info)
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+        # Pool file connections on every SQLAlchemy version and let them be
+        # used from whichever worker thread borrows them.
+        return sqlalchemy.create_engine(conn_info,
+                                        echo=False,
+                                        poolclass=QueuePool,
+                                        pool_size=DB_POOL_SIZE,
+                                        connect_args={"check_same_thread": False})
+
+    return sqlalchemy.create_engine(conn_info,
+                                    echo=False,
+                                    pool_pre_ping=True)
+
+def to_epoch(times):
+    """Convert times to integer seconds since the epoch for storage.
+
+    Times are stored as integers so they sort and compare in SQL. Naive times
+    are taken as they are, without a time zone conversion.
+
+    Args:
+        times (array-like of datetime): Times to convert, missing allowed.
+
+    Returns:
+        Series: Seconds since the epoch as ``Int64``, missing where the
+        time is.
+
+    """
+    times = pd.to_datetime(pd.Series(times))
+    return ((times - _EPOCH) // pd.Timedelta(seconds=1)).astype("Int64")
+
+def column_values(frame):
+    """Return the columns of `frame` as lists of plain Python values.
+
+    Missing values become ``None`` so the driver stores them as NULL, and
+    numpy scalars become Python ints and floats it can bind directly.
+
+    Args:
+        frame (DataFrame): Rows to convert.
+
+    Returns:
+        list of list: One list of values per column, in column order.
+
+    """
+    return [frame[column].to_numpy(dtype=object, na_value=None).tolist()
+            for column in frame.columns]
+
+def bulk_insert(conn,
+                table,
+                frame,
+                chunk_size=BULK_CHUNK_SIZE,
+                conflict_keys=None):
+    """Insert every row of `frame` into `table` with chunked ``executemany``.
+
+    Args:
+        conn (:obj:`sqlalchemy.engine.Connection`): Connection, usually
+            inside a transaction.
+        table (:obj:`sqlalchemy.Table`): Destination table.
+        frame (DataFrame): Rows to insert, with columns named after the
+            table's columns.
+        chunk_size (int): Rows handed to the driver per ``executemany``.
+        conflict_keys (:obj:`list` of :obj:`str`, optional): Columns of a
+            unique index. When given, rows matching an existing row on them
+            update it instead of failing.
+
+    Returns:
+        int: Number of rows inserted or updated.
+
+    """
+    names = list(frame.columns)
+    insert = _insert_statement(conn,
+                               table,
+                               names,
+                               conflict_keys)
+    statement = insert.compile(dialect=conn.dialect,
+                               column_keys=names)
+
+    values = column_values(frame)
+    if statement.positional:
+        values = [values[names.index(key)] for key in statement.positiontup]
+        rows = iter(zip(*values))
+        chunk = list(itertools.islice(rows, chunk_size))
+        while chunk:
+            conn.exec_driver_sql(str(statement), chunk)
+            chunk = list(itertools.islice(rows, chunk_size))
+    else:
+        rows = iter(zip(*values))
+        chunk = list(itertools.islice(rows, chunk_size))
+        while chunk:
+            conn.execute(insert,
+                         [dict(zip(names, row)) for row in chunk])
+            chunk = list(itertools.islice(rows, chunk_size))
+
+    return len(frame)
+
+def _insert_statement(conn,
+                      table,
+                      names,
+                      conflict_keys):
+    if conflict_keys is None:
+        return table.insert()
+
+    if conn.dialect.name == "sqlite":
+        insert = sqlite.insert(table)
+    elif conn.dialect.name == "postgresql":
+        insert = postgresql.insert(table)
+    else:
+        raise NotImplementedError("Upserts are not supported on {}".format(conn.dialect.name))
+
+    updates = {name: insert.excluded[name] for name in names if name not in conflict_keys}
+    if not updates:
+        return insert.on_conflict_do_nothing(index_elements=conflict_keys)
+    return insert.on_conflict_do_update(index_elements=conflict_keys,
+                                        set_=updates)
+
+def scores_db_frame(scores_df):
+    """Return scraped scores as stored: epoch times and team codes."""
+    scores_df = scores_df.copy()
+    scores_df["GameTime"] = to_epoch(scores_df["GameTime"])
+    scores_df["HomeTeam"] = scores_df["HomeTeam"].cat.codes
+    scores_df["AwayTeam"] = scores_df["AwayTeam"].cat.codes
+    return scores_df[SCORES_TABLE_COLUMNS]
+
+def ladder_db_frame(ladder_df):
+    """Return a scraped ladder as stored: team codes."""
+    ladder_df = ladder_df.copy()
+    ladder_df["Team"] = ladder_df["Team"].cat.codes
+    return ladder_df[LADDER_TABLE_COLUMNS]
+
+def odds_db_frame(odds_df):
+    """Return scraped odds as stored: epoch times and team codes."""
+    odds_df = odds_df.copy()
+    odds_df["GameTime"] = to_epoch(odds_df["GameTime"])
+    odds_df["Team"] = odds_df["Team"].cat.codes
+    return odds_df[ODDS_TABLE_COLUMNS]
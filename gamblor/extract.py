@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""Direct extraction of match and ladder rows from AFL Tables season pages.
+
+The season page is parsed once with lxml and its tables are walked in
+document order, yielding typed tuples as they are found. No intermediate
+DataFrames are built: the cell text is read straight off the tree using the
+same rules ``pd.read_html`` applies (whitespace collapsed, ``colspan``
+repeated, leading all-``<th>`` rows treated as the header), so the rows match
+what the BeautifulSoup and ``read_html`` route produces.
+
+Example:
+    Collect every ladder row of a saved season page::
+
+        with open("2015.html", "rb") as page:
+            rows = [row for row in iter_season_rows(page.read(), 2015)
+                    if isinstance(row, LadderRow)]
+
+"""
+import re
+
+from collections import namedtuple
+from datetime import datetime
+
+import lxml.html
+import numpy as np
+import pandas as pd
+
+from gamblor import CANCELLED_GAME_TYPE, FINALS_WEEKS
+
+MatchRow = namedtuple("MatchRow", ["year", "rnd", "game_type", "venue", "game_time",
+                                   "home_team", "away_team",
+                                   "home_breakdown", "away_breakdown",
+                                   "home_final", "away_final"])
+
+LadderRow = namedtuple("LadderRow", ["year", "rnd", "team",
+                                     "games_played", "points", "percentage"])
+
+_WHITESPACE = re.compile(r"\s+")
+
+_BREAKDOWN = r"^\s*" + r"\s+".join([r"(\d+)\.(\d+)"] * 4)
+
+def iter_season_rows(content,
+                     year,
+                     finals=False):
+    """Yield every match, bye and ladder row on a season page.
+
+    Byes are yielded as a :class:`MatchRow` with ``"Bye"`` as the away team
+    and no scores, and cancelled matches with game type
+    ``CANCELLED_GAME_TYPE`` and no scores. By default the walk stops at the
+    finals, as the scrapers always have. With `finals` set, finals matches
+    are yielded too, with game type ``"F"`` and numbered as rounds
+    following the last home and away round, one per week of the finals
+    series.
+
+    Args:
+        content (bytes): Raw HTML of the season page.
+        year (int): Season the page belongs to.
+        finals (bool): Whether to carry on through the finals.
+
+    Yields:
+        MatchRow or LadderRow: Rows in the order they appear on the page.
+
+    """
+    document = lxml.html.fromstring(content)
+    for br in document.iter("br"):
+        br.tail = "\n" + (br.tail or "")
+
+    rnd = None
+    last_round = None
+    for table in document.iter("table"):
+        header, body = _table_rows(table)
+        if not body:
+            continue
+
+        first_row = body[0]
+        if "Finals" in first_row:
+            if not finals or rnd is None:
+                return
+            last_round = rnd
+            rnd = None
+            continue
+        elif last_round is not None:
+            if len(header) > 1:
+                return
+            elif first_row[0] in FINALS_WEEKS:
+                rnd = last_round + FINALS_WEEKS[first_row[0]]
+            elif rnd is not None and len(body) == 2 and len(first_row) >= 4:
+                yield _match_row(year,
+                                 rnd,
+                                 "F",
+                                 body[0],
+                                 body[1])
+            continue
+        elif "Round" in first_row[0]:
+            rnd = int(first_row[0].split()[-1])
+            continue
+        elif "Ladder" in first_row[0].split():
+            if rnd is not None:
+                # Every row below the heading, as seasons differ in their
+                # number of teams.
+                for row in body[1:]:
+                    yield LadderRow(year,
+                                    rnd,
+                                    row[0],
+                                    int(row[1]),
+                                    int(row[2]),
+                                    float(row[3]))
+            continue
+        elif len(first_row) > 1 and "Ladder" in first_row[1].split():
+            continue
+        if len(header) > 1:
+            return
+        elif rnd is not None:
+            if len(body) == 1:
+                yield MatchRow(year, rnd, "IS", None, None,
+                               first_row[0], "Bye",
+                               None, None,
+                               None, None)
+            else:
+                yield _match_row(year,
+                                 rnd,
+                                 "IS",
+                                 body[0],
+                                 body[1])
+
+def parse_quarter_scores(breakdowns,
+                         finals=None):
+    """Parse a whole column of quarter by quarter scores in one pass.
+
+    The breakdowns are matched against a single regular expression and the
+    captured goals and points converted to integers column-wise. When final
+    scores are given, every row is checked to satisfy
+    ``goals * 6 + points == final`` at the end of the last quarter.
+
+    Args:
+        breakdowns (array-like of str): Cumulative scores such as
+            ``"3.2 5.4 8.7 12.10"``, one per team per match.
+        finals (:obj:`array-like of int`, optional): Final score of each row.
+
+    Returns:
+        ndarray: Integer array of shape ``(len(breakdowns), 8)`` holding Q1
+        goals, Q1 points, Q2 goals and so on up to Q4 points.
+
+    Raises:
+        ValueError: A breakdown could not be parsed or does not add up to its
+            final score.
+
+    """
+    breakdowns = pd.Series(breakdowns, dtype=object).reset_index(drop=True)
+    parts = breakdowns.str.extract(_BREAKDOWN)
+
+    unparsed = np.flatnonzero(parts.isna().any(axis=1).to_numpy())
+    if unparsed.size:
+        raise ValueError("Unparseable score breakdowns: {}".format(breakdowns.iloc[unparsed].tolist()))
+
+    quarters = parts.to_numpy().astype(np.int64)
+    if finals is not None:
+        totals = quarters[:, 6] * 6 + quarters[:, 7]
+        finals = np.asarray(finals, dtype=np.int64)
+        wrong = np.flatnonzero(totals != finals)
+        if wrong.size:
+            raise ValueError("Score breakdowns do not add up to the final score: {}".format(
+                list(zip(breakdowns.iloc[wrong].tolist(), finals[wrong].tolist()))))
+
+    return quarters
+
+def is_cancelled(home_row,
+                 away_row):
+    """Return whether a match's rows show it was cancelled without a result.
+
+    Args:
+        home_row (list of str): Cells of the home team's row.
+        away_row (list of str): Cells of the away team's row.
+
+    Returns:
+        bool: True when neither team has a final score and the rows say
+        the match was cancelled.
+
+    """
+    unscored = not home_row[2].strip() and not away_row[2].strip()
+    return unscored and "cancelled" in " ".join(home_row + away_row).lower()
+
+def _match_row(year,
+               rnd,
+               game_type,
+               home_row,
+               away_row):
+    info = home_row[3]
+    venue = info.split(":")[-1].strip()
+    game_time = datetime.strptime(" ".join(info.split(" ")[:4]),
+                                  "%a %d-%b-%Y %I:%M %p")
+
+    if is_cancelled(home_row, away_row):
+        return MatchRow(year, rnd, CANCELLED_GAME_TYPE, venue, game_time,
+                        home_row[0], away_row[0],
+                        None, None,
+                        None, None)
+
+    return MatchRow(year, rnd, game_type, venue, game_time,
+                    home_row[0], away_row[0],
+                    home_row[1], away_row[1],
+                    int(home_row[2]), int(away_row[2]))
+
+def _table_rows(table):
+    # Mirrors the row selection of pd.read_html's lxml flavour, including
+    # which rows count as the header.
+    header_rows = []
+    for thead in table.xpath(".//thead"):
+        header_rows.extend(thead.xpath("./tr"))
+    body_rows = table.xpath(".//tbody//tr") + table.xpath("./tr")
+
+    if not header_rows:
+        while body_rows and all(cell.tag == "th" for cell in body_rows[0].xpath("./td|./th")):
+            header_rows.append(body_rows.pop(0))
+
+    body = [_row_text(row) for row in body_rows]
+    return header_rows, [row for row in body if row]
+
+def _row_text(row):
+    cells = []
+    for cell in row.xpath("./td|./th"):
+        text = _WHITESPACE.sub(" ", cell.text_content().strip())
+        cells.extend([text] * int(cell.get("colspan", 1) or 1))
+    return cells
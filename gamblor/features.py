@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""Team form features derived from the ``Scores`` and ``Ladder`` tables.
+
+Every match gives one row per team, holding what the team did in that match
+and its form going into it:
+
+* ``Form*``: mean margin, scoring shots for and against and margin of each
+  quarter over the team's last ``FEATURE_WINDOW`` matches.
+* ``Ladder*``: position, points and percentage on the ladder of the
+  previous round of the season.
+* ``DaysRest``: days since the team's previous match.
+
+Features only look at earlier matches, so the rows of a round never change
+once its results are in. Rounds are computed with vectorised group and
+rolling operations and kept in the ``"features"`` dataset of
+:mod:`gamblor.store`, one partition per round. Adding a round reads the
+previous season and the new round from the database and writes only the
+new round's partition; building a training matrix reads the stored
+partitions and computes nothing.
+
+Example:
+    Add the features of round 3 of 2015 and build the training matrix::
+
+        update_features([(2015, 3)])
+        training_df = training_matrix([2014, 2015])
+
+"""
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from sqlalchemy import text
+
+from gamblor import FEATURE_WINDOW, FEATURES_TABLE_COLUMNS, STATS_CONN
+from gamblor.db import connect
+from gamblor.store import read_dataset, write_partition
+from gamblor.table_builder import features_builder
+from gamblor.teams import TEAMS, decode_teams
+
+RESULT_COLUMNS = ["Margin", "ShotsFor", "ShotsAgainst",
+                  "Q1Margin", "Q2Margin", "Q3Margin", "Q4Margin"]
+
+FORM_COLUMNS = ["Form" + column for column in RESULT_COLUMNS]
+
+FEATURE_COLUMNS = ["FormGames"] + FORM_COLUMNS + ["LadderPosition", "LadderPoints", "LadderPercentage", "DaysRest"]
+
+_QUARTERS = ["Q1", "Q2", "Q3", "Q4"]
+
+def team_matches(scores_df):
+    """Split every match into a row for each team.
+
+    Args:
+        scores_df (DataFrame): Matches as stored in ``Scores``, teams as
+            codes and ``GameTime`` as datetimes.
+
+    Returns:
+        DataFrame: Two rows per match with ``MatchID``, ``Year``,
+        ``Round``, ``GameTime``, ``Team``, ``Opponent``, ``Home`` and
+        ``RESULT_COLUMNS`` from the team's side, teams as codes. Byes are
+        left out.
+
+    """
+    bye = TEAMS.index("Bye")
+    scores_df = scores_df[(scores_df["HomeTeam"] != bye) & (scores_df["AwayTeam"] != bye)]
+
+    sides = {}
+    for side in ("Home", "Away"):
+        goals = scores_df[[side + quarter + "Goals" for quarter in _QUARTERS]].to_numpy(dtype=float)
+        behinds = scores_df[[side + quarter + "Points" for quarter in _QUARTERS]].to_numpy(dtype=float)
+        # Quarter scores are cumulative, so each quarter's own score is the
+        # difference from the one before.
+        totals = goals * 6 + behinds
+        sides[side] = (np.diff(totals, axis=1, prepend=0), goals[:, 3] + behinds[:, 3])
+
+    frames = []
+    for team, opponent in (("Home", "Away"), ("Away", "Home")):
+        quarters = sides[team][0] - sides[opponent][0]
+        frame = pd.DataFrame({"MatchID": scores_df["MatchID"].to_numpy(),
+                              "Year": scores_df["Year"].to_numpy(),
+                              "Round": scores_df["Round"].to_numpy(),
+                              "GameTime": scores_df["GameTime"].to_numpy(),
+                              "Team": scores_df[team + "Team"].to_numpy(),
+                              "Opponent": scores_df[opponent + "Team"].to_numpy(),
+                              "Home": team == "Home",
+                              "Margin": quarters.sum(axis=1),
+                              "ShotsFor": sides[team][1],
+                              "ShotsAgainst": sides[opponent][1]})
+        for position, quarter in enumerate(_QUARTERS):
+            frame[quarter + "Margin"] = quarters[:, position]
+        frames.append(frame)
+
+    return pd.concat(frames,
+                     ignore_index=True)
+
+def ladder_positions(ladder_df):
+    """Add each team's position to the ladder of every round.
+
+    Args:
+        ladder_df (DataFrame): Rows as stored in ``Ladder``.
+
+    Returns:
+        DataFrame: `ladder_df` with a ``Position`` column, ranked on points
+        and then percentage.
+
+    """
+    ladder_df = ladder_df.sort_values(["Year", "Round", "Points", "Percentage"],
+                                      ascending=[True, True, False, False],
+                                      kind="mergesort")
+    ladder_df["Position"] = ladder_df.groupby(["Year", "Round"]).cumcount() + 1
+    return ladder_df
+
+def form_features(matches_df,
+                  ladder_df,
+                  window=FEATURE_WINDOW):
+    """Compute the features of every team match from its earlier matches.
+
+    Args:
+        matches_df (DataFrame): Rows as returned by :func:`team_matches`,
+            including every match the features should look back over.
+        ladder_df (DataFrame): Rows as returned by :func:`ladder_positions`
+            for the seasons of `matches_df`.
+        window (int): Number of earlier matches the form is averaged over.
+
+    Returns:
+        DataFrame: `matches_df` ordered by time, with ``FEATURE_COLUMNS``.
+
+    """
+    matches_df = matches_df.sort_values(["GameTime", "MatchID", "Home"],
+                                        ascending=[True, True, False],
+                                        kind="mergesort").reset_index(drop=True)
+    teams = matches_df["Team"]
+
+    # Shift first so a match's own result never feeds its features.
+    previous = matches_df[RESULT_COLUMNS].astype(float).groupby(teams).shift(1)
+    previous["FormGames"] = previous["Margin"].notna().astype(float)
+    rolling = previous.groupby(teams).rolling(window,
+                                              min_periods=1)
+    form = rolling.mean().reset_index(level=0, drop=True).sort_index()
+    matches_df[FORM_COLUMNS] = form[RESULT_COLUMNS].to_numpy()
+    games = rolling["FormGames"].sum().reset_index(level=0, drop=True).sort_index()
+    matches_df["FormGames"] = games.fillna(0).astype(np.int64)
+
+    rest = matches_df["GameTime"] - matches_df.groupby(teams)["GameTime"].shift(1)
+    matches_df["DaysRest"] = rest / pd.Timedelta(days=1)
+
+    # Ladder of the latest earlier round of the same season, none before
+    # the first round.
+    ladder = ladder_df[["Year", "Round", "Team", "Position", "Points", "Percentage"]]
+    ladder = ladder.rename(columns={"Round": "LadderRound",
+                                    "Position": "LadderPosition",
+                                    "Points": "LadderPoints",
+                                    "Percentage": "LadderPercentage"})
+    order = matches_df.sort_values("Round", kind="mergesort").index
+    merged = pd.merge_asof(matches_df.loc[order, ["Year", "Round", "Team"]].astype(np.int64),
+                           ladder.sort_values("LadderRound", kind="mergesort").astype({"Year": np.int64,
+                                                                                        "LadderRound": np.int64,
+                                                                                        "Team": np.int64}),
+                           left_on="Round",
+                           right_on="LadderRound",
+                           by=["Year", "Team"],
+                           allow_exact_matches=False)
+    merged.index = order
+    for column in ("LadderPosition", "LadderPoints", "LadderPercentage"):
+        matches_df[column] = merged[column]
+
+    return matches_df
+
+def update_features(rounds,
+                    conn_info=STATS_CONN,
+                    window=FEATURE_WINDOW):
+    """Compute and store the features of `rounds`.
+
+    Only the seasons of `rounds` and the one before them are read, and only
+    the partitions of `rounds` are written.
+
+    Args:
+        rounds (iterable of tuple): ``(year, rnd)`` of each round to store.
+        conn_info (str): String containing the statistics database connection info.
+        window (int): Number of earlier matches the form is averaged over.
+
+    Returns:
+        DataFrame: Features of `rounds` with ``FEATURES_TABLE_COLUMNS``.
+
+    """
+    rounds = sorted(set(rounds))
+    if not rounds:
+        return features_builder().to_frame()
+
+    first_year = rounds[0][0] - 1
+    last_year = rounds[-1][0]
+    with connect(conn_info) as conn:
+        scores_df = pd.read_sql_query(text("SELECT * FROM Scores WHERE Year BETWEEN :first AND :last"),
+                                      conn,
+                                      params={"first": first_year, "last": last_year},
+                                      parse_dates={"GameTime": "s"})
+        ladder_df = pd.read_sql_query(text("SELECT * FROM Ladder WHERE Year BETWEEN :first AND :last"),
+                                      conn,
+                                      params={"first": first_year, "last": last_year})
+
+    features_df = form_features(team_matches(scores_df),
+                                ladder_positions(ladder_df),
+                                window=window)
+    keys = pd.MultiIndex.from_arrays([features_df["Year"], features_df["Round"]])
+    features_df = features_df[keys.isin(rounds)]
+
+    builder = features_builder()
+    columns = dict((column, features_df[column]) for column in FEATURES_TABLE_COLUMNS)
+    columns["Team"] = decode_teams(features_df["Team"])
+    columns["Opponent"] = decode_teams(features_df["Opponent"])
+    builder.extend_columns(columns)
+    features_df = builder.to_frame()
+
+    for (year, rnd), round_df in features_df.groupby(["Year", "Round"]):
+        write_partition("features",
+                        round_df,
+                        year,
+                        rnd)
+
+    return features_df
+
+def training_matrix(years=None):
+    """Return one row per stored match with both teams' features.
+
+    Args:
+        years (:obj:`list` of :obj:`int`, optional): Seasons to include,
+            every stored season by default.
+
+    Returns:
+        DataFrame: ``MatchID``, ``Year``, ``Round``, ``GameTime``,
+        ``HomeTeam``, ``AwayTeam``, ``FEATURE_COLUMNS`` prefixed with
+        ``Home`` and ``Away``, and the home team's ``Margin``.
+
+    """
+    expression = None
+    if years is not None:
+        expression = ds.field("Year").isin([int(year) for year in years])
+    features_df = read_dataset("features",
+                               columns=["MatchID", "Year", "Round", "GameTime", "Team", "Home", "Margin"] + FEATURE_COLUMNS,
+                               filter=expression)
+
+    home_df = features_df[features_df["Home"]].drop(columns="Home")
+    away_df = features_df[~features_df["Home"]].drop(columns=["Home", "Year", "Round", "GameTime", "Margin"])
+    home_df = home_df.rename(columns=dict((column, "Home" + column) for column in ["Team"] + FEATURE_COLUMNS))
+    away_df = away_df.rename(columns=dict((column, "Away" + column) for column in ["Team"] + FEATURE_COLUMNS))
+
+    training_df = home_df.merge(away_df,
+                                on="MatchID",
+                                how="inner")
+    columns = (["MatchID", "Year", "Round", "GameTime", "HomeTeam", "AwayTeam"]
+               + ["Home" + column for column in FEATURE_COLUMNS]
+               + ["Away" + column for column in FEATURE_COLUMNS]
+               + ["Margin"])
+    return training_df[columns].sort_values(["GameTime", "MatchID"],
+                                            kind="mergesort").reset_index(drop=True)
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""Pooled, rate limited and retrying HTTP fetches.
+
+A :class:`Fetcher` owns one ``requests.Session`` whose connection pool is
+sized to its worker pool, so repeated requests to a host reuse connections
+instead of paying a TCP and TLS handshake each time. Requests to the same host
+are spaced at least ``host_interval`` seconds apart to stay polite, and
+failed requests are retried with exponential backoff. Batches of URLs are run
+on a bounded thread pool and their results handed back as they complete.
+
+Example:
+    Fetch several seasons from a local stand-in server::
+
+        fetcher = Fetcher(max_workers=2, host_interval=0)
+        urls = ["http://localhost:8000/{}.html".format(y) for y in (2014, 2015)]
+        for url, response in fetcher.fetch_many(urls):
+            print(url, len(response.content))
+
+"""
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+from gamblor import FETCH_WORKERS, FETCH_HOST_INTERVAL, FETCH_RETRIES, FETCH_BACKOFF, FETCH_TIMEOUT
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+class HostRateLimiter(object):
+    """Spaces requests to each host at least `interval` seconds apart.
+
+    Attributes:
+        interval (float): Minimum seconds between requests to one host.
+
+    """
+    def __init__(self,
+                 interval=FETCH_HOST_INTERVAL):
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self,
+             url):
+        """Block until a request to the host of `url` may be made."""
+        if self.interval <= 0:
+            return
+
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+class Fetcher(object):
+    """Fetches URLs through a pooled session on a bounded worker pool.
+
+    Attributes:
+        max_workers (int): Number of concurrent requests in a batch.
+        retries (int): Attempts after the first before giving up.
+        backoff (float): Seconds to wait before the first retry, doubled on
+            each later one.
+        timeout (float): Seconds to wait for a response.
+        session (:obj:`requests.Session`): Session shared by all requests.
+
+    """
+    def __init__(self,
+                 max_workers=FETCH_WORKERS,
+                 host_interval=FETCH_HOST_INTERVAL,
+                 retries=FETCH_RETRIES,
+                 backoff=FETCH_BACKOFF,
+                 timeout=FETCH_TIMEOUT,
+                 session=None):
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_workers,
+                                  pool_maxsize=max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+        self._limiter = HostRateLimiter(host_interval)
+
+    def get(self,
+            url,
+            headers=None):
+        """Fetch `url`, retrying connection errors and transient statuses.
+
+        Args:
+            url (str): Address to fetch.
+            headers (:obj:`dict`, optional): Extra request headers.
+
+        Returns:
+            requests.Response: The final response. Error statuses that are
+            not retried, or still failing after the last retry, are returned
+            for the caller to handle.
+
+        Raises:
+            requests.RequestException: The request still failed to complete
+                after the last retry.
+
+        """
+        attempt = 0
+        while True:
+            self._limiter.wait(url)
+            try:
+                response = self.session.get(url,
+                                            headers=headers,
+                                            timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retries:
+                    raise
+                response = None
+
+            if response is not None and \
+               (response.status_code not in RETRY_STATUSES or attempt >= self.retries):
+                return response
+
+            time.sleep(self._delay(attempt, response))
+            attempt += 1
+
+    def map_completed(self,
+                      function,
+                      items):
+        """Apply `function` to every item on the worker pool.
+
+        Args:
+            function (callable): Called with each item.
+            items (iterable): Inputs to `function`.
+
+        Yields:
+            tuple: ``(item, result)`` pairs in the order they complete.
+
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(function, item): item for item in items}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def fetch_many(self,
+                   urls,
+                   headers=None):
+        """Fetch a batch of URLs concurrently.
+
+        Args:
+            urls (iterable of str): Addresses to fetch.
+            headers (:obj:`dict`, optional): Extra headers for every request.
+
+        Yields:
+            tuple: ``(url, response)`` pairs in the order they complete.
+
+        """
+        return self.map_completed(lambda url: self.get(url, headers=headers),
+                                  urls)
+
+    def close(self):
+        """Close the pooled connections."""
+        self.session.close()
+
+    def _delay(self,
+               attempt,
+               response):
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff * 2 ** attempt
+
+_DEFAULT_FETCHER = None
+_DEFAULT_FETCHER_PID = None
+
+def default_fetcher():
+    """Return the process wide fetcher shared by all scrapers.
+
+    A process forked from one that already holds the fetcher, such as a
+    Luigi worker, gets a fresh one instead of sharing the parent's sockets.
+
+    Returns:
+        Fetcher: Fetcher configured from the ``FETCH_*`` settings.
+
+    """
+    global _DEFAULT_FETCHER, _DEFAULT_FETCHER_PID
+    if _DEFAULT_FETCHER is None or _DEFAULT_FETCHER_PID != os.getpid():
+        _DEFAULT_FETCHER = Fetcher()
+        _DEFAULT_FETCHER_PID = os.getpid()
+    return _DEFAULT_FETCHER
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""Fixture calendar resolving dates to rounds and rounds to their successors.
+
+The calendar records, for every round of every season, when its first and
+last matches are played and whether it belongs to the finals. It is built
+once from the season pages and kept as JSON in ``FIXTURES_PATH``, so working
+out which rounds a date range covers is a bisect over round start times held
+in memory, with no database queries and no guesses about season length.
+
+Seasons whose Grand Final has not been played yet are rebuilt from their
+season page on every load, as their later rounds may still change.
+
+Example:
+    Walk the home and away rounds played in 2015::
+
+        calendar = fixture_calendar([2015])
+        for year, rnd in calendar.rounds_between(date(2015, 1, 1),
+                                                 date(2016, 1, 1),
+                                                 finals=False):
+            print(year, rnd)
+
+"""
+import json
+import os
+
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import date, datetime, time
+
+from gamblor import FINALS_WEEKS, FIXTURES_PATH
+from gamblor.data_collection import season_url
+from gamblor.extract import iter_season_rows, MatchRow
+from gamblor.http_cache import fetch
+
+Fixture = namedtuple("Fixture", ["year", "rnd", "start", "end", "finals"])
+
+_TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+class FixtureCalendar(object):
+    """Every round of a set of seasons, ordered by start time.
+
+    Attributes:
+        fixtures (list of Fixture): Rounds sorted by their first match.
+        complete (set of int): Seasons whose Grand Final is in the calendar.
+
+    """
+    def __init__(self,
+                 fixtures,
+                 complete=()):
+        self.fixtures = sorted(fixtures,
+                               key=lambda fixture: (fixture.start, fixture.year, fixture.rnd))
+        self.complete = set(complete)
+
+        self._starts = [fixture.start for fixture in self.fixtures]
+        self._positions = {(fixture.year, fixture.rnd): position
+                           for position, fixture in enumerate(self.fixtures)}
+
+    @property
+    def years(self):
+        """list of int: Seasons in the calendar."""
+        return sorted(set(fixture.year for fixture in self.fixtures))
+
+    def round_at(self,
+                 when):
+        """Return the round in progress, or last started, at `when`.
+
+        Args:
+            when (date or datetime): Time to resolve. Dates are taken at
+                midnight.
+
+        Returns:
+            tuple: ``(year, rnd)``, or ``None`` before the first round.
+
+        """
+        position = bisect_right(self._starts, _as_datetime(when)) - 1
+        if position < 0:
+            return None
+        fixture = self.fixtures[position]
+        return fixture.year, fixture.rnd
+
+    def next_round(self,
+                   year,
+                   rnd):
+        """Return the round played after round `rnd` of `year`.
+
+        Args:
+            year (int): Season of the current round.
+            rnd (int): Current round.
+
+        Returns:
+            tuple: ``(year, rnd)`` of the next round, or ``None`` when the
+            current round is the last in the calendar.
+
+        Raises:
+            KeyError: The round is not in the calendar.
+
+        """
+        position = self._positions[(year, rnd)] + 1
+        if position == len(self.fixtures):
+            return None
+        fixture = self.fixtures[position]
+        return fixture.year, fixture.rnd
+
+    def num_rounds(self,
+                   year,
+                   finals=False):
+        """Return how many rounds `year` has.
+
+        Args:
+            year (int): Season to count.
+            finals (bool): Whether to count the weeks of the finals.
+
+        Returns:
+            int: Number of rounds.
+
+        """
+        return sum(1 for fixture in self.fixtures
+                   if fixture.year == year and (finals or not fixture.finals))
+
+    def fixture(self,
+                year,
+                rnd):
+        """Return the :class:`Fixture` of round `rnd` of `year`."""
+        return self.fixtures[self._positions[(year, rnd)]]
+
+    def rounds_between(self,
+                       start,
+                       end,
+                       finals=True):
+        """Return every round with matches between `start` and `end`.
+
+        Args:
+            start (date or datetime): Start of the range.
+            end (date or datetime): End of the range, exclusive.
+            finals (bool): Whether to include the finals.
+
+        Returns:
+            list of tuple: ``(year, rnd)`` of each round, in playing order.
+
+        """
+        start = _as_datetime(start)
+        first = max(bisect_right(self._starts, start) - 1, 0)
+        last = bisect_left(self._starts, _as_datetime(end))
+
+        return [(fixture.year, fixture.rnd)
+                for fixture in self.fixtures[first:last]
+                if fixture.end >= start and (finals or not fixture.finals)]
+
+    def merge(self,
+              other):
+        """Return a calendar with the seasons of `other` replacing ours.
+
+        Args:
+            other (FixtureCalendar): Calendar of newer season data.
+
+        Returns:
+            FixtureCalendar: The combined calendar.
+
+        """
+        years = set(other.years) | other.complete
+        fixtures = [fixture for fixture in self.fixtures if fixture.year not in years]
+        complete = (self.complete - years) | other.complete
+        return FixtureCalendar(fixtures + other.fixtures,
+                               complete)
+
+    def save(self,
+             path=FIXTURES_PATH):
+        """Write the calendar to `path` as JSON.
+
+        Args:
+            path (str): Destination file.
+
+        """
+        seasons = {}
+        for fixture in self.fixtures:
+            season = seasons.setdefault(str(fixture.year),
+                                        {"complete": fixture.year in self.complete,
+                                         "rounds": []})
+            season["rounds"].append([fixture.rnd,
+                                     fixture.start.strftime(_TIME_FORMAT),
+                                     fixture.end.strftime(_TIME_FORMAT),
+                                     fixture.finals])
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as calendar_file:
+            json.dump({"seasons": seasons}, calendar_file, indent=1)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls,
+             path=FIXTURES_PATH):
+        """Read a calendar written by :meth:`save`.
+
+        Args:
+            path (str): Calendar file.
+
+        Returns:
+            FixtureCalendar: The stored calendar.
+
+        """
+        with open(path, "r") as calendar_file:
+            seasons = json.load(calendar_file)["seasons"]
+
+        fixtures = []
+        complete = []
+        for year, season in seasons.items():
+            if season["complete"]:
+                complete.append(int(year))
+            for rnd, start, end, finals in season["rounds"]:
+                fixtures.append(Fixture(int(year),
+                                        rnd,
+                                        datetime.strptime(start, _TIME_FORMAT),
+                                        datetime.strptime(end, _TIME_FORMAT),
+                                        finals))
+
+        return cls(fixtures,
+                   complete)
+
+def season_calendar(year,
+                    content):
+    """Build the calendar of one season from its AFL Tables page.
+
+    Args:
+        year (int): Season the page belongs to.
+        content (bytes): Raw HTML of the season page.
+
+    Returns:
+        FixtureCalendar: Rounds of the season, finals included.
+
+    """
+    times = {}
+    finals = set()
+    grand_final = max(FINALS_WEEKS.values())
+    last_home_and_away = None
+    for row in iter_season_rows(content,
+                                year,
+                                finals=True):
+        if not isinstance(row, MatchRow) or row.game_time is None:
+            continue
+        times.setdefault(row.rnd, []).append(row.game_time)
+        if row.game_type == "F":
+            finals.add(row.rnd)
+        else:
+            last_home_and_away = row.rnd
+
+    fixtures = [Fixture(year, rnd, min(game_times), max(game_times), rnd in finals)
+                for rnd, game_times in times.items()]
+    complete = []
+    if last_home_and_away is not None and last_home_and_away + grand_final in finals:
+        complete.append(year)
+
+    return FixtureCalendar(fixtures,
+                           complete)
+
+def fixture_calendar(years,
+                     path=FIXTURES_PATH,
+                     refresh=False):
+    """Return a calendar covering `years`, building only what is missing.
+
+    Seasons already complete in the stored calendar are used as they are;
+    any other season is rebuilt from its page and the stored calendar is
+    updated.
+
+    Args:
+        years (iterable of int): Seasons the calendar must cover.
+        path (str): Stored calendar file.
+        refresh (bool): Rebuild every season in `years` regardless.
+
+    Returns:
+        FixtureCalendar: Calendar of the stored seasons and `years`.
+
+    """
+    calendar = FixtureCalendar([])
+    if os.path.isfile(path):
+        calendar = FixtureCalendar.load(path)
+
+    stale = [year for year in sorted(set(years))
+             if refresh or year not in calendar.complete]
+    if not stale:
+        return calendar
+
+    for year in stale:
+        calendar = calendar.merge(season_calendar(year,
+                                                  fetch(season_url(year))))
+    calendar.save(path)
+
+    return calendar
+
+def _as_datetime(when):
+    if isinstance(when, datetime):
+        return when
+    if isinstance(when, date):
+        return datetime.combine(when, time())
+    return datetime.strptime(when, "%Y-%m-%d")
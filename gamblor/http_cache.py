@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""Content-addressed on-disk cache for scraped source pages.
+
+Every scraper fetches its source documents through :func:`fetch`, so a season
+page that is needed by several tasks is downloaded once and then served from
+disk. Entries older than the time to live are revalidated with a conditional
+request (``If-None-Match`` / ``If-Modified-Since``) rather than downloaded
+again, and the least recently used entries are evicted once the cache grows
+beyond its size budget.
+
+The cache is laid out as::
+
+    HTTP_CACHE_DIR/
+        objects/<digest[:2]>/<digest>   page bodies, named by their sha256
+        meta/<sha256(url)>.json         validators and timestamps per url
+
+Metadata is kept in one small file per url and every write is an atomic
+rename, so several worker processes can share the same cache directory.
+
+Example:
+    Point a cache at a local stand-in server to exercise it offline::
+
+        cache = PageCache(cache_dir="/tmp/cache", ttl=0)
+        content = cache.get("http://localhost:8000/2015.html")
+
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import requests
+
+from gamblor import HTTP_CACHE_DIR, HTTP_CACHE_TTL, HTTP_CACHE_MAX_BYTES
+from gamblor.fetch import default_fetcher
+from gamblor.instrument import stage
+
+class PageCache(object):
+    """A shared, size bounded cache of HTTP response bodies.
+
+    Attributes:
+        cache_dir (str): Directory the cache is stored in.
+        ttl (float): Seconds an entry is served without revalidation.
+        max_bytes (int): Total size of stored bodies before eviction starts.
+        session (:obj:`requests.Session`, optional): Session or
+            :class:`gamblor.fetch.Fetcher` used for requests, ``requests``
+            itself when not given.
+
+    """
+    def __init__(self,
+                 cache_dir=HTTP_CACHE_DIR,
+                 ttl=HTTP_CACHE_TTL,
+                 max_bytes=HTTP_CACHE_MAX_BYTES,
+                 session=None):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.session = session
+
+        self._object_dir = os.path.join(cache_dir, "objects")
+        self._meta_dir = os.path.join(cache_dir, "meta")
+
+    def get(self,
+            url,
+            headers=None):
+        """Return the body of `url`, from disk when the cached copy is valid.
+
+        Args:
+            url (str): Address of the page.
+            headers (:obj:`dict`, optional): Extra request headers.
+
+        Returns:
+            bytes: The response body.
+
+        Raises:
+            requests.RequestException: The request failed, or the server
+                answered with an error status or with ``304 Not Modified``,
+                and there is no cached copy to fall back on.
+
+        """
+        meta = self._read_meta(url)
+        if meta is not None and not os.path.isfile(self._object_path(meta["digest"])):
+            meta = None
+
+        now = time.time()
+        if meta is not None and now - meta["fetched"] < self.ttl:
+            self._touch(url, meta, now)
+            return self._read_object(meta["digest"])
+
+        request_headers = dict(headers or {})
+        if meta is not None:
+            if meta.get("etag"):
+                request_headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                request_headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response = self._request(url, request_headers)
+            if response.status_code == 304:
+                if meta is None:
+                    # Only possible when the caller sent its own validators.
+                    raise requests.HTTPError("304 Not Modified with no cached copy of {}".format(url),
+                                             response=response)
+                meta["fetched"] = now
+                self._touch(url, meta, now)
+                return self._read_object(meta["digest"])
+            response.raise_for_status()
+        except requests.RequestException:
+            if meta is None:
+                raise
+            # Serve the stale copy rather than failing the whole scrape.
+            return self._read_object(meta["digest"])
+
+        content = response.content
+        digest = self._write_object(content)
+        meta = {"url": url,
+                "digest": digest,
+                "size": len(content),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched": now,
+                "accessed": now}
+        self._write_meta(url, meta)
+        self.evict()
+
+        return content
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits its budget."""
+        entries = self._all_meta()
+        sizes = {}
+        for meta in entries:
+            sizes[meta["digest"]] = meta["size"]
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+
+        entries.sort(key=lambda meta: meta["accessed"])
+        referenced = {}
+        for meta in entries:
+            referenced[meta["digest"]] = referenced.get(meta["digest"], 0) + 1
+
+        for meta in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(self._meta_path(meta["url"]))
+            referenced[meta["digest"]] -= 1
+            if referenced[meta["digest"]] == 0:
+                self._remove(self._object_path(meta["digest"]))
+                total -= meta["size"]
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        for meta in self._all_meta():
+            self._remove(self._meta_path(meta["url"]))
+            self._remove(self._object_path(meta["digest"]))
+
+    def _request(self,
+                 url,
+                 headers):
+        getter = self.session if self.session is not None else requests
+        with stage("download", url=url) as downloaded:
+            response = getter.get(url, headers=headers)
+            downloaded.add(bytes=len(response.content))
+        return response
+
+    def _touch(self,
+               url,
+               meta,
+               now):
+        meta["accessed"] = now
+        self._write_meta(url, meta)
+
+    def _object_path(self,
+                     digest):
+        return os.path.join(self._object_dir,
+                            digest[:2],
+                            digest)
+
+    def _meta_path(self,
+                   url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self._meta_dir,
+                            key + ".json")
+
+    def _read_object(self,
+                     digest):
+        with open(self._object_path(digest), "rb") as object_file:
+            return object_file.read()
+
+    def _write_object(self,
+                      content):
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.isfile(path):
+            _atomic_write(path, content)
+        return digest
+
+    def _read_meta(self,
+                   url):
+        try:
+            with open(self._meta_path(url), "r") as meta_file:
+                return json.load(meta_file)
+        except (IOError, ValueError):
+            return None
+
+    def _write_meta(self,
+                    url,
+                    meta):
+        _atomic_write(self._meta_path(url),
+                      json.dumps(meta).encode("utf-8"))
+
+    def _all_meta(self):
+        if not os.path.isdir(self._meta_dir):
+            return []
+
+        entries = []
+        for filename in os.listdir(self._meta_dir):
+            try:
+                with open(os.path.join(self._meta_dir, filename), "r") as meta_file:
+                    entries.append(json.load(meta_file))
+            except (IOError, ValueError):
+                continue
+        return entries
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _atomic_write(path,
+                  content):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    handle, tmp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(handle, "wb") as tmp_file:
+        tmp_file.write(content)
+    os.replace(tmp_path, path)
+
+_DEFAULT_CACHE = None
+
+def default_cache():
+    """Return the process wide cache shared by all scrapers.
+
+    Returns:
+        PageCache: Cache rooted at ``HTTP_CACHE_DIR``, fetching through the
+        default :class:`gamblor.fetch.Fetcher`.
+
+    """
+    global _DEFAULT_CACHE
+    fetcher = default_fetcher()
+    if _DEFAULT_CACHE is None or _DEFAULT_CACHE.session is not fetcher:
+        _DEFAULT_CACHE = PageCache(session=fetcher)
+    return _DEFAULT_CACHE
+
+def fetch(url,
+          headers=None):
+    """Fetch `url` through the shared page cache.
+
+    Args:
+        url (str): Address of the page.
+        headers (:obj:`dict`, optional): Extra request headers.
+
+    Returns:
+        bytes: The response body.
+
+    """
+    return default_cache().get(url,
+                               headers=headers)
+
+def fetch_many(urls,
+               headers=None):
+    """Fetch a batch of URLs through the shared page cache concurrently.
+
+    Args:
+        urls (iterable of str): Addresses of the pages.
+        headers (:obj:`dict`, optional): Extra headers for every request.
+
+    Yields:
+        tuple: ``(url, content)`` pairs in the order they complete.
+
+    """
+    cache = default_cache()
+    return default_fetcher().map_completed(lambda url: cache.get(url, headers=headers),
+                                           urls)
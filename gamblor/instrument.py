@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""Stage timings and counters of a pipeline run.
+
+The fetch, parse and load stages of the pipeline run inside :func:`stage`,
+which records each run's wall and CPU time together with what it counted:
+``bytes`` fetched or downloaded, ``rows`` produced and rows ``inserted``.
+Luigi tasks are timed the same way through task event hooks. Every record
+is appended as a line of JSON to the report file, tagged with the season
+and round it belongs to where there is one, so a slow run can be broken
+down by stage, by table and by round.
+
+Instrumentation is off unless ``GAMBLOR_INSTRUMENT_PATH`` names a report
+file or :func:`enable` is called. While it is off, :func:`stage` returns a
+shared object whose methods do nothing.
+
+Stages nest, e.g. a ``download`` runs inside a ``fetch``, so the time of a
+stage includes that of the stages within it. CPU time is that of the whole
+process, so stages running at once on several threads share it.
+
+Example:
+    Time a scrape and summarise the report::
+
+        enable("run.jsonl")
+        with stage("fetch", year=2015) as fetched:
+            content = fetch(season_url(2015))
+            fetched.add(bytes=len(content))
+        print(summary_table(read_report("run.jsonl")))
+
+    Or summarise a report from the command line::
+
+        $ python -m gamblor.instrument run.jsonl --by-round
+
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+from gamblor import INSTRUMENT_PATH
+
+COUNTERS = ["bytes", "rows", "inserted"]
+
+def _new_run():
+    return "{}-{}".format(time.strftime("%Y%m%dT%H%M%S"), os.getpid())
+
+_LOCK = threading.Lock()
+_REPORT = {"path": INSTRUMENT_PATH,
+           "run": _new_run(),
+           "hooks": False}
+_TASK_STARTS = {}
+
+class Stage(object):
+    """One timed run of a stage.
+
+    Attributes:
+        name (str): Name of the stage.
+        year (:obj:`int`, optional): Season the stage works on.
+        rnd (:obj:`int`, optional): Round the stage works on.
+        labels (dict): Other fields to record, e.g. the table.
+        counts (dict): Counters added so far, keyed by ``COUNTERS``.
+
+    """
+    def __init__(self,
+                 name,
+                 year=None,
+                 rnd=None,
+                 labels=None):
+        self.name = name
+        self.year = year
+        self.rnd = rnd
+        self.labels = labels or {}
+        self.counts = dict((counter, 0) for counter in COUNTERS)
+
+    def add(self,
+            **counts):
+        """Add to the stage's counters, e.g. ``add(rows=10)``."""
+        for counter, count in counts.items():
+            self.counts[counter] += int(count)
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self,
+                 exc_type,
+                 exc_value,
+                 traceback):
+        entry = {"kind": "stage",
+                 "stage": self.name,
+                 "year": self.year,
+                 "rnd": self.rnd,
+                 "wall": time.perf_counter() - self._wall,
+                 "cpu": time.process_time() - self._cpu,
+                 "status": "failed" if exc_type is not None else "done"}
+        entry.update(self.counts)
+        entry.update(self.labels)
+        record(entry)
+        return False
+
+class _NullStage(object):
+    def add(self,
+            **counts):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,
+                 exc_type,
+                 exc_value,
+                 traceback):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+def enabled():
+    """Return whether records are being written."""
+    return _REPORT["path"] is not None
+
+def enable(path):
+    """Start appending records to the report at `path`.
+
+    Args:
+        path (str): JSON lines file to append to.
+
+    """
+    _REPORT["path"] = path
+    _REPORT["run"] = _new_run()
+
+def disable():
+    """Stop writing records."""
+    _REPORT["path"] = None
+
+def run_id():
+    """Return the id every record of this run is tagged with.
+
+    Processes forked by the run, such as Luigi workers, share it.
+
+    """
+    return _REPORT["run"]
+
+def stage(name,
+          year=None,
+          rnd=None,
+          **labels):
+    """Return a context that times one run of a stage.
+
+    Args:
+        name (str): Name of the stage, e.g. ``"fetch"``.
+        year (:obj:`int`, optional): Season the stage works on.
+        rnd (:obj:`int`, optional): Round the stage works on.
+        **labels: Other fields to record.
+
+    Returns:
+        Stage: Context recording the stage on exit, or one doing nothing
+        while instrumentation is off.
+
+    """
+    if _REPORT["path"] is None:
+        return _NULL_STAGE
+    return Stage(name,
+                 year=year,
+                 rnd=rnd,
+                 labels=labels)
+
+def record(entry):
+    """Append `entry` to the report as one line of JSON."""
+    path = _REPORT["path"]
+    if path is None:
+        return
+
+    entry = dict(entry,
+                 run=run_id(),
+                 pid=os.getpid(),
+                 time=time.time())
+    line = json.dumps(entry, default=_json_default) + "\n"
+    with _LOCK:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a") as report:
+            report.write(line)
+
+def install_luigi_hooks():
+    """Record the wall and CPU time of every Luigi task that runs.
+
+    Safe to call more than once; the hooks only record while
+    instrumentation is on.
+
+    """
+    import luigi
+
+    if _REPORT["hooks"]:
+        return
+    _REPORT["hooks"] = True
+
+    @luigi.Task.event_handler(luigi.Event.START)
+    def _task_started(task):
+        _TASK_STARTS[task.task_id] = (time.perf_counter(), time.process_time())
+
+    @luigi.Task.event_handler(luigi.Event.SUCCESS)
+    def _task_succeeded(task):
+        _task_finished(task, "done")
+
+    @luigi.Task.event_handler(luigi.Event.FAILURE)
+    def _task_failed(task,
+                     exception):
+        _task_finished(task, "failed")
+
+def _task_finished(task,
+                   status):
+    start = _TASK_STARTS.pop(task.task_id, None)
+    if start is None:
+        return
+    record({"kind": "task",
+            "stage": "task",
+            "task": task.get_task_family(),
+            "year": getattr(task, "year", None),
+            "rnd": getattr(task, "rnd", None),
+            "wall": time.perf_counter() - start[0],
+            "cpu": time.process_time() - start[1],
+            "status": status})
+
+def _json_default(value):
+    # NumPy scalars and dates.
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+def read_report(path,
+                run=None):
+    """Read the records of a report.
+
+    Args:
+        path (str): JSON lines file written by :func:`record`.
+        run (:obj:`str`, optional): Only keep this run, the last one in the
+            file by default. ``"all"`` keeps every run.
+
+    Returns:
+        DataFrame: One row per record.
+
+    """
+    import pandas as pd
+
+    report_df = pd.read_json(path,
+                             lines=True,
+                             dtype=False)
+    if report_df.empty:
+        return report_df
+    if run is None:
+        run = report_df["run"].iloc[-1]
+    if run != "all":
+        report_df = report_df[report_df["run"] == run]
+    return report_df.reset_index(drop=True)
+
+def summary_table(report_df,
+                  by_round=False):
+    """Total the records of a report per stage.
+
+    Args:
+        report_df (DataFrame): Records as returned by :func:`read_report`.
+        by_round (bool): Also split the totals by season and round.
+
+    Returns:
+        DataFrame: ``Count``, ``Wall``, ``CPU`` and the ``COUNTERS`` totals
+        per stage, Luigi task family and table, slowest first.
+
+    """
+    report_df = report_df.copy()
+    for column in ["task", "table", "year", "rnd"] + COUNTERS:
+        if column not in report_df.columns:
+            report_df[column] = None
+    report_df[["task", "table"]] = report_df[["task", "table"]].fillna("")
+    report_df[COUNTERS] = report_df[COUNTERS].fillna(0)
+
+    keys = ["stage", "task", "table"]
+    if by_round:
+        report_df[["year", "rnd"]] = report_df[["year", "rnd"]].fillna(-1).astype("int64")
+        keys += ["year", "rnd"]
+    summary_df = report_df.groupby(keys).agg(Count=("wall", "size"),
+                                             Wall=("wall", "sum"),
+                                             CPU=("cpu", "sum"),
+                                             Bytes=("bytes", "sum"),
+                                             Rows=("rows", "sum"),
+                                             Inserted=("inserted", "sum"))
+    return summary_df.sort_values("Wall",
+                                  ascending=False)
+
+def run_summary(by_round=False):
+    """Return the summary table of the current run.
+
+    Args:
+        by_round (bool): Also split the totals by season and round.
+
+    Returns:
+        DataFrame: Totals as returned by :func:`summary_table`, or ``None``
+        when nothing has been recorded.
+
+    """
+    path = _REPORT["path"]
+    if path is None or not os.path.isfile(path):
+        return None
+    report_df = read_report(path,
+                            run=run_id())
+    if report_df.empty:
+        return None
+    return summary_table(report_df,
+                         by_round=by_round)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarise a gamblor run report.")
+    parser.add_argument("path",
+                        type=str,
+                        help="JSON lines report to summarise.")
+    parser.add_argument("--run",
+                        type=str,
+                        default=None,
+                        help="Run to summarise, the last by default, or all.")
+    parser.add_argument("--by-round",
+                        action="store_true",
+                        help="Split the totals by season and round.")
+
+    args = parser.parse_args()
+    print(summary_table(read_report(args.path,
+                                    run=args.run),
+                        by_round=args.by_round).to_string())
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""Premiership ladders computed from the ``Scores`` table.
+
+Every value of ``LADDER_TABLE_COLUMNS`` follows from the results: a win is
+worth ``WIN_POINTS``, a draw ``DRAW_POINTS`` and a bye what
+:func:`bye_points` gives for the season, ``GamesPlayed`` counts matches
+with a result, and ``Percentage`` is points scored over points conceded,
+times 100 and to one decimal, as AFL Tables shows it. A match cancelled
+without a result, stored with game type ``CANCELLED_GAME_TYPE``, is worth
+``DRAW_POINTS`` to both teams but is not counted as played. A season's
+results are added into team by round matrices whose cumulative sums along
+the rounds give the ladder after every round at once, so a round's ladder is
+known as soon as its scores are stored and the season page need not be
+parsed for it.
+
+The ladders scraped from AFL Tables are still parsed, and
+:func:`reconcile` lists every row where they and the computed ladders
+disagree. Run the module to check stored seasons::
+
+    $ python -m gamblor.ladder 2014 2015 2016
+
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from sqlalchemy import text
+
+from gamblor import BYE_POINTS, CANCELLED_GAME_TYPE, DRAW_POINTS, ODD_SEASON_BYE_POINTS, WIN_POINTS
+from gamblor import LADDER_TABLE_COLUMNS, LADDER_TABLE_KEYS, STATS_CONN
+from gamblor.db import connect, ladder_db_frame
+from gamblor.teams import TEAMS, decode_teams
+
+_BYE = TEAMS.index("Bye")
+
+def match_points(scores,
+                 opponent_scores):
+    """Return the premiership points each score earns against its opponent.
+
+    Args:
+        scores (ndarray): Final scores of the teams.
+        opponent_scores (ndarray): Final scores of their opponents.
+
+    Returns:
+        ndarray: ``WIN_POINTS``, ``DRAW_POINTS`` or 0 for each score.
+
+    """
+    return np.where(scores > opponent_scores,
+                    WIN_POINTS,
+                    np.where(scores == opponent_scores, DRAW_POINTS, 0))
+
+def bye_points(num_teams):
+    """Return the premiership points a bye is worth in a season.
+
+    Args:
+        num_teams (int): Number of teams in the season.
+
+    Returns:
+        int: ``ODD_SEASON_BYE_POINTS`` when the number of teams is odd, so a
+        team has a bye every round, and ``BYE_POINTS`` otherwise.
+
+    """
+    return ODD_SEASON_BYE_POINTS if num_teams % 2 else BYE_POINTS
+
+def percentage(scored,
+               conceded):
+    """Return points scored over points conceded, times 100.
+
+    Args:
+        scored (ndarray): Points scored by each team.
+        conceded (ndarray): Points conceded by each team.
+
+    Returns:
+        ndarray: The percentage of each team, 0 for a team that has
+        conceded nothing.
+
+    """
+    return np.where(conceded > 0, 100 * scored / np.where(conceded > 0, conceded, 1), 0)
+
+def season_ladders(scores_df):
+    """Compute the ladder after every round of the seasons in `scores_df`.
+
+    Args:
+        scores_df (DataFrame): Matches and byes as stored in ``Scores``,
+            teams as codes. Matches without a result earn nothing,
+            unless they were cancelled.
+
+    Returns:
+        DataFrame: Ladders as stored in ``Ladder``, one row per team and
+        round of each season, in ladder order within each round. A team
+        that has conceded nothing has a ``Percentage`` of 0.
+
+    """
+    ladders = []
+    for year, year_df in scores_df.groupby("Year", sort=True):
+        rounds = np.unique(year_df["Round"].to_numpy(dtype=np.int64))
+        home = year_df["HomeTeam"].to_numpy(dtype=np.int64)
+        away = year_df["AwayTeam"].to_numpy(dtype=np.int64)
+        teams = np.unique(np.concatenate([home, away]))
+        teams = teams[teams != _BYE]
+        columns = np.searchsorted(rounds, year_df["Round"].to_numpy(dtype=np.int64))
+
+        shape = (len(teams), len(rounds))
+        points = np.zeros(shape, dtype=np.int64)
+        played = np.zeros(shape, dtype=np.int64)
+        scored = np.zeros(shape)
+        conceded = np.zeros(shape)
+
+        bye = (home == _BYE) | (away == _BYE)
+        bye_cells = (np.searchsorted(teams, np.where(home == _BYE, away, home)[bye]), columns[bye])
+        np.add.at(points, bye_cells, bye_points(len(teams)))
+
+        home_scores = year_df["HomeFinalScore"].to_numpy(dtype=float, na_value=np.nan)
+        away_scores = year_df["AwayFinalScore"].to_numpy(dtype=float, na_value=np.nan)
+        result = ~bye & ~np.isnan(home_scores) & ~np.isnan(away_scores)
+
+        cancelled = year_df["GameType"].to_numpy(dtype=object) == CANCELLED_GAME_TYPE
+        cancelled_teams = np.concatenate([home[cancelled], away[cancelled]])
+        cancelled_cells = (np.searchsorted(teams, cancelled_teams), np.tile(columns[cancelled], 2))
+        np.add.at(points, cancelled_cells, DRAW_POINTS)
+
+        home_cells = (np.searchsorted(teams, home[result]), columns[result])
+        away_cells = (np.searchsorted(teams, away[result]), columns[result])
+        home_scores = home_scores[result]
+        away_scores = away_scores[result]
+        np.add.at(points, home_cells, match_points(home_scores, away_scores))
+        np.add.at(points, away_cells, match_points(away_scores, home_scores))
+        np.add.at(played, home_cells, 1)
+        np.add.at(played, away_cells, 1)
+        np.add.at(scored, home_cells, home_scores)
+        np.add.at(scored, away_cells, away_scores)
+        np.add.at(conceded, home_cells, away_scores)
+        np.add.at(conceded, away_cells, home_scores)
+
+        percentages = percentage(scored.cumsum(axis=1),
+                                 conceded.cumsum(axis=1))
+        ladders.append(pd.DataFrame({"Year": np.int64(year),
+                                     "Round": np.tile(rounds, len(teams)),
+                                     "Team": np.repeat(teams, len(rounds)),
+                                     "GamesPlayed": played.cumsum(axis=1).ravel(),
+                                     "Points": points.cumsum(axis=1).ravel(),
+                                     "Percentage": np.round(percentages.ravel(), 1)}))
+
+    if not ladders:
+        return pd.DataFrame({column: pd.Series(dtype="float64" if column == "Percentage"
+                                               else "int64")
+                             for column in LADDER_TABLE_COLUMNS})
+
+    ladder_df = pd.concat(ladders,
+                          ignore_index=True)
+    ladder_df = ladder_df.sort_values(["Year", "Round", "Points", "Percentage"],
+                                      ascending=[True, True, False, False],
+                                      kind="mergesort")
+    return ladder_df[LADDER_TABLE_COLUMNS].reset_index(drop=True)
+
+def stored_ladders(conn,
+                   year,
+                   rnd=None):
+    """Compute a season's ladders from its stored scores.
+
+    Args:
+        conn (:obj:`sqlalchemy.engine.Connection`): Open connection.
+        year (int): Season to compute.
+        rnd (:obj:`int`, optional): Last round to compute, every stored
+            round by default.
+
+    Returns:
+        DataFrame: Ladders as returned by :func:`season_ladders`.
+
+    """
+    query = "SELECT * FROM Scores WHERE Year = :year"
+    params = {"year": year}
+    if rnd is not None:
+        query += " AND Round <= :rnd"
+        params["rnd"] = rnd
+    scores_df = pd.read_sql_query(text(query),
+                                  conn,
+                                  params=params)
+    return season_ladders(scores_df)
+
+def decode_ladder(ladder_df):
+    """Return stored ladder rows as scraped: teams as a Categorical."""
+    ladder_df = ladder_df.copy()
+    ladder_df["Team"] = decode_teams(ladder_df["Team"])
+    return ladder_df
+
+def reconcile(computed_df,
+              scraped_df,
+              tolerance=0.05):
+    """List the ladder rows where the computed and scraped ladders disagree.
+
+    Args:
+        computed_df (DataFrame): Ladders as returned by
+            :func:`season_ladders`.
+        scraped_df (DataFrame): Ladders as stored in ``Ladder``, from
+            AFL Tables.
+        tolerance (float): Largest ``Percentage`` difference taken as
+            rounding.
+
+    Returns:
+        DataFrame: ``LADDER_TABLE_KEYS`` and each other column suffixed
+        with ``Computed`` and ``Scraped`` for every differing row, including
+        rows only one side has. Empty when the ladders agree.
+
+    """
+    merged = computed_df.merge(scraped_df,
+                               on=LADDER_TABLE_KEYS,
+                               how="outer",
+                               suffixes=("Computed", "Scraped"))
+    differs = (merged["GamesPlayedComputed"].ne(merged["GamesPlayedScraped"])
+               | merged["PointsComputed"].ne(merged["PointsScraped"])
+               | ~((merged["PercentageComputed"] - merged["PercentageScraped"]).abs() <= tolerance))
+    return merged[differs].sort_values(LADDER_TABLE_KEYS).reset_index(drop=True)
+
+def reconcile_seasons(years,
+                      conn_info=STATS_CONN):
+    """Diff the ladders computed from stored scores against AFL Tables.
+
+    Args:
+        years (iterable of int): Seasons to check; their scores must be
+            stored.
+        conn_info (str): String containing the statistics database connection info.
+
+    Returns:
+        DataFrame: Differing rows as returned by :func:`reconcile`.
+
+    """
+    # Only reconciling needs the scraped ladders.
+    from gamblor.data_collection import season_parse
+
+    differences = []
+    with connect(conn_info) as conn:
+        for year in years:
+            computed_df = stored_ladders(conn,
+                                         year)
+            parse = season_parse(year)
+            scraped_df = pd.concat([parse.round_ladder(rnd) for rnd in parse.rounds],
+                                   ignore_index=True)
+            scraped_df = ladder_db_frame(scraped_df)
+            # Only rounds with stored scores can be compared.
+            scraped_df = scraped_df[scraped_df["Round"].isin(computed_df["Round"])]
+            differences.append(reconcile(computed_df,
+                                         scraped_df))
+
+    return pd.concat(differences,
+                     ignore_index=True)
+
+def main(args):
+    differences = reconcile_seasons(args.years,
+                                    conn_info=args.conn_info)
+    if differences.empty:
+        print("Ladders agree for {}".format(", ".join(str(year) for year in args.years)))
+        return 0
+
+    differences["Team"] = decode_teams(differences["Team"])
+    print(differences.to_string(index=False))
+    return 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile computed ladders with AFL Tables.")
+    parser.add_argument("years",
+                        type=int,
+                        nargs="+",
+                        help="Seasons to reconcile.")
+    parser.add_argument("--conn_info", "-c",
+                        type=str,
+                        default=STATS_CONN,
+                        help="Statistics database connection info.")
+
+    sys.exit(main(parser.parse_args()))
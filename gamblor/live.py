@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""Incremental in-season updates from the AFL Tables season pages.
+
+A :class:`LivePoller` revalidates each season page with a conditional
+request on every poll. When the page is unchanged since the last poll
+nothing else happens, so an idle poll costs one ``304`` round trip. When it
+has changed, each round's parsed scores and the ladder computed from them
+are fingerprinted and compared with the fingerprints stored alongside the
+``Scores`` and ``Ladder`` tables, and only rounds whose fingerprint differs
+are upserted, together with their odds, in one transaction. Stored rows of
+those rounds that are no longer on the page, such as a rescheduled match,
+are deleted in the same transaction.
+
+The statistics tables must already exist, with the unique indexes the
+pipeline tasks create, as rows are upserted on them.
+
+Example:
+    Poll the 2019 season every five minutes::
+
+        run_live([2019], interval=300)
+
+"""
+import hashlib
+import logging
+import time
+
+import pandas as pd
+import sqlalchemy
+
+from gamblor import FINGERPRINT_TABLE, LIVE_POLL_INTERVAL, ODDS_URL_DICT, STATS_CONN
+from gamblor import SCORES_TABLE_KEYS, LADDER_TABLE_KEYS, ODDS_TABLE_KEYS
+from gamblor.data_collection import season_parse, season_url, stored_matches, odds_table
+from gamblor.db import bulk_insert, get_engine, scores_db_frame, ladder_db_frame, odds_db_frame
+from gamblor.fetch import default_fetcher
+from gamblor.http_cache import PageCache
+from gamblor.ladder import decode_ladder, season_ladders
+
+logger = logging.getLogger(__name__)
+
+def frame_fingerprint(frame):
+    """Return a digest of the values in `frame`.
+
+    Args:
+        frame (DataFrame): Rows to fingerprint.
+
+    Returns:
+        str: Hex digest that changes whenever any value or row changes.
+
+    """
+    hashes = pd.util.hash_pandas_object(frame,
+                                        index=False)
+    return hashlib.sha256(hashes.to_numpy().tobytes()).hexdigest()
+
+class LivePoller(object):
+    """Keep the statistics tables in step with the live season pages.
+
+    Attributes:
+        years (list of int): Seasons to poll.
+        conn_info (str): String containing the statistics database connection info.
+        cache (PageCache): Cache the pages are revalidated through.
+
+    """
+    def __init__(self,
+                 years,
+                 conn_info=STATS_CONN,
+                 cache=None):
+        self.years = sorted(set(years))
+        self.conn_info = conn_info
+        self.cache = cache
+        if self.cache is None:
+            # Always revalidate, a conditional request is cheap.
+            self.cache = PageCache(ttl=0,
+                                   session=default_fetcher())
+
+        self._digests = {}
+        self._tables = None
+
+    def poll(self):
+        """Check every season once and store any changed rounds.
+
+        Returns:
+            list of tuple: ``(year, rnd)`` of the rounds that were stored.
+
+        """
+        changed = []
+        for year in self.years:
+            changed.extend(self.poll_season(year))
+        return changed
+
+    def poll_season(self,
+                    year):
+        """Check one season and store its changed rounds.
+
+        Args:
+            year (int): Season to check.
+
+        Returns:
+            list of tuple: ``(year, rnd)`` of the rounds that were stored.
+
+        """
+        content = self.cache.get(season_url(year))
+        digest = hashlib.sha256(content).hexdigest()
+        if self._digests.get(year) == digest:
+            return []
+
+        parse = season_parse(year,
+                             content=content)
+        ladders_df = decode_ladder(season_ladders(scores_db_frame(parse.season_scores())))
+        rounds = {}
+        for rnd in parse.rounds:
+            scores_df = parse.round_scores(rnd)
+            ladder_df = ladders_df[ladders_df["Round"] == rnd].reset_index(drop=True)
+            rounds[rnd] = (scores_df,
+                           ladder_df,
+                           frame_fingerprint(scores_df),
+                           frame_fingerprint(ladder_df))
+
+        tables = self._load_tables()
+        with get_engine(self.conn_info).begin() as conn:
+            stored = self._stored_fingerprints(conn,
+                                               year)
+            changed = [rnd for rnd in sorted(rounds) if stored.get(rnd) != rounds[rnd][2:]]
+            if changed:
+                self._store_rounds(conn,
+                                   tables,
+                                   year,
+                                   [(rnd,) + rounds[rnd] for rnd in changed])
+
+        self._digests[year] = digest
+        return [(year, rnd) for rnd in changed]
+
+    def _load_tables(self):
+        if self._tables is not None:
+            return self._tables
+
+        engine = get_engine(self.conn_info)
+        metadata = sqlalchemy.MetaData()
+        fingerprints = sqlalchemy.Table(FINGERPRINT_TABLE,
+                                        metadata,
+                                        sqlalchemy.Column("Year", sqlalchemy.Integer(), primary_key=True),
+                                        sqlalchemy.Column("Round", sqlalchemy.Integer(), primary_key=True),
+                                        sqlalchemy.Column("ScoresDigest", sqlalchemy.Text()),
+                                        sqlalchemy.Column("LadderDigest", sqlalchemy.Text()))
+        metadata.create_all(engine,
+                            tables=[fingerprints])
+
+        self._tables = {"Fingerprints": fingerprints}
+        for name in ("Scores", "Ladder", "Odds"):
+            self._tables[name] = sqlalchemy.Table(name,
+                                                  metadata,
+                                                  autoload_with=engine)
+        return self._tables
+
+    def _stored_fingerprints(self,
+                             conn,
+                             year):
+        fingerprints = self._tables["Fingerprints"]
+        query = sqlalchemy.select(fingerprints.c.Round,
+                                  fingerprints.c.ScoresDigest,
+                                  fingerprints.c.LadderDigest).where(fingerprints.c.Year == year)
+        return {row[0]: (row[1], row[2]) for row in conn.execute(query)}
+
+    def _store_rounds(self,
+                      conn,
+                      tables,
+                      year,
+                      rounds):
+        changed = [rnd for rnd, _, _, _, _ in rounds]
+        scores_df = scores_db_frame(pd.concat([scores for _, scores, _, _, _ in rounds],
+                                              ignore_index=True))
+        bulk_insert(conn,
+                    tables["Scores"],
+                    scores_df,
+                    conflict_keys=SCORES_TABLE_KEYS)
+        _delete_missing(conn,
+                        tables["Scores"],
+                        year,
+                        changed,
+                        scores_df,
+                        SCORES_TABLE_KEYS)
+
+        ladder_df = ladder_db_frame(pd.concat([ladder for _, _, ladder, _, _ in rounds],
+                                              ignore_index=True))
+        bulk_insert(conn,
+                    tables["Ladder"],
+                    ladder_df,
+                    conflict_keys=LADDER_TABLE_KEYS)
+        _delete_missing(conn,
+                        tables["Ladder"],
+                        year,
+                        changed,
+                        ladder_df,
+                        LADDER_TABLE_KEYS)
+
+        if year in ODDS_URL_DICT:
+            matches_df = stored_matches(conn,
+                                        year)
+            odds_df = odds_db_frame(odds_table(year,
+                                               matches_df[matches_df["Round"].isin(changed)]))
+            bulk_insert(conn,
+                        tables["Odds"],
+                        odds_df,
+                        conflict_keys=ODDS_TABLE_KEYS)
+            # Also drops the odds of matches deleted above.
+            _delete_missing(conn,
+                            tables["Odds"],
+                            year,
+                            changed,
+                            odds_df,
+                            ODDS_TABLE_KEYS)
+
+        fingerprints_df = pd.DataFrame({"Year": year,
+                                        "Round": [rnd for rnd, _, _, _, _ in rounds],
+                                        "ScoresDigest": [digest for _, _, _, digest, _ in rounds],
+                                        "LadderDigest": [digest for _, _, _, _, digest in rounds]})
+        bulk_insert(conn,
+                    tables["Fingerprints"],
+                    fingerprints_df,
+                    conflict_keys=["Year", "Round"])
+
+def _delete_missing(conn,
+                    table,
+                    year,
+                    rounds,
+                    frame,
+                    keys):
+    """Delete the stored rows of `rounds` whose `keys` are not in `frame`."""
+    columns = [table.c[key] for key in keys]
+    query = sqlalchemy.select(*columns).where(table.c.Year == year) \
+                                       .where(table.c.Round.in_(rounds))
+    stored_df = pd.DataFrame(conn.execute(query).fetchall(),
+                             columns=keys)
+    stale_df = stored_df.merge(frame[keys].drop_duplicates(),
+                               on=keys,
+                               how="left",
+                               indicator=True)
+    for values in stale_df.loc[stale_df["_merge"] == "left_only", keys].to_numpy(dtype=object).tolist():
+        conn.execute(table.delete().where(sqlalchemy.and_(*[column == int(value)
+                                                            for column, value in zip(columns, values)])))
+
+def run_live(years,
+             interval=LIVE_POLL_INTERVAL,
+             conn_info=STATS_CONN,
+             polls=None):
+    """Poll the season pages until interrupted.
+
+    Args:
+        years (iterable of int): Seasons to poll.
+        interval (float): Seconds between the start of consecutive polls.
+        conn_info (str): String containing the statistics database connection info.
+        polls (:obj:`int`, optional): Stop after this many polls.
+
+    """
+    poller = LivePoller(years,
+                        conn_info=conn_info)
+    count = 0
+    while polls is None or count < polls:
+        start = time.time()
+        changed = poller.poll()
+        logger.info("Polled in %.3fs, %d rounds updated: %s",
+                    time.time() - start,
+                    len(changed),
+                    changed)
+        count += 1
+        if polls is None or count < polls:
+            time.sleep(max(interval - (time.time() - start), 0))
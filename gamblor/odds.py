@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""Betfair odds workbooks converted once into a columnar store.
+
+The Betfair data dumps are large Excel workbooks, one of which covers six
+seasons. Reading them is by far the slowest step of a scrape, so each
+workbook is read a single time, filtered down to pre-match AFL match odds,
+its team names resolved to team codes and written out as Parquet with one
+row group per season. Later lookups read just the columns and seasons they
+need from that file.
+
+Example:
+    Load the 2015 pre-match prices::
+
+        odds_df = load_odds(2015, columns=["HomeTeam", "AwayTeam", "Team", "Odds"])
+        home_prices = odds_df[odds_df["Team"] == odds_df["HomeTeam"]]
+
+"""
+import ntpath
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from gamblor import BETFAIR_DIR, ODDS_URL_DICT, CHROME_USER_AGENT
+from gamblor.http_cache import fetch
+from gamblor.instrument import stage
+from gamblor.teams import team_codes
+
+ODDS_STORE_COLUMNS = ["Year", "HomeTeam", "AwayTeam", "Team", "Odds", "SettleDate"]
+
+# Rows above the column names, for workbooks that do not start with them.
+WORKBOOK_HEADER_ROWS = {"AFL-Data-Dump-2017.xlsx": 3}
+
+def workbook_path(url):
+    """Return where the workbook at `url` is kept on disk."""
+    return os.path.join(BETFAIR_DIR,
+                        ntpath.basename(url))
+
+def store_path(url):
+    """Return where the converted form of the workbook at `url` is kept."""
+    filename = os.path.splitext(ntpath.basename(url))[0] + ".parquet"
+    return os.path.join(BETFAIR_DIR,
+                        filename)
+
+def download_workbook(url):
+    """Download the workbook at `url` unless it is already on disk.
+
+    Args:
+        url (str): Address of a Betfair workbook.
+
+    Returns:
+        str: Path of the workbook.
+
+    """
+    filepath = workbook_path(url)
+    if not os.path.isfile(filepath):
+        content = fetch(url, headers=CHROME_USER_AGENT)
+        # Write under a private name first so parallel workers never read a
+        # partly written workbook.
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        tmp_path = "{}.{}.tmp".format(filepath, os.getpid())
+        with open(tmp_path, "wb") as excel_file:
+            excel_file.write(content)
+        os.replace(tmp_path, filepath)
+
+    return filepath
+
+def read_workbook(filepath):
+    """Read a Betfair workbook and keep only pre-match AFL match odds.
+
+    Args:
+        filepath (str): Path of the workbook.
+
+    Returns:
+        DataFrame: One row per selection with ``ODDS_STORE_COLUMNS``, teams
+        given as their :mod:`gamblor.teams` codes.
+
+    """
+    filename = ntpath.basename(filepath)
+
+    odds_df = pd.read_excel(filepath,
+                            header=WORKBOOK_HEADER_ROWS.get(filename, 0))
+    odds_df.columns = [x.lower() for x in odds_df.columns]
+
+    if filename == "AFL-2011-2016.xlsx":
+        odds_df.rename(columns={"path": "paths"},
+                       inplace=True)
+
+    odds_df = odds_df[(odds_df["inplay"] == "N") & \
+                      (odds_df["event_name"] == "Match Odds")]
+    odds_df = odds_df[odds_df["paths"].str.contains("AFL")]
+    odds_df = odds_df[~odds_df["paths"].str.contains("WAFL", regex=False)]
+    odds_df = odds_df[~odds_df["selection_name"].str.contains("(W)", regex=False)]
+
+    if filename == "AFL-2011-2016.xlsx":
+        year = odds_df["paths"].str.split("/", expand=True)[0].str.split(" ", expand=True)[1].astype(int)
+    else:
+        year = odds_df["sett_date"].dt.year.astype(int)
+
+    if "sett_date" in odds_df.columns:
+        settle_date = pd.to_datetime(odds_df["sett_date"])
+    else:
+        settle_date = pd.Series(pd.NaT, index=odds_df.index)
+
+    teams = odds_df["parent_event_name"].str.split("v", expand=True)
+    store_df = pd.DataFrame({"Year": year.values,
+                             "HomeTeam": team_codes(teams[0].str.strip().values, errors="coerce"),
+                             "AwayTeam": team_codes(teams[1].str.strip().values, errors="coerce"),
+                             "Team": team_codes(odds_df["selection_name"].values, errors="coerce"),
+                             "Odds": odds_df["wap"].astype(float).values,
+                             "SettleDate": settle_date.values.astype("datetime64[ns]")},
+                            columns=ODDS_STORE_COLUMNS)
+
+    # Markets on anything but two known teams can never be matched to Scores.
+    known = (store_df[["HomeTeam", "AwayTeam", "Team"]] >= 0).all(axis=1)
+    store_df = store_df[known]
+
+    return store_df.sort_values("Year",
+                                kind="mergesort").reset_index(drop=True)
+
+def convert_workbook(url):
+    """Convert the workbook at `url` to Parquet if not already done.
+
+    The conversion is redone whenever the workbook is newer than its
+    converted copy.
+
+    Args:
+        url (str): Address of a Betfair workbook.
+
+    Returns:
+        str: Path of the converted file.
+
+    """
+    filepath = download_workbook(url)
+    parquet_path = store_path(url)
+    if os.path.isfile(parquet_path) and \
+       os.path.getmtime(parquet_path) >= os.path.getmtime(filepath):
+        return parquet_path
+
+    with stage("read_workbook", workbook=ntpath.basename(filepath)) as read:
+        store_df = read_workbook(filepath)
+        read.add(bytes=os.path.getsize(filepath),
+                 rows=len(store_df))
+    table = pa.Table.from_pandas(store_df,
+                                 preserve_index=False)
+
+    tmp_path = "{}.{}.tmp".format(parquet_path, os.getpid())
+    with pq.ParquetWriter(tmp_path, table.schema) as writer:
+        # One row group per season, so a season is read without the others.
+        for year in sorted(store_df["Year"].unique()):
+            mask = pa.array((store_df["Year"] == year).values)
+            writer.write_table(table.filter(mask))
+    os.replace(tmp_path, parquet_path)
+
+    return parquet_path
+
+def load_odds(year,
+              columns=None):
+    """Load the pre-match prices of one season.
+
+    Args:
+        year (int): Season to load.
+        columns (:obj:`list` of :obj:`str`, optional): Columns to read, all
+            of ``ODDS_STORE_COLUMNS`` by default.
+
+    Returns:
+        DataFrame: The season's rows of the converted workbook.
+
+    """
+    parquet_path = convert_workbook(ODDS_URL_DICT[year])
+
+    return pd.read_parquet(parquet_path,
+                           columns=columns,
+                           filters=[("Year", "==", int(year))],
+                           memory_map=True)
+
+class OddsIndex(object):
+    """Pre-match prices of one season keyed by fixture.
+
+    Each entry maps ``(Year, HomeTeam, AwayTeam, date)`` to the weighted
+    average price of the home and away selections, where the teams are team
+    codes and the date is the market's settlement date. Workbooks without
+    settlement dates are keyed with a date of ``None``. Fixtures with a
+    single market in the season are also keyed by ``(Year, HomeTeam,
+    AwayTeam)`` alone.
+
+    Attributes:
+        year (int): Season the index covers.
+        source (tuple): Modification time and size of the workbook the
+            index was built from.
+
+    """
+    def __init__(self,
+                 year,
+                 odds_df,
+                 source=None):
+        self.year = year
+        self.source = source
+
+        self._prices = {}
+        self._fixtures = {}
+        self._build(odds_df)
+
+    def __len__(self):
+        return len(self._prices)
+
+    def lookup(self,
+               home_team,
+               away_team,
+               game_time=None):
+        """Return the home and away prices of a fixture.
+
+        Markets settle on the day of the match or, for night matches, the day
+        after, so both dates are tried first. A market settled later, e.g.
+        for a postponed match, is still found when it is the season's only
+        one for the fixture, and so is an undated entry.
+
+        Args:
+            home_team (int): Code of the fixture's home team.
+            away_team (int): Code of the fixture's away team.
+            game_time (:obj:`datetime`, optional): Start of the match.
+
+        Returns:
+            tuple of float: Home and away prices, or None if not priced.
+
+        """
+        if game_time is not None and not pd.isnull(game_time):
+            game_date = pd.Timestamp(game_time).normalize()
+            for date in (game_date, game_date + pd.Timedelta(days=1)):
+                prices = self._prices.get((self.year, home_team, away_team, date))
+                if prices is not None:
+                    return prices
+
+        prices = self._prices.get((self.year, home_team, away_team, None))
+        if prices is not None:
+            return prices
+        return self._fixtures.get((self.year, home_team, away_team))
+
+    def _build(self,
+               odds_df):
+        home_df = odds_df[odds_df["Team"] == odds_df["HomeTeam"]]
+        away_df = odds_df[odds_df["Team"] == odds_df["AwayTeam"]]
+
+        keys = ["Year", "HomeTeam", "AwayTeam", "Date"]
+        fixtures_df = home_df.assign(Date=home_df["SettleDate"].dt.normalize()) \
+                             .drop_duplicates(subset=keys, keep="first") \
+                             .merge(away_df.assign(Date=away_df["SettleDate"].dt.normalize())
+                                           .drop_duplicates(subset=keys, keep="first"),
+                                    on=keys,
+                                    suffixes=("Home", "Away"))
+
+        dates = fixtures_df["Date"].astype(object).where(fixtures_df["Date"].notna(), None)
+        self._prices = dict(zip(zip(fixtures_df["Year"].tolist(),
+                                    fixtures_df["HomeTeam"].tolist(),
+                                    fixtures_df["AwayTeam"].tolist(),
+                                    dates.tolist()),
+                                zip(fixtures_df["OddsHome"].tolist(),
+                                    fixtures_df["OddsAway"].tolist())))
+
+        fixture_keys = ["Year", "HomeTeam", "AwayTeam"]
+        unique_df = fixtures_df.drop_duplicates(subset=fixture_keys, keep=False)
+        self._fixtures = dict(zip(zip(unique_df["Year"].tolist(),
+                                      unique_df["HomeTeam"].tolist(),
+                                      unique_df["AwayTeam"].tolist()),
+                                  zip(unique_df["OddsHome"].tolist(),
+                                      unique_df["OddsAway"].tolist())))
+
+_ODDS_INDEXES = {}
+
+def odds_index(year):
+    """Return the odds index of a season, building it on first use.
+
+    The index is kept for the life of the process and rebuilt whenever the
+    season's workbook changes on disk.
+
+    Args:
+        year (int): Season to index.
+
+    Returns:
+        OddsIndex: Prices of the season keyed by fixture.
+
+    """
+    parquet_path = convert_workbook(ODDS_URL_DICT[year])
+    workbook_stat = os.stat(workbook_path(ODDS_URL_DICT[year]))
+    source = (workbook_stat.st_mtime, workbook_stat.st_size)
+
+    index = _ODDS_INDEXES.get(year)
+    if index is None or index.source != source:
+        odds_df = pd.read_parquet(parquet_path,
+                                  filters=[("Year", "==", int(year))],
+                                  memory_map=True)
+        index = OddsIndex(year,
+                          odds_df,
+                          source=source)
+        _ODDS_INDEXES[year] = index
+
+    return index
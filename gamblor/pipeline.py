@@ -32,19 +32,21 @@ Todo:
    http://google.github.io/styleguide/pyguide.html
 
 """
-import os
 import datetime
+import logging
 import luigi
 import argparse
+import sqlalchemy
 
 from datetime import datetime, date
 from luigi.contrib import sqla
 
-import pandas as pd
-
-from gamblor.data_collection import scrape_score_table, scrape_ladder_table, scrape_odds_table
-from gamblor.data_collection import round_before, next_round, next_match_date
-from gamblor import SCORE_DIR, LADDER_DIR, ODDS_DIR, MIN_YEAR, STATS_CONN, LUIGI_LADDER_TABLE_COLUMNS, LUIGI_SCORES_TABLE_COLUMNS, LUIGI_ODDS_TABLE_COLUMNS
+# Submodules are imported by the tasks that use them, so starting the CLI
+# pays only for Luigi and SQLAlchemy until work is scheduled.
+from gamblor import instrument
+from gamblor import MIN_YEAR, STATS_CONN, LUIGI_LADDER_TABLE_COLUMNS, LUIGI_SCORES_TABLE_COLUMNS, LUIGI_ODDS_TABLE_COLUMNS
+from gamblor import LUIGI_RATINGS_TABLE_COLUMNS, RATINGS_TABLE_INDEXES, RATINGS_TABLE_KEYS
+from gamblor import LIVE_POLL_INTERVAL, ODDS_URL_DICT, PIPELINE_WORKERS, SCORES_TABLE_INDEXES, SCORES_TABLE_KEYS, LADDER_TABLE_KEYS, ODDS_TABLE_KEYS
 
 START_DATE = str(MIN_YEAR) + "-01-01"
 END_DATE = date.today().strftime("%Y-%m-%d")
@@ -83,10 +85,16 @@ class CreateScoresFile(luigi.Task):
             True if successful, False otherwise.
 
         """
+        from gamblor.data_collection import scrape_score_table
+        from gamblor.store import write_partition
+
         scores_df = scrape_score_table(scrape_year=self.year,
                                        scrape_rnd=self.rnd)
 
-        scores_df.to_pickle(self.output().path)
+        write_partition("scores",
+                        scores_df,
+                        self.year,
+                        self.rnd)
 
     def output(self):
         """Class methods are similar to regular functions.
@@ -102,9 +110,11 @@ class CreateScoresFile(luigi.Task):
             True if successful, False otherwise.
 
         """
-        ouput_path = os.path.join(SCORE_DIR,
-                                  "{}-{}.pkl".format(self.year, self.rnd))
-        return luigi.LocalTarget(ouput_path)
+        from gamblor.store import partition_path
+
+        return luigi.LocalTarget(partition_path("scores",
+                                                self.year,
+                                                self.rnd))
 
 class CreateLadderFile(luigi.Task):
     """The summary line for a class docstring should fit on one line.
@@ -125,6 +135,10 @@ class CreateLadderFile(luigi.Task):
     year = luigi.IntParameter(default=MIN_YEAR)
     rnd = luigi.IntParameter(default=1)
 
+    def requires(self):
+        # The ladder after a round sums every result of the season so far.
+        return [WriteScoresToDB(self.year, rnd) for rnd in range(1, self.rnd + 1)]
+
     def run(self):
         """Class methods are similar to regular functions.
 
@@ -139,10 +153,19 @@ class CreateLadderFile(luigi.Task):
             True if successful, False otherwise.
 
         """
-        scores_df = scrape_ladder_table(scrape_year=self.year,
-                                        scrape_rnd=self.rnd)
+        from gamblor.db import connect
+        from gamblor.ladder import decode_ladder, stored_ladders
+        from gamblor.store import write_partition
+
+        with connect(STATS_CONN) as conn:
+            ladder_df = stored_ladders(conn,
+                                       self.year,
+                                       self.rnd)
 
-        scores_df.to_pickle(self.output().path)
+        write_partition("ladder",
+                        decode_ladder(ladder_df[ladder_df["Round"] == self.rnd]),
+                        self.year,
+                        self.rnd)
 
     def output(self):
         """Class methods are similar to regular functions.
@@ -158,9 +181,11 @@ class CreateLadderFile(luigi.Task):
             True if successful, False otherwise.
 
         """
-        ouput_path = os.path.join(LADDER_DIR,
-                                  "{}-{}.pkl".format(self.year, self.rnd))
-        return luigi.LocalTarget(ouput_path)
+        from gamblor.store import partition_path
+
+        return luigi.LocalTarget(partition_path("ladder",
+                                                self.year,
+                                                self.rnd))
 
 class CreateOddsFile(luigi.Task):
     """The summary line for a class docstring should fit on one line.
@@ -198,10 +223,16 @@ class CreateOddsFile(luigi.Task):
             True if successful, False otherwise.
 
         """
+        from gamblor.data_collection import scrape_odds_table
+        from gamblor.store import write_partition
+
         odds_df = scrape_odds_table(scrape_year=self.year,
                                     scrape_rnd=self.rnd)
 
-        odds_df.to_pickle(self.output().path)
+        write_partition("odds",
+                        odds_df,
+                        self.year,
+                        self.rnd)
 
     def output(self):
         """Class methods are similar to regular functions.
@@ -217,111 +248,458 @@ class CreateOddsFile(luigi.Task):
             True if successful, False otherwise.
 
         """
-        ouput_path = os.path.join(ODDS_DIR,
-                                  "{}-{}.pkl".format(self.year, self.rnd))
-        return luigi.LocalTarget(ouput_path)
+        from gamblor.store import partition_path
+
+        return luigi.LocalTarget(partition_path("odds",
+                                                self.year,
+                                                self.rnd))
+
+class MarkerTarget(sqla.SQLAlchemyTarget):
+    """Marker row of a loading task, checked on the shared pooled engine.
+
+    ``SQLAlchemyTarget.exists`` queries the marker table with the
+    ``select([table])`` form that SQLAlchemy 2 rejects, so the check is
+    made here with ``select(column)``, which 1.4 accepts as well.
+
+    """
+    @property
+    def engine(self):
+        from gamblor.db import get_engine
+
+        return get_engine(self.connection_string)
+
+    def exists(self):
+        from gamblor.db import connect
+
+        if self.marker_table_bound is None:
+            self.create_marker_table()
+        table = self.marker_table_bound
+        query = sqlalchemy.select(table.c.update_id) \
+                          .where(table.c.update_id == self.update_id) \
+                          .where(table.c.target_table == self.target_table) \
+                          .limit(1)
+        with connect(self.connection_string) as conn:
+            return conn.execute(query).first() is not None
+
+class BulkCopyToTable(sqla.CopyToTable):
+    """Copy a DataFrame into a table with column-wise bulk inserts.
+
+    Subclasses implement :meth:`frame` instead of ``rows``. The frame's
+    columns are handed to the driver as arrays in chunked ``executemany``
+    calls inside one transaction, so no per-row Series is ever built.
+    Columns of the table missing from the frame, such as an autoincrement
+    key, are left to the database.
+
+    Attributes:
+        indexes (dict): Secondary indexes to create with the table, mapping
+            index names to lists of column names.
+        conflict_keys (list): Columns identifying a row. When set, they get
+            a unique index unless they are the primary key, and loading a row
+            that is already stored updates it in place, so a round can be
+            loaded again safely.
+
+    """
+    indexes = {}
+    conflict_keys = None
+
+    def create_table(self,
+                     engine):
+        super(BulkCopyToTable, self).create_table(engine)
+        for name, columns in self.indexes.items():
+            index = sqlalchemy.Index(name,
+                                     *[self.table_bound.c[column] for column in columns])
+            index.create(engine, checkfirst=True)
+        primary_key = set(column.name for column in self.table_bound.primary_key.columns)
+        if self.conflict_keys is not None and set(self.conflict_keys) != primary_key:
+            index = sqlalchemy.Index("ux_{}_{}".format(self.table, "_".join(self.conflict_keys)),
+                                     *[self.table_bound.c[column] for column in self.conflict_keys],
+                                     unique=True)
+            index.create(engine, checkfirst=True)
+
+    def output(self):
+        return MarkerTarget(connection_string=self.connection_string,
+                            target_table=self.table,
+                            update_id=self.update_id(),
+                            connect_args=self.connect_args,
+                            echo=self.echo)
+
+    def frame(self):
+        """Return the rows to load, with columns named after the table's.
+
+        Returns:
+            DataFrame: Rows to insert.
+
+        """
+        raise NotImplementedError
+
+    def rows(self):
+        from gamblor.db import column_values
 
-class WriteScoresToDB(sqla.CopyToTable):
+        frame = self.frame()
+        values = dict(zip(frame.columns, column_values(frame)))
+        missing = [None] * len(frame)
+        return zip(*[values.get(column[0][0], missing) for column in self.columns])
+
+    def run(self):
+        from gamblor.db import bulk_insert, get_engine
+
+        output = self.output()
+        engine = get_engine(self.connection_string)
+        self.create_table(engine)
+        year = getattr(self, "year", None)
+        rnd = getattr(self, "rnd", None)
+        with instrument.stage("frame", year, rnd, table=self.table) as framed:
+            frame = self.frame()
+            framed.add(rows=len(frame))
+        with instrument.stage("load", year, rnd, table=self.table) as loaded:
+            with engine.begin() as conn:
+                loaded.add(inserted=bulk_insert(conn,
+                                                self.table_bound,
+                                                frame,
+                                                chunk_size=self.chunk_size,
+                                                conflict_keys=self.conflict_keys))
+        output.touch()
+
+class WriteScoresToDB(BulkCopyToTable):
     year = luigi.IntParameter(default=MIN_YEAR)
     rnd = luigi.IntParameter(default=1)
     
     columns = LUIGI_SCORES_TABLE_COLUMNS
+    indexes = SCORES_TABLE_INDEXES
+    conflict_keys = SCORES_TABLE_KEYS
     connection_string = STATS_CONN
     table = "Scores"  # name of the table to store data
 
     def requires(self):
         return CreateScoresFile(self.year, self.rnd)
 
-    def rows(self):
-        scores_df = pd.read_pickle(self.input().path)
-        scores_df["GameTime"] = scores_df["GameTime"].dt.strftime("%Y-%m-%d %H:%M")
-        for m, match in scores_df.iterrows():
-            yield (None,
-                   match["Year"],
-                   match["Round"],
-                   match["GameType"],
-                   match["Venue"],
-                   match["GameTime"],
-                   match["HomeTeam"],
-                   match["AwayTeam"],
-                   match["HomeFinalScore"],
-                   match["AwayFinalScore"],
-                   match["HomeQ1Goals"], match["HomeQ1Points"],
-                   match["HomeQ2Goals"], match["HomeQ2Points"],
-                   match["HomeQ3Goals"], match["HomeQ3Points"],
-                   match["HomeQ4Goals"], match["HomeQ4Points"],
-                   match["AwayQ1Goals"], match["AwayQ1Points"],
-                   match["AwayQ2Goals"], match["AwayQ2Points"],
-                   match["AwayQ3Goals"], match["AwayQ3Points"],
-                   match["AwayQ4Goals"], match["AwayQ4Points"],
-                   )
-
-class WriteLadderToDB(sqla.CopyToTable):
+    def frame(self):
+        from gamblor.db import scores_db_frame
+        from gamblor.store import read_partition
+
+        return scores_db_frame(read_partition("scores",
+                                              self.year,
+                                              self.rnd))
+
+class WriteLadderToDB(BulkCopyToTable):
     year = luigi.IntParameter(default=MIN_YEAR)
     rnd = luigi.IntParameter(default=1)
 
     columns = LUIGI_LADDER_TABLE_COLUMNS
+    conflict_keys = LADDER_TABLE_KEYS
     connection_string = STATS_CONN
     table = "Ladder"  # name of the table to store data
 
     def requires(self):
         return CreateLadderFile(self.year, self.rnd)
 
-    def rows(self):
-        ladder_df = pd.read_pickle(self.input().path)
-        for _, team in ladder_df.iterrows():
-            yield (team["Year"],
-                   team["Round"],
-                   team["Team"],
-                   team["GamesPlayed"],
-                   team["Points"],
-                   team["Percentage"])
-
-class WriteOddsToDB(sqla.CopyToTable):
+    def frame(self):
+        from gamblor.db import ladder_db_frame
+        from gamblor.store import read_partition
+
+        return ladder_db_frame(read_partition("ladder",
+                                              self.year,
+                                              self.rnd))
+
+class WriteOddsToDB(BulkCopyToTable):
     year = luigi.IntParameter(default=MIN_YEAR)
     rnd = luigi.IntParameter(default=1)
     
     columns = LUIGI_ODDS_TABLE_COLUMNS
+    conflict_keys = ODDS_TABLE_KEYS
     connection_string = STATS_CONN
     table = "Odds"  # name of the table to store data
 
     def requires(self):
         return CreateOddsFile(self.year, self.rnd)
 
-    def rows(self):
-        odds_df = pd.read_pickle(self.input().path)
-        odds_df["GameTime"] = odds_df["GameTime"].dt.strftime("%Y-%m-%d %H:%M")
-        for o, odd in odds_df.iterrows():
-            yield (odd["MatchID"],
-                   odd["Year"],
-                   odd["Round"],
-                   odd["GameTime"],
-                   odd["Team"],
-                   odd["Odds"])
+    def frame(self):
+        from gamblor.db import odds_db_frame
+        from gamblor.store import read_partition
+
+        return odds_db_frame(read_partition("odds",
+                                            self.year,
+                                            self.rnd))
+
+class UpdateRatings(BulkCopyToTable):
+    """Rate every match up to a round that has no rating yet.
+
+    Matches are rated from the earliest round still missing ratings, so the
+    task can run for the latest round of a range once and still rate every
+    round before it in order.
+
+    Attributes:
+        year (int): Season of the last round to rate.
+        rnd (int): Last round to rate.
+
+    """
+    year = luigi.IntParameter(default=MIN_YEAR)
+    rnd = luigi.IntParameter(default=1)
+
+    columns = LUIGI_RATINGS_TABLE_COLUMNS
+    indexes = RATINGS_TABLE_INDEXES
+    conflict_keys = RATINGS_TABLE_KEYS
+    connection_string = STATS_CONN
+    table = "Ratings"  # name of the table to store data
+
+    def requires(self):
+        return WriteScoresToDB(self.year, self.rnd)
+
+    def frame(self):
+        from gamblor.db import connect
+        from gamblor.ratings import pending_ratings
+
+        with connect(self.connection_string) as conn:
+            return pending_ratings(conn,
+                                   self.year,
+                                   self.rnd)
+
+class UpdateFeatures(luigi.Task):
+    """Store the team features of a round once its scores and ladder are loaded.
+
+    Features only look back at earlier rounds, which must already be in the
+    database.
+
+    Attributes:
+        year (int): Season of the round.
+        rnd (int): Round of the season.
+
+    """
+    year = luigi.IntParameter(default=MIN_YEAR)
+    rnd = luigi.IntParameter(default=1)
+
+    def requires(self):
+        return [WriteScoresToDB(self.year, self.rnd),
+                WriteLadderToDB(self.year, self.rnd)]
+
+    def run(self):
+        from gamblor.features import update_features
+
+        update_features([(self.year, self.rnd)],
+                        conn_info=STATS_CONN)
+
+    def output(self):
+        from gamblor.store import partition_path
+
+        return luigi.LocalTarget(partition_path("features",
+                                                self.year,
+                                                self.rnd))
+
+class IngestSeason(luigi.Task):
+    """Scrape and load every home and away round of a season at once.
+
+    Scores, ladders and odds of all rounds are loaded in a single
+    transaction, together with the marker rows of the per-round
+    ``Write*ToDB`` tasks they stand in for, so a backfill commits once per
+    season and the per-round tasks see their rounds as done. Rounds that a
+    per-round task has already loaded are left alone.
+
+    Attributes:
+        year (int): Season to load.
+
+    """
+    year = luigi.IntParameter(default=MIN_YEAR)
+
+    def output(self):
+        return MarkerTarget(connection_string=STATS_CONN,
+                            target_table="Scores",
+                            update_id=self.task_id)
+
+    def run(self):
+        import pandas as pd
+        from gamblor.data_collection import season_parse, stored_matches, odds_table
+        from gamblor.db import bulk_insert, get_engine, scores_db_frame, odds_db_frame
+        from gamblor.ladder import season_ladders
+
+        engine = get_engine(STATS_CONN)
+        tables = {}
+        for task_class in (WriteScoresToDB, WriteLadderToDB, WriteOddsToDB):
+            task = task_class()
+            task.create_table(engine)
+            tables[task_class] = task.table_bound
+
+        output = self.output()
+        output.create_marker_table()
+        markers = output.marker_table_bound
+
+        parse = season_parse(self.year)
+        round_tasks = {task_class: {rnd: task_class(self.year, rnd) for rnd in parse.rounds}
+                       for task_class in tables}
+        task_ids = [task.task_id for tasks in round_tasks.values() for task in tasks.values()]
+
+        with engine.begin() as conn:
+            done = set(row[0] for row in conn.execute(
+                sqlalchemy.select(markers.c.update_id).where(markers.c.update_id.in_(task_ids))))
+            todo = {task_class: [rnd for rnd, task in tasks.items() if task.task_id not in done]
+                    for task_class, tasks in round_tasks.items()}
+            if self.year not in ODDS_URL_DICT:
+                todo[WriteOddsToDB] = []
+
+            if todo[WriteScoresToDB]:
+                scores_df = pd.concat([parse.round_scores(rnd) for rnd in todo[WriteScoresToDB]],
+                                      ignore_index=True)
+                with instrument.stage("load", self.year, table="Scores") as loaded:
+                    loaded.add(inserted=bulk_insert(conn,
+                                                    tables[WriteScoresToDB],
+                                                    scores_db_frame(scores_df),
+                                                    conflict_keys=WriteScoresToDB.conflict_keys))
+
+            if todo[WriteLadderToDB]:
+                ladder_df = season_ladders(scores_db_frame(parse.season_scores()))
+                with instrument.stage("load", self.year, table="Ladder") as loaded:
+                    loaded.add(inserted=bulk_insert(conn,
+                                                    tables[WriteLadderToDB],
+                                                    ladder_df[ladder_df["Round"].isin(todo[WriteLadderToDB])],
+                                                    conflict_keys=WriteLadderToDB.conflict_keys))
+
+            if todo[WriteOddsToDB]:
+                matches_df = stored_matches(conn,
+                                            self.year)
+                matches_df = matches_df[matches_df["Round"].isin(todo[WriteOddsToDB])]
+                odds_df = odds_db_frame(odds_table(self.year,
+                                                   matches_df))
+                with instrument.stage("load", self.year, table="Odds") as loaded:
+                    loaded.add(inserted=bulk_insert(conn,
+                                                    tables[WriteOddsToDB],
+                                                    odds_df,
+                                                    conflict_keys=WriteOddsToDB.conflict_keys))
+
+            now = datetime.now()
+            marker_rows = [{"update_id": round_tasks[task_class][rnd].task_id,
+                            "target_table": round_tasks[task_class][rnd].table,
+                            "inserted": now}
+                           for task_class, rounds in todo.items() for rnd in rounds]
+            marker_rows.append({"update_id": self.task_id,
+                                "target_table": output.target_table,
+                                "inserted": now})
+            conn.execute(markers.insert(), marker_rows)
+
+class IngestRange(luigi.WrapperTask):
+    """Load every home and away round played in a date range.
+
+    Requiring the tasks of the whole range from one wrapper lets a single
+    scheduler run independent rounds on several workers at once. Finished
+    seasons covered by the range are loaded with :class:`IngestSeason`, the
+    rest round by round.
+
+    Attributes:
+        start_date (date): Start of the range.
+        end_date (date): End of the range, exclusive.
+
+    """
+    start_date = luigi.DateParameter()
+    end_date = luigi.DateParameter()
+
+    def requires(self):
+        from gamblor.fixtures import fixture_calendar
+
+        calendar = fixture_calendar(range(self.start_date.year, self.end_date.year + 1))
+        rounds = calendar.rounds_between(self.start_date,
+                                         self.end_date,
+                                         finals=False)
+        for year in sorted(set(year for year, _ in rounds)):
+            season_rounds = [rnd for round_year, rnd in rounds if round_year == year]
+            # Finished seasons wholly inside the range load in one go.
+            if year in calendar.complete and len(season_rounds) == calendar.num_rounds(year):
+                yield IngestSeason(year)
+                continue
+            for rnd in season_rounds:
+                yield WriteLadderToDB(year, rnd)
+                yield WriteScoresToDB(year, rnd)
+                yield WriteOddsToDB(year, rnd)
+
+def create_tables(conn_info=STATS_CONN):
+    """Create the statistics and marker tables ahead of the workers.
+
+    Parallel workers would otherwise race to create the same tables.
+
+    Args:
+        conn_info (str): String containing the statistics database connection info.
+
+    """
+    from gamblor.db import get_engine
+
+    engine = get_engine(conn_info)
+    for task in (WriteScoresToDB(), WriteLadderToDB(), WriteOddsToDB(), UpdateRatings()):
+        task.create_table(engine)
+    # The tasks' own targets are bound to STATS_CONN, not to conn_info.
+    MarkerTarget(connection_string=conn_info,
+                 target_table=None,
+                 update_id=None).create_marker_table()
 
 def main(args):
     match_date = datetime.strptime(args.start_date, "%Y-%m-%d").date()
     end_date = datetime.strptime(args.end_date, "%Y-%m-%d").date()
-    # end_date = datetime.strptime("2014-04-01", "%Y-%m-%d").date()
 
-    year, rnd = round_before(search_date=match_date,
-                             conn_info=STATS_CONN)
-
-    while match_date < end_date:
+    years = range(match_date.year, end_date.year + 1)
+    if args.report:
+        instrument.enable(args.report)
+    if instrument.enabled():
+        instrument.install_luigi_hooks()
+    try:
+        run_pipeline(args,
+                     match_date,
+                     end_date,
+                     years)
+    finally:
+        summary_df = instrument.run_summary()
+        if summary_df is not None:
+            print(summary_df.to_string())
+
+def run_pipeline(args,
+                 match_date,
+                 end_date,
+                 years):
+    from gamblor.data_collection import prefetch_sources, season_parse
+    from gamblor.fixtures import fixture_calendar
+    from gamblor.live import run_live
+    from gamblor.odds import odds_index
+
+    create_tables()
+    if args.mode == "live":
+        run_live(years,
+                 interval=args.interval)
+        return
+
+    prefetch_sources(years)
+    calendar = fixture_calendar(years)
+    # Parse every season and index its odds once here, so forked workers
+    # inherit the results instead of each rebuilding them.
+    for year in years:
+        season_parse(year)
+        if year in ODDS_URL_DICT:
+            odds_index(year)
+
+    rounds = calendar.rounds_between(match_date,
+                                     end_date,
+                                     finals=False)
+    if args.mode == "range":
+        luigi.build([IngestRange(start_date=match_date,
+                                 end_date=end_date)],
+                    workers=args.workers,
+                    local_scheduler=True)
+        # Features and ratings look back over earlier rounds, so they follow
+        # once the whole range is loaded.
+        tasks = [UpdateFeatures(year, rnd) for year, rnd in rounds]
+        if rounds:
+            tasks.append(UpdateRatings(*rounds[-1]))
+        luigi.build(tasks,
+                    workers=1,
+                    local_scheduler=True)
+        return
+
+    for year, rnd in rounds:
         luigi.build([
                      WriteLadderToDB(year, rnd),
                      WriteScoresToDB(year, rnd),
-                     WriteOddsToDB(year, rnd)
+                     WriteOddsToDB(year, rnd),
+                     UpdateFeatures(year, rnd),
+                     UpdateRatings(year, rnd)
                      ],
+                     workers=args.workers,
                      local_scheduler=True)
 
-        year, rnd = next_round(year,
-                               rnd)
-        match_date = next_match_date(STATS_CONN,
-                                     year,
-                                     rnd)
-
-        print(match_date, year, rnd)
+        print(calendar.fixture(year, rnd).start, year, rnd)
 
 def pipeline_cli():
     parser = argparse.ArgumentParser(description="Gamblor prediction pipeline.")
@@ -333,9 +711,35 @@ def pipeline_cli():
                         type=str,
                         default=END_DATE,
                         help="Date to collect data up to.")
+    parser.add_argument("--mode", "-m",
+                        type=str,
+                        choices=["range", "round", "live"],
+                        default="range",
+                        help="Build the whole range as one graph, one round at a time, "
+                             "or keep polling the seasons in the range for changes.")
+    parser.add_argument("--workers", "-w",
+                        type=int,
+                        default=PIPELINE_WORKERS,
+                        help="Number of Luigi workers. Extra workers run rounds in "
+                             "parallel processes and pay off when rounds wait on "
+                             "the network or the database.")
+    parser.add_argument("--interval", "-i",
+                        type=float,
+                        default=LIVE_POLL_INTERVAL,
+                        help="Seconds between polls in live mode.")
+    parser.add_argument("--report", "-r",
+                        type=str,
+                        default=None,
+                        help="JSON lines file to append stage timings and counts to. "
+                             "A summary table is printed at the end of the run.")
 
     args = parser.parse_args()
 
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s: %(message)s"))
+    logging.getLogger("gamblor").addHandler(handler)
+    logging.getLogger("gamblor").setLevel(logging.INFO)
+
     main(args)
 
 if __name__ == "__main__":
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""Elo ratings of every team over the ``Scores`` history.
+
+Matches are rated in playing order, a round at a time. All matches of a
+round are rated together with array operations on state indexed by team
+code, so the cost of a history is one small vectorised step per round
+rather than Python work per match.
+
+The home side's advantage depends on the venue: it is ``ELO_HOME_ADVANTAGE``
+times the difference between the shares of each team's earlier matches
+played at the venue, so a side at its own ground against a travelling
+opponent gets most of it and two sides sharing a ground get next to none.
+Each win moves the ratings by ``ELO_K`` scaled by the log of the margin, and
+every rating gives back ``ELO_SEASON_REVERT`` of its distance from
+``ELO_INITIAL`` before a team's first match of a season.
+
+Ratings are stored in the ``Ratings`` table, one row per match keyed by
+``MatchID`` with both teams' ratings before and after it. Continuing from
+stored ratings gives the same numbers as rating the whole history again.
+
+Example:
+    Rate a whole history and look up the ratings before one match::
+
+        ratings_df = rate_matches(scores_df)
+        ratings_df[ratings_df["MatchID"] == 87]
+
+"""
+import numpy as np
+import pandas as pd
+
+from sqlalchemy import text
+
+from gamblor import ELO_INITIAL, ELO_K, ELO_HOME_ADVANTAGE, ELO_SEASON_REVERT, RATINGS_TABLE_COLUMNS
+from gamblor.teams import TEAMS
+
+_BYE = TEAMS.index("Bye")
+
+# Matches with a result before round :rnd of :year, byes excluded.
+_PLAYED_BEFORE = """(Year < :year OR (Year = :year AND Round < :rnd))
+                    AND HomeTeam != :bye AND AwayTeam != :bye
+                    AND HomeFinalScore IS NOT NULL AND AwayFinalScore IS NOT NULL"""
+
+class EloState(object):
+    """Ratings and venue experience of every team at one point in time.
+
+    Attributes:
+        ratings (ndarray): Current rating of each team, indexed by team code.
+        seasons (ndarray): Season each team was last rated in, -1 if never.
+        venues (list of str): Venue of each column of `venue_games`.
+        venue_games (ndarray): Matches each team has played at each venue,
+            with shape ``(len(TEAMS), len(venues))``.
+
+    """
+    def __init__(self,
+                 ratings=None,
+                 seasons=None,
+                 venues=None,
+                 venue_games=None):
+        self.ratings = ratings
+        if self.ratings is None:
+            self.ratings = np.full(len(TEAMS), ELO_INITIAL)
+        self.seasons = seasons
+        if self.seasons is None:
+            self.seasons = np.full(len(TEAMS), -1, dtype=np.int64)
+        self.venues = list(venues or [])
+        self.venue_games = venue_games
+        if self.venue_games is None:
+            self.venue_games = np.zeros((len(TEAMS), len(self.venues)))
+
+    @classmethod
+    def from_database(cls,
+                      conn,
+                      year,
+                      rnd):
+        """Rebuild the state going into round `rnd` of `year`.
+
+        Ratings come from each team's latest stored rating and venue
+        experience from the ``Scores`` rows before the round.
+
+        Args:
+            conn (:obj:`sqlalchemy.engine.Connection`): Open connection.
+            year (int): Season of the round.
+            rnd (int): Round to rate next.
+
+        Returns:
+            EloState: State before the round.
+
+        """
+        params = {"year": year, "rnd": rnd, "bye": _BYE}
+        ratings_df = pd.read_sql_query(text("""SELECT Ratings.Year, Ratings.Round, Scores.GameTime, Ratings.MatchID,
+                                                      Scores.HomeTeam, Scores.AwayTeam,
+                                                      Ratings.HomeRatingAfter, Ratings.AwayRatingAfter
+                                               FROM Ratings JOIN Scores ON Scores.MatchID = Ratings.MatchID
+                                               WHERE Ratings.Year < :year OR (Ratings.Year = :year AND Ratings.Round < :rnd)
+                                            """),
+                                       conn,
+                                       params=params)
+        teams_df = pd.concat([pd.DataFrame({"Year": ratings_df["Year"],
+                                            "Round": ratings_df["Round"],
+                                            "GameTime": ratings_df["GameTime"],
+                                            "MatchID": ratings_df["MatchID"],
+                                            "Team": ratings_df[side + "Team"],
+                                            "Rating": ratings_df[side + "RatingAfter"]})
+                              for side in ("Home", "Away")],
+                             ignore_index=True)
+        teams_df = teams_df.sort_values(["Year", "Round", "GameTime", "MatchID"],
+                                        kind="mergesort").drop_duplicates("Team",
+                                                                          keep="last")
+
+        state = cls()
+        team_codes = teams_df["Team"].to_numpy(dtype=np.int64)
+        state.ratings[team_codes] = teams_df["Rating"].to_numpy(dtype=float)
+        state.seasons[team_codes] = teams_df["Year"].to_numpy(dtype=np.int64)
+
+        games_df = pd.read_sql_query(text("""SELECT Team, Venue, COUNT(*) AS Games
+                                             FROM (SELECT HomeTeam AS Team, COALESCE(Venue, '') AS Venue
+                                                   FROM Scores WHERE {played}
+                                                   UNION ALL
+                                                   SELECT AwayTeam AS Team, COALESCE(Venue, '') AS Venue
+                                                   FROM Scores WHERE {played})
+                                             GROUP BY Team, Venue
+                                          """.format(played=_PLAYED_BEFORE)),
+                                     conn,
+                                     params=params)
+        venue_codes = state.venue_codes(games_df["Venue"].to_numpy(dtype=object))
+        state.venue_games[games_df["Team"].to_numpy(dtype=np.int64), venue_codes] = games_df["Games"].to_numpy(dtype=float)
+
+        return state
+
+    def venue_codes(self,
+                    venues):
+        """Return the column of each venue, adding columns for new venues.
+
+        Args:
+            venues (array-like of str): Venue names.
+
+        Returns:
+            ndarray: Column of `venue_games` for each venue.
+
+        """
+        venues = np.asarray(venues, dtype=object)
+        codes = pd.Index(self.venues).get_indexer(venues)
+        new_venues = pd.unique(venues[codes < 0])
+        if len(new_venues):
+            self.venues.extend(new_venues)
+            self.venue_games = np.pad(self.venue_games,
+                                      ((0, 0), (0, len(new_venues))))
+            codes = pd.Index(self.venues).get_indexer(venues)
+        return codes
+
+    def season_ratings(self,
+                       year):
+        """Return every team's rating going into its next match in `year`.
+
+        Args:
+            year (int): Season of the next match.
+
+        Returns:
+            ndarray: Ratings indexed by team code, reverted towards the mean
+            for teams not yet rated in `year`.
+
+        """
+        reverted = ELO_INITIAL + (self.ratings - ELO_INITIAL) * (1 - ELO_SEASON_REVERT)
+        return np.where(self.seasons < year, reverted, self.ratings)
+
+    def predict(self,
+                year,
+                home,
+                away,
+                venues):
+        """Return the home advantage and home win probability of matches.
+
+        The state is left as it is.
+
+        Args:
+            year (int): Season of the matches.
+            home (ndarray): Code of each home team.
+            away (ndarray): Code of each away team.
+            venues (ndarray): Venue column of each match.
+
+        Returns:
+            tuple of ndarray: Home advantage in rating points and home win
+            probability of each match.
+
+        """
+        ratings = self.season_ratings(year)
+        games = np.maximum(self.venue_games.sum(axis=1), 1)
+        advantage = ELO_HOME_ADVANTAGE * (self.venue_games[home, venues] / games[home]
+                                          - self.venue_games[away, venues] / games[away])
+        probability = 1 / (1 + 10 ** ((ratings[away] - ratings[home] - advantage) / 400))
+        return advantage, probability
+
+    def rate_round(self,
+                   year,
+                   home,
+                   away,
+                   venues,
+                   margins):
+        """Rate the matches of one round and update the state.
+
+        Args:
+            year (int): Season of the round.
+            home (ndarray): Code of each home team.
+            away (ndarray): Code of each away team.
+            venues (ndarray): Venue column of each match.
+            margins (ndarray): Home team's margin, NaN for a match without
+                a result, which is rated but moves nothing.
+
+        Returns:
+            tuple of ndarray: Home and away ratings before the matches, the
+            home advantage, the home win probability and the home and away
+            ratings after the matches.
+
+        """
+        teams = np.concatenate([home, away])
+        self.ratings[teams] = self.season_ratings(year)[teams]
+        self.seasons[teams] = year
+
+        home_before = self.ratings[home]
+        away_before = self.ratings[away]
+        advantage, probability = self.predict(year,
+                                              home,
+                                              away,
+                                              venues)
+
+        played = ~np.isnan(margins)
+        result = np.sign(margins) * 0.5 + 0.5
+        steps = ELO_K * np.maximum(np.log1p(np.abs(margins)), 1) * (result - probability)
+        steps[~played] = 0
+        np.add.at(self.ratings, home, steps)
+        np.add.at(self.ratings, away, -steps)
+        np.add.at(self.venue_games, (home[played], venues[played]), 1)
+        np.add.at(self.venue_games, (away[played], venues[played]), 1)
+
+        return (home_before,
+                away_before,
+                advantage,
+                probability,
+                self.ratings[home],
+                self.ratings[away])
+
+def rate_matches(scores_df,
+                 state=None):
+    """Rate matches in playing order.
+
+    Args:
+        scores_df (DataFrame): Matches as stored in ``Scores``, teams as
+            codes. Byes are left out.
+        state (:obj:`EloState`, optional): State going into the first
+            round of `scores_df`, updated in place. A fresh history by
+            default.
+
+    Returns:
+        DataFrame: One row per match with ``RATINGS_TABLE_COLUMNS``.
+
+    """
+    if state is None:
+        state = EloState()
+
+    scores_df = scores_df[(scores_df["HomeTeam"] != _BYE) & (scores_df["AwayTeam"] != _BYE)]
+    scores_df = scores_df.sort_values(["Year", "Round", "GameTime", "MatchID"],
+                                      kind="mergesort")
+
+    years = scores_df["Year"].to_numpy(dtype=np.int64)
+    rounds = scores_df["Round"].to_numpy(dtype=np.int64)
+    home = scores_df["HomeTeam"].to_numpy(dtype=np.int64)
+    away = scores_df["AwayTeam"].to_numpy(dtype=np.int64)
+    venues = state.venue_codes(scores_df["Venue"].fillna("").to_numpy(dtype=object))
+    margins = (scores_df["HomeFinalScore"].astype(float) - scores_df["AwayFinalScore"].astype(float)).to_numpy()
+
+    keys = years * 1000 + rounds
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    stops = np.r_[starts[1:], len(keys)].astype(np.int64)
+    rated = np.empty((6, len(keys)))
+    for start, stop in zip(starts, stops):
+        rated[:, start:stop] = state.rate_round(years[start],
+                                                home[start:stop],
+                                                away[start:stop],
+                                                venues[start:stop],
+                                                margins[start:stop])
+
+    return pd.DataFrame(dict(zip(RATINGS_TABLE_COLUMNS,
+                                 [scores_df["MatchID"].to_numpy(), years, rounds] + list(rated))),
+                        columns=RATINGS_TABLE_COLUMNS)
+
+def pending_ratings(conn,
+                    year,
+                    rnd):
+    """Rate every match up to round `rnd` of `year` still missing a rating.
+
+    Rating restarts from the earliest round with an unrated match, so the
+    rounds after it are rated again on top of it.
+
+    Args:
+        conn (:obj:`sqlalchemy.engine.Connection`): Open connection.
+        year (int): Season of the last round to rate.
+        rnd (int): Last round to rate.
+
+    Returns:
+        DataFrame: Ratings to store, with ``RATINGS_TABLE_COLUMNS``.
+
+    """
+    params = {"year": year, "rnd": rnd, "bye": _BYE}
+    first = conn.execute(text("""SELECT Scores.Year, Scores.Round
+                                 FROM Scores LEFT JOIN Ratings ON Ratings.MatchID = Scores.MatchID
+                                 WHERE Ratings.MatchID IS NULL
+                                   AND Scores.HomeTeam != :bye AND Scores.AwayTeam != :bye
+                                   AND (Scores.Year < :year OR (Scores.Year = :year AND Scores.Round <= :rnd))
+                                 ORDER BY Scores.Year, Scores.Round
+                                 LIMIT 1
+                              """),
+                         params).first()
+    if first is None:
+        return pd.DataFrame(columns=RATINGS_TABLE_COLUMNS)
+
+    first_year, first_rnd = first[0], first[1]
+    params.update({"first_year": first_year, "first_rnd": first_rnd})
+    scores_df = pd.read_sql_query(text("""SELECT * FROM Scores
+                                          WHERE (Year > :first_year OR (Year = :first_year AND Round >= :first_rnd))
+                                            AND (Year < :year OR (Year = :year AND Round <= :rnd))
+                                       """),
+                                  conn,
+                                  params=params)
+
+    return rate_matches(scores_df,
+                        EloState.from_database(conn,
+                                               first_year,
+                                               first_rnd))
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""Monte Carlo simulation of the rest of a season.
+
+Each remaining match is played out many times: the home margin is drawn
+from a normal distribution around its expected value and the combined score
+from one around ``SIMULATION_TOTAL_MEAN``, which together give both teams'
+scores. Premiership points and percentage are added to each team's totals
+from the matches already played, under the same rules as the ``Ladder``
+table and with the same :func:`gamblor.ladder.percentage`, and the teams
+are ranked on points and then percentage.
+
+A match's expected margin is taken from the fixture when given, and
+otherwise from its home win probability, as the mean that makes that
+probability the chance of a positive margin. Without either, the Elo
+ratings after the last played round are used.
+
+Simulations are drawn in batches of ``SIMULATION_CHUNK`` with NumPy, spread
+over a process pool. Every batch gets its own stream spawned from the seed,
+so the results depend only on the seed and the number of simulations, not
+on the number of workers. Results are cached on disk per season, round,
+model version, number of simulations, seed and a digest of the fixtures'
+teams, margins and probabilities, so change `model` whenever the ratings
+behind it change.
+
+Example:
+    Simulate the rest of 2016 after round 12 with the Elo ratings::
+
+        ladder_df = simulate_season(2016, 12, fixtures_df)
+        ladder_df[["Team", "MeanPosition", "Finals"]]
+
+"""
+import hashlib
+import os
+import tempfile
+
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from sqlalchemy import text
+
+from gamblor import CANCELLED_GAME_TYPE, DRAW_POINTS, FINALS_TEAMS, STATS_CONN, SIMULATIONS_DIR
+from gamblor import SIMULATION_MARGIN_SD, SIMULATION_TOTAL_MEAN, SIMULATION_TOTAL_SD
+from gamblor import SIMULATIONS, SIMULATION_CHUNK, SIMULATION_SEED
+from gamblor.db import connect
+from gamblor.ladder import bye_points, match_points, percentage
+from gamblor.ratings import EloState
+from gamblor.teams import TEAMS, TEAM_DTYPE, decode_teams
+
+_BYE = TEAMS.index("Bye")
+
+def season_totals(scores_df,
+                  teams):
+    """Return the premiership points and scores of each team so far.
+
+    Args:
+        scores_df (DataFrame): Matches as stored in ``Scores``, teams as
+            codes. Matches without a result are ignored, except that a
+            cancelled match is worth ``DRAW_POINTS`` to both teams.
+        teams (ndarray): Sorted codes of the season's teams.
+
+    Returns:
+        tuple of ndarray: Points, points scored and points conceded of each
+        team, in the order of `teams`.
+
+    """
+    points = np.zeros(len(teams))
+    scored = np.zeros(len(teams))
+    conceded = np.zeros(len(teams))
+
+    byes = scores_df[scores_df["AwayTeam"] == _BYE]
+    np.add.at(points, np.searchsorted(teams, byes["HomeTeam"].to_numpy(dtype=np.int64)), bye_points(len(teams)))
+
+    cancelled = scores_df[scores_df["GameType"] == CANCELLED_GAME_TYPE]
+    np.add.at(points, np.searchsorted(teams, cancelled["HomeTeam"].to_numpy(dtype=np.int64)), DRAW_POINTS)
+    np.add.at(points, np.searchsorted(teams, cancelled["AwayTeam"].to_numpy(dtype=np.int64)), DRAW_POINTS)
+
+    played = scores_df[(scores_df["AwayTeam"] != _BYE)
+                       & scores_df["HomeFinalScore"].notna()
+                       & scores_df["AwayFinalScore"].notna()]
+    home = np.searchsorted(teams, played["HomeTeam"].to_numpy(dtype=np.int64))
+    away = np.searchsorted(teams, played["AwayTeam"].to_numpy(dtype=np.int64))
+    home_scores = played["HomeFinalScore"].to_numpy(dtype=float)
+    away_scores = played["AwayFinalScore"].to_numpy(dtype=float)
+    np.add.at(points, home, match_points(home_scores, away_scores))
+    np.add.at(points, away, match_points(away_scores, home_scores))
+    np.add.at(scored, home, home_scores)
+    np.add.at(scored, away, away_scores)
+    np.add.at(conceded, home, away_scores)
+    np.add.at(conceded, away, home_scores)
+
+    return points, scored, conceded
+
+def expected_margins(fixtures_df):
+    """Return the expected home margin of each fixture.
+
+    Args:
+        fixtures_df (DataFrame): Fixtures with an ``ExpectedMargin`` or a
+            ``HomeWinProbability`` column.
+
+    Returns:
+        ndarray: Expected home margin of each fixture.
+
+    """
+    if "ExpectedMargin" in fixtures_df.columns:
+        return fixtures_df["ExpectedMargin"].to_numpy(dtype=float)
+
+    normal = NormalDist()
+    probabilities = np.clip(fixtures_df["HomeWinProbability"].to_numpy(dtype=float), 1e-6, 1 - 1e-6)
+    return SIMULATION_MARGIN_SD * np.array([normal.inv_cdf(probability) for probability in probabilities])
+
+def simulate_season(year,
+                    rnd,
+                    fixtures_df,
+                    model="elo",
+                    simulations=SIMULATIONS,
+                    seed=SIMULATION_SEED,
+                    workers=None,
+                    conn_info=STATS_CONN,
+                    cache_dir=SIMULATIONS_DIR):
+    """Play out the rest of a season and summarise the final ladders.
+
+    Args:
+        year (int): Season to simulate.
+        rnd (int): Last round already played; its results and those before
+            it are read from ``Scores``.
+        fixtures_df (DataFrame): Remaining matches with ``HomeTeam`` and
+            ``AwayTeam`` as codes, and an ``ExpectedMargin`` or
+            ``HomeWinProbability`` column. When both are missing the Elo
+            ratings are used, with ``Venue`` if given. Remaining byes, with
+            a ``Bye`` away team, earn their season's bye points.
+        model (str): Version of the model behind the probabilities, part of
+            the cache key.
+        simulations (int): Number of seasons to play out.
+        seed (int): Seed of the random streams.
+        workers (:obj:`int`, optional): Processes to spread the batches
+            over, one per core by default. ``1`` runs them in this process.
+        conn_info (str): String containing the statistics database connection info.
+        cache_dir (:obj:`str`, optional): Directory of cached results, or
+            ``None`` not to cache.
+
+    Returns:
+        DataFrame: One row per team with ``Team``, ``MeanPoints``,
+        ``MeanPercentage``, ``MeanPosition``, ``Finals`` and ``Top4``
+        probabilities and the probability of each finishing position in
+        ``Position1`` onwards, best placed teams first.
+
+    """
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir,
+                                  "{}-{}-{}-{}-{}-{}.parquet".format(year,
+                                                                     rnd,
+                                                                     model,
+                                                                     simulations,
+                                                                     seed,
+                                                                     fixtures_digest(fixtures_df)))
+        if os.path.isfile(cache_path):
+            ladder_df = pd.read_parquet(cache_path)
+            ladder_df["Team"] = ladder_df["Team"].astype(TEAM_DTYPE)
+            return ladder_df
+
+    with connect(conn_info) as conn:
+        scores_df = pd.read_sql_query(text("SELECT * FROM Scores WHERE Year = :year AND Round <= :rnd"),
+                                      conn,
+                                      params={"year": year, "rnd": rnd})
+        if not {"ExpectedMargin", "HomeWinProbability"} & set(fixtures_df.columns):
+            fixtures_df = fixtures_df.copy()
+            fixtures_df["HomeWinProbability"] = elo_probabilities(conn,
+                                                                  year,
+                                                                  rnd,
+                                                                  fixtures_df)
+
+    byes_df = fixtures_df[fixtures_df["AwayTeam"] == _BYE]
+    fixtures_df = fixtures_df[fixtures_df["AwayTeam"] != _BYE]
+    teams = np.unique(np.concatenate([scores_df["HomeTeam"].to_numpy(dtype=np.int64),
+                                      scores_df["AwayTeam"].to_numpy(dtype=np.int64),
+                                      fixtures_df["HomeTeam"].to_numpy(dtype=np.int64),
+                                      fixtures_df["AwayTeam"].to_numpy(dtype=np.int64),
+                                      byes_df["HomeTeam"].to_numpy(dtype=np.int64)]))
+    teams = teams[teams != _BYE]
+    points, scored, conceded = season_totals(scores_df,
+                                              teams)
+    # Byes still to come are certain, so they are credited up front.
+    np.add.at(points,
+              np.searchsorted(teams, byes_df["HomeTeam"].to_numpy(dtype=np.int64)),
+              bye_points(len(teams)))
+
+    chunks = [SIMULATION_CHUNK] * (simulations // SIMULATION_CHUNK)
+    if simulations % SIMULATION_CHUNK:
+        chunks.append(simulations % SIMULATION_CHUNK)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    arguments = [(chunk_seed,
+                  chunk,
+                  points,
+                  scored,
+                  conceded,
+                  np.searchsorted(teams, fixtures_df["HomeTeam"].to_numpy(dtype=np.int64)),
+                  np.searchsorted(teams, fixtures_df["AwayTeam"].to_numpy(dtype=np.int64)),
+                  expected_margins(fixtures_df))
+                 for chunk_seed, chunk in zip(seeds, chunks)]
+
+    if workers == 1:
+        results = list(map(_simulate_chunk, arguments))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_simulate_chunk, arguments))
+
+    positions = sum(result[0] for result in results) / simulations
+    ladder_df = pd.DataFrame({"Team": decode_teams(teams),
+                              "MeanPoints": sum(result[1] for result in results) / simulations,
+                              "MeanPercentage": sum(result[2] for result in results) / simulations,
+                              "MeanPosition": positions @ np.arange(1, len(teams) + 1),
+                              "Finals": positions[:, :FINALS_TEAMS].sum(axis=1),
+                              "Top4": positions[:, :4].sum(axis=1)})
+    for position in range(len(teams)):
+        ladder_df["Position{}".format(position + 1)] = positions[:, position]
+    ladder_df = ladder_df.sort_values("MeanPosition",
+                                      kind="mergesort").reset_index(drop=True)
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        handle, tmp_path = tempfile.mkstemp(dir=cache_dir)
+        os.close(handle)
+        ladder_df.to_parquet(tmp_path,
+                             index=False)
+        os.replace(tmp_path, cache_path)
+
+    return ladder_df
+
+def fixtures_digest(fixtures_df):
+    """Return a short digest of what the simulation of `fixtures_df` depends on.
+
+    Args:
+        fixtures_df (DataFrame): Fixtures as passed to :func:`simulate_season`.
+
+    Returns:
+        str: Hex digest of the teams, and the ``ExpectedMargin``,
+        ``HomeWinProbability`` and ``Venue`` where given, of every fixture
+        in order.
+
+    """
+    columns = [column for column in ["HomeTeam", "AwayTeam", "ExpectedMargin", "HomeWinProbability", "Venue"]
+               if column in fixtures_df.columns]
+    hashes = pd.util.hash_pandas_object(fixtures_df[columns],
+                                        index=False)
+    return hashlib.sha256(hashes.to_numpy().tobytes()).hexdigest()[:16]
+
+def elo_probabilities(conn,
+                      year,
+                      rnd,
+                      fixtures_df):
+    """Return the home win probability of fixtures from the stored Elo ratings.
+
+    Args:
+        conn (:obj:`sqlalchemy.engine.Connection`): Open connection.
+        year (int): Season of the fixtures.
+        rnd (int): Last round already played.
+        fixtures_df (DataFrame): Fixtures with ``HomeTeam`` and
+            ``AwayTeam`` as codes, and optionally ``Venue``.
+
+    Returns:
+        ndarray: Home win probability of each fixture.
+
+    """
+    state = EloState.from_database(conn,
+                                   year,
+                                   rnd + 1)
+    venues = pd.Series("", index=fixtures_df.index)
+    if "Venue" in fixtures_df.columns:
+        venues = fixtures_df["Venue"].fillna("")
+    _, probabilities = state.predict(year,
+                                     fixtures_df["HomeTeam"].to_numpy(dtype=np.int64),
+                                     fixtures_df["AwayTeam"].to_numpy(dtype=np.int64),
+                                     state.venue_codes(venues.to_numpy(dtype=object)))
+    return probabilities
+
+def _simulate_chunk(arguments):
+    seed, simulations, points, scored, conceded, home, away, margins = arguments
+    random = np.random.default_rng(seed)
+    teams = len(points)
+
+    margins = random.normal(margins, SIMULATION_MARGIN_SD, size=(simulations, len(margins)))
+    totals = random.normal(SIMULATION_TOTAL_MEAN, SIMULATION_TOTAL_SD, size=margins.shape)
+    home_scores = np.maximum(np.rint((totals + margins) / 2), 0)
+    away_scores = np.maximum(np.rint((totals - margins) / 2), 0)
+
+    # Matches by teams incidence, so per team totals are matrix products.
+    home_teams = np.zeros((len(home), teams))
+    home_teams[np.arange(len(home)), home] = 1
+    away_teams = np.zeros((len(away), teams))
+    away_teams[np.arange(len(away)), away] = 1
+
+    season_points = (points
+                     + match_points(home_scores, away_scores) @ home_teams
+                     + match_points(away_scores, home_scores) @ away_teams)
+    season_scored = scored + home_scores @ home_teams + away_scores @ away_teams
+    season_conceded = conceded + away_scores @ home_teams + home_scores @ away_teams
+    percentages = percentage(season_scored,
+                             season_conceded)
+
+    # Rank on points, then percentage.
+    order = np.lexsort((-percentages, -season_points), axis=-1)
+    positions = np.empty_like(order)
+    np.put_along_axis(positions,
+                      order,
+                      np.broadcast_to(np.arange(teams), order.shape),
+                      axis=1)
+    counts = np.bincount((np.arange(teams) * teams + positions).ravel(),
+                         minlength=teams * teams).reshape(teams, teams)
+
+    return counts, season_points.sum(axis=0), percentages.sum(axis=0)
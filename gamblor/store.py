@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""Partitioned Parquet store for scraped scores, ladders and odds, and the
+team features derived from them.
+
+Each table is kept as a Hive style dataset with one file per round::
+
+    SCORE_DIR/Year=2015/Round=3/part-0.parquet
+
+The partition columns live in the directory names only, so a round is
+replaced by rewriting one file and a read can skip every partition outside
+its filter without opening it. Files are plain Parquet and can be read by
+any tool that understands Hive partitioning. Frames come back with the same
+dtypes they were built with, teams included.
+
+Example:
+    Read the final scores of every 2015 match::
+
+        scores_df = read_dataset("scores",
+                                 columns=["HomeTeam", "AwayTeam",
+                                          "HomeFinalScore", "AwayFinalScore"],
+                                 year=2015)
+
+"""
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from gamblor import SCORE_DIR, LADDER_DIR, ODDS_DIR, FEATURES_DIR
+from gamblor.teams import TEAM_DTYPE
+from gamblor.table_builder import scores_builder, ladder_builder, odds_builder, features_builder
+
+DATASETS = {"scores": (SCORE_DIR, scores_builder),
+            "ladder": (LADDER_DIR, ladder_builder),
+            "odds": (ODDS_DIR, odds_builder),
+            "features": (FEATURES_DIR, features_builder)}
+
+PARTITION_COLUMNS = ["Year", "Round"]
+
+_PARTITIONING = ds.partitioning(pa.schema([("Year", pa.int64()),
+                                           ("Round", pa.int64())]),
+                                flavor="hive")
+
+def partition_path(dataset,
+                   year,
+                   rnd):
+    """Return the file holding one round of `dataset`.
+
+    Args:
+        dataset (str): Name of a dataset in ``DATASETS``.
+        year (int): Season of the round.
+        rnd (int): Round of the season.
+
+    Returns:
+        str: Path of the round's Parquet file.
+
+    """
+    root, _ = DATASETS[dataset]
+    return os.path.join(root,
+                        "Year={}".format(int(year)),
+                        "Round={}".format(int(rnd)),
+                        "part-0.parquet")
+
+def write_partition(dataset,
+                    frame,
+                    year,
+                    rnd):
+    """Store one round of `dataset`, replacing what was there.
+
+    Args:
+        dataset (str): Name of a dataset in ``DATASETS``.
+        frame (DataFrame): Rows of the round.
+        year (int): Season of the round.
+        rnd (int): Round of the season.
+
+    Returns:
+        str: Path of the written file.
+
+    """
+    path = partition_path(dataset,
+                          year,
+                          rnd)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    table = pa.Table.from_pandas(frame.drop(columns=PARTITION_COLUMNS),
+                                 preserve_index=False)
+    # Names starting with an underscore are skipped by dataset readers, so
+    # a partly written file is never picked up.
+    handle, tmp_path = tempfile.mkstemp(prefix="_",
+                                        suffix=".tmp",
+                                        dir=directory)
+    os.close(handle)
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+    return path
+
+def read_partition(dataset,
+                   year,
+                   rnd,
+                   columns=None):
+    """Read one round of `dataset` straight from its file.
+
+    Args:
+        dataset (str): Name of a dataset in ``DATASETS``.
+        year (int): Season of the round.
+        rnd (int): Round of the season.
+        columns (:obj:`list` of :obj:`str`, optional): Columns to read, all
+            by default.
+
+    Returns:
+        DataFrame: Rows of the round.
+
+    """
+    file_columns = None
+    if columns is not None:
+        file_columns = [column for column in columns if column not in PARTITION_COLUMNS]
+
+    frame = pq.read_table(partition_path(dataset, year, rnd),
+                          columns=file_columns).to_pandas()
+    frame["Year"] = int(year)
+    frame["Round"] = int(rnd)
+
+    return _typed_frame(dataset,
+                        frame,
+                        columns)
+
+def read_dataset(dataset,
+                 columns=None,
+                 year=None,
+                 rnd=None,
+                 filter=None):
+    """Read the rows of `dataset` matching a filter.
+
+    Only the partitions the filter can match are opened, and only the
+    requested columns are read from them.
+
+    Args:
+        dataset (str): Name of a dataset in ``DATASETS``.
+        columns (:obj:`list` of :obj:`str`, optional): Columns to read, all
+            by default.
+        year (:obj:`int`, optional): Season to keep.
+        rnd (:obj:`int`, optional): Round to keep.
+        filter (:obj:`pyarrow.dataset.Expression`, optional): Further
+            condition on the rows.
+
+    Returns:
+        DataFrame: Matching rows ordered by season and round.
+
+    """
+    root, builder = DATASETS[dataset]
+    expression = filter
+    for name, value in (("Year", year), ("Round", rnd)):
+        if value is not None:
+            condition = ds.field(name) == int(value)
+            expression = condition if expression is None else expression & condition
+
+    data = None
+    if os.path.isdir(root):
+        data = ds.dataset(root,
+                          format="parquet",
+                          partitioning=_PARTITIONING)
+    if data is None or not data.files:
+        return _typed_frame(dataset,
+                            builder().to_frame(),
+                            columns)
+
+    frame = data.to_table(columns=columns,
+                          filter=expression).to_pandas()
+    order = [column for column in PARTITION_COLUMNS if column in frame.columns]
+    if order:
+        frame = frame.sort_values(order, kind="mergesort").reset_index(drop=True)
+
+    return _typed_frame(dataset,
+                        frame,
+                        columns)
+
+def _typed_frame(dataset,
+                 frame,
+                 columns):
+    # Parquet has no team type and widens some dtypes, so give every column
+    # back the dtype its builder gives it.
+    _, builder = DATASETS[dataset]
+    dtypes = builder().dtypes
+    if columns is None:
+        columns = builder().columns
+
+    data = {}
+    for column in columns:
+        if dtypes[column] == "team":
+            data[column] = frame[column].astype(TEAM_DTYPE)
+        else:
+            data[column] = frame[column].astype(dtypes[column])
+    return pd.DataFrame(data,
+                        columns=columns)
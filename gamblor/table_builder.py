@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Columnar accumulation of scraped records.
+
+Scrapers produce their results a record at a time. Appending each record to a
+DataFrame copies the whole frame on every call, so instead records are
+collected into one list per column and turned into a DataFrame once, with the
+column dtypes fixed up front rather than inferred from whatever was appended.
+Team columns use the ``"team"`` dtype and come out as Categoricals over
+:data:`gamblor.teams.TEAMS`.
+
+Example:
+    Collect two ladder rows and materialise them::
+
+        builder = ladder_builder()
+        builder.append({"Year": 2015, "Round": 1, "Team": "Adelaide",
+                        "GamesPlayed": 1, "Points": 4, "Percentage": 180.4})
+        builder.append([2015, 1, "Geelong", 1, 0, 55.4])
+        ladder_df = builder.to_frame()
+
+"""
+import pandas as pd
+
+from gamblor.teams import encode_teams
+from gamblor import SCORES_TABLE_COLUMNS, SCORES_TABLE_DTYPES, LADDER_TABLE_COLUMNS, LADDER_TABLE_DTYPES, ODDS_TABLE_COLUMNS, ODDS_TABLE_DTYPES
+from gamblor import FEATURES_TABLE_COLUMNS, FEATURES_TABLE_DTYPES
+
+class TableBuilder(object):
+    """Accumulates rows column by column and materialises one DataFrame.
+
+    Attributes:
+        columns (list of str): Column names, in output order.
+        dtypes (dict): Dtype of each column in the materialised frame.
+
+    """
+    def __init__(self,
+                 columns,
+                 dtypes):
+        self.columns = list(columns)
+        self.dtypes = dtypes
+
+        self._data = {column: [] for column in self.columns}
+
+    def __len__(self):
+        return len(self._data[self.columns[0]])
+
+    def append(self,
+               record):
+        """Add one row.
+
+        Args:
+            record (dict or sequence): Values keyed by column name, or given
+                in column order. Columns missing from a dict are left empty.
+
+        """
+        if isinstance(record, dict):
+            for column in self.columns:
+                self._data[column].append(record.get(column))
+        else:
+            for column, value in zip(self.columns, record):
+                self._data[column].append(value)
+
+    def extend(self,
+               records):
+        """Add several rows, each as accepted by :meth:`append`.
+
+        Args:
+            records (iterable): Rows to add.
+
+        """
+        for record in records:
+            self.append(record)
+
+    def extend_columns(self,
+                       columns):
+        """Add a block of rows given as whole columns.
+
+        Args:
+            columns (dict): Equal length array-likes keyed by column name.
+                Columns not given are left empty.
+
+        """
+        length = len(next(iter(columns.values())))
+        for column in self.columns:
+            if column in columns:
+                self._data[column].extend(list(columns[column]))
+            else:
+                self._data[column].extend([None] * length)
+
+    def to_frame(self):
+        """Materialise the accumulated rows.
+
+        Returns:
+            DataFrame: One column per entry of `columns` with its preset dtype.
+
+        """
+        data = {}
+        for column in self.columns:
+            if self.dtypes[column] == "team":
+                data[column] = encode_teams(pd.Series(self._data[column],
+                                                      dtype=object))
+            else:
+                data[column] = pd.Series(self._data[column],
+                                         dtype=self.dtypes[column])
+        return pd.DataFrame(data,
+                            columns=self.columns)
+
+def scores_builder():
+    """Return an empty builder for ``SCORES_TABLE_COLUMNS``."""
+    return TableBuilder(SCORES_TABLE_COLUMNS,
+                        SCORES_TABLE_DTYPES)
+
+def ladder_builder():
+    """Return an empty builder for ``LADDER_TABLE_COLUMNS``."""
+    return TableBuilder(LADDER_TABLE_COLUMNS,
+                        LADDER_TABLE_DTYPES)
+
+def odds_builder():
+    """Return an empty builder for ``ODDS_TABLE_COLUMNS``."""
+    return TableBuilder(ODDS_TABLE_COLUMNS,
+                        ODDS_TABLE_DTYPES)
+
+def features_builder():
+    """Return an empty builder for ``FEATURES_TABLE_COLUMNS``."""
+    return TableBuilder(FEATURES_TABLE_COLUMNS,
+                        FEATURES_TABLE_DTYPES)
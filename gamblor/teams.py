@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""Canonical registry of team names.
+
+Every source spells teams its own way: AFL Tables uses full names for
+matches and two letter abbreviations on its ladders, Betfair adds nicknames.
+All of them are resolved here, in one vectorised ``map``, to a canonical name
+whose position in ``TEAMS`` is the team's code. Frames carry teams as a
+pandas Categorical over ``TEAMS`` and the database stores the integer codes,
+so joins between ``Scores``, ``Ladder`` and ``Odds`` compare small ints.
+
+``TEAMS`` is append only: codes are stored in the database, so a team's
+position must never change.
+
+Example:
+    Encode a column of names from any source::
+
+        teams = encode_teams(pd.Series(["Adelaide Crows", "GW", "Geelong"]))
+        codes = teams.cat.codes
+
+"""
+import numpy as np
+import pandas as pd
+
+TEAMS = ["Bye",
+         "Adelaide",
+         "Brisbane Lions",
+         "Carlton",
+         "Collingwood",
+         "Essendon",
+         "Fremantle",
+         "Geelong",
+         "Gold Coast",
+         "Greater Western Sydney",
+         "Hawthorn",
+         "Melbourne",
+         "North Melbourne",
+         "Port Adelaide",
+         "Richmond",
+         "St Kilda",
+         "Sydney",
+         "West Coast",
+         "Western Bulldogs",
+         "Brisbane Bears",
+         "Fitzroy",
+         "University",
+        ]
+
+TEAM_ALIASES = {# AFL Tables ladder abbreviations
+                "AD": "Adelaide",
+                "BL": "Brisbane Lions",
+                "CA": "Carlton",
+                "CW": "Collingwood",
+                "ES": "Essendon",
+                "FR": "Fremantle",
+                "GE": "Geelong",
+                "GC": "Gold Coast",
+                "GW": "Greater Western Sydney",
+                "HW": "Hawthorn",
+                "ME": "Melbourne",
+                "NM": "North Melbourne",
+                "KA": "North Melbourne",
+                "PA": "Port Adelaide",
+                "RI": "Richmond",
+                "SK": "St Kilda",
+                "SY": "Sydney",
+                "SM": "Sydney",
+                "WC": "West Coast",
+                "WB": "Western Bulldogs",
+                "FO": "Western Bulldogs",
+                "BB": "Brisbane Bears",
+                "FI": "Fitzroy",
+                "UN": "University",
+                # Earlier names of current clubs
+                "South Melbourne": "Sydney",
+                "Footscray": "Western Bulldogs",
+                "Kangaroos": "North Melbourne",
+                # Betfair names
+                "Port Adelaide Power": "Port Adelaide",
+                "Adelaide Crows": "Adelaide",
+                "Melbourne Demons": "Melbourne",
+                "Gold Coast Suns": "Gold Coast",
+                "Geelong Cats": "Geelong",
+                "Sydney Swans": "Sydney",
+                "GWS Giants": "Greater Western Sydney",
+                "GWS": "Greater Western Sydney",
+                "West Coast Eagles": "West Coast",
+                "Brisbane": "Brisbane Lions",
+               }
+
+TEAM_DTYPE = pd.CategoricalDtype(TEAMS)
+
+_TEAM_LOOKUP = dict(zip(TEAMS, TEAMS))
+_TEAM_LOOKUP.update(TEAM_ALIASES)
+
+def canonical_teams(names,
+                    errors="raise"):
+    """Resolve team names from any source to their canonical form.
+
+    Args:
+        names (array-like of str): Team names, abbreviations or aliases.
+        errors (str): ``"raise"`` to fail on unknown names, ``"coerce"`` to
+            leave them missing.
+
+    Returns:
+        Series: Canonical names, aligned with `names`.
+
+    Raises:
+        ValueError: A name is not in the registry and `errors` is ``"raise"``.
+
+    """
+    names = pd.Series(names)
+    if isinstance(names.dtype, pd.CategoricalDtype):
+        names = names.astype(object)
+    canonical = names.map(_TEAM_LOOKUP)
+
+    unknown = canonical.isna() & names.notna()
+    if errors == "raise" and unknown.any():
+        raise ValueError("Unknown teams: {}".format(sorted(set(names[unknown]))))
+
+    return canonical
+
+def encode_teams(names,
+                 errors="raise"):
+    """Return team names as a Categorical over ``TEAMS``.
+
+    Args:
+        names (array-like of str): Team names, abbreviations or aliases.
+        errors (str): As for :func:`canonical_teams`.
+
+    Returns:
+        Series: Categorical with dtype ``TEAM_DTYPE``.
+
+    """
+    return canonical_teams(names,
+                           errors=errors).astype(TEAM_DTYPE)
+
+def team_codes(names,
+               errors="raise"):
+    """Return the integer code of each team, -1 where it is unknown.
+
+    Args:
+        names (array-like of str): Team names, abbreviations or aliases.
+        errors (str): As for :func:`canonical_teams`.
+
+    Returns:
+        ndarray: Codes as ``int16``.
+
+    """
+    return encode_teams(names,
+                        errors=errors).cat.codes.to_numpy().astype(np.int16)
+
+def decode_teams(codes):
+    """Return integer team codes as a Categorical over ``TEAMS``.
+
+    Args:
+        codes (array-like of int): Codes as stored in the database.
+
+    Returns:
+        Series: Categorical with dtype ``TEAM_DTYPE``.
+
+    """
+    index = codes.index if isinstance(codes, pd.Series) else None
+    codes = np.asarray(codes, dtype=np.int64)
+    return pd.Series(pd.Categorical.from_codes(codes,
+                                               dtype=TEAM_DTYPE),
+                     index=index)
@@ -24,8 +24,12 @@ setup(name="gamblor",
       packages=["gamblor"],
       install_requires=[
           "luigi",
-          "sqlalchemy",
+          "sqlalchemy>=1.4",
           "pandas",
+          "requests",
+          "lxml",
+          "pyarrow",
+          "openpyxl",
       ],
       test_suite="nose.collector",
       tests_require=["nose"],
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""A local stand-in for the source sites, answering with scripted responses.
+
+Example:
+    Answer the first request for a page with a 503 and later ones with it::
+
+        with StandInServer() as server:
+            server.add("/2015.html", status=503)
+            server.add("/2015.html", body=b"<html></html>")
+            requests.get(server.url("/2015.html"))
+
+"""
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StandInServer(object):
+    """Serves each path from a queue of scripted responses.
+
+    The last response queued for a path is repeated once the others have
+    been used. A response with a ``status`` of ``None`` closes the
+    connection without answering.
+
+    Attributes:
+        requests (list of dict): ``path``, ``headers`` and monotonic
+            ``time`` of every request received, in order.
+
+    """
+    def __init__(self):
+        self.requests = []
+
+        self._responses = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                           self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        kwargs={"poll_interval": 0.05},
+                                        daemon=True)
+
+    def add(self,
+            path,
+            status=200,
+            body=b"",
+            headers=None):
+        """Queue a response to the next request for `path`."""
+        self._responses.setdefault(path, []).append((status, body, headers or {}))
+
+    def url(self,
+            path):
+        """Return the address of `path` on the server."""
+        host, port = self._server.server_address
+        return "http://{}:{}{}".format(host, port, path)
+
+    def requests_for(self,
+                     path):
+        """Return the requests received for `path`."""
+        return [request for request in self.requests if request["path"] == path]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self,
+                 exc_type,
+                 exc_value,
+                 traceback):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
+
+    def _respond(self,
+                 handler):
+        with self._lock:
+            self.requests.append({"path": handler.path,
+                                  "headers": dict(handler.headers),
+                                  "time": time.monotonic()})
+            queue = self._responses.get(handler.path, [(404, b"", {})])
+            status, body, headers = queue.pop(0) if len(queue) > 1 else queue[0]
+
+        if status is None:
+            handler.close_connection = True
+            return
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._respond(self)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
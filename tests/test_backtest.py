@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from gamblor.backtest import backtest, strategy_grid
+
+def matches_frame(seed=3,
+                  rounds=12,
+                  per_round=9):
+    """Return random priced matches with a few draws among the results."""
+    random = np.random.RandomState(seed)
+    count = rounds * per_round
+    probability = random.uniform(0.2, 0.8, count)
+    home_win = (random.uniform(size=count) < probability).astype(float)
+    home_win[random.choice(count, 6, replace=False)] = 0.5
+    margin = random.uniform(0.9, 1.1, count)
+    return pd.DataFrame({"MatchID": np.arange(count),
+                         "Year": 2015,
+                         "Round": np.repeat(np.arange(1, rounds + 1), per_round),
+                         "GameTime": pd.Timestamp("2015-04-01") + pd.to_timedelta(np.arange(count), unit="h"),
+                         "HomeOdds": np.round(margin / probability, 2),
+                         "AwayOdds": np.round(margin / (1 - probability), 2),
+                         "HomeWin": home_win,
+                         "HomeWinProbability": np.clip(probability + random.normal(0, 0.08, count), 0.05, 0.95)})
+
+def loop_bankrolls(matches_df,
+                   strategy,
+                   fraction,
+                   min_edge,
+                   bankroll=1.0):
+    """Settle one strategy a bet at a time, the way a punter would."""
+    current = bankroll
+    history = [current]
+    for _, round_df in matches_df.groupby("Round", sort=True):
+        bets = []
+        for match in round_df.itertuples(index=False):
+            home_edge = match.HomeWinProbability * match.HomeOdds - 1
+            away_edge = (1 - match.HomeWinProbability) * match.AwayOdds - 1
+            if home_edge >= away_edge:
+                edge, price, won = home_edge, match.HomeOdds, match.HomeWin == 1
+            else:
+                edge, price, won = away_edge, match.AwayOdds, match.HomeWin == 0
+            if edge <= min_edge:
+                continue
+            if strategy == "flat":
+                stake = fraction * bankroll
+            else:
+                stake = fraction * min(max(edge / (price - 1), 0), 1) * current
+            bets.append((stake, price, won))
+
+        total = sum(stake for stake, _, _ in bets)
+        available = max(current, 0)
+        scale = available / total if total > available else 1
+        for stake, price, won in bets:
+            # A draw loses the bet.
+            current += stake * scale * (price - 1 if won else -1)
+        history.append(current)
+    return history
+
+class BacktestTest(unittest.TestCase):
+    def test_bankrolls_match_a_per_bet_loop(self):
+        matches_df = matches_frame()
+        strategies_df = strategy_grid(kelly_fractions=[0.25, 1.0],
+                                      flat_stakes=[0.02, 0.2],
+                                      min_edges=[0.0, 0.05])
+
+        report = backtest(matches_df,
+                          strategies_df)
+
+        for position, strategy in enumerate(strategies_df.itertuples(index=False)):
+            expected = loop_bankrolls(matches_df,
+                                      strategy.Strategy,
+                                      strategy.Fraction,
+                                      strategy.MinEdge)
+            np.testing.assert_allclose(report.bankrolls[position], expected, rtol=1e-12)
+
+    def test_backed_side_loses_on_a_draw(self):
+        matches_df = pd.DataFrame({"MatchID": [1],
+                                   "Year": [2015],
+                                   "Round": [1],
+                                   "GameTime": [pd.Timestamp("2015-04-01")],
+                                   "HomeOdds": [2.0],
+                                   "AwayOdds": [2.0],
+                                   "HomeWin": [0.5],
+                                   "HomeWinProbability": [0.6]})
+
+        report = backtest(matches_df,
+                          strategy_grid(flat_stakes=[0.1]))
+
+        self.assertAlmostEqual(report.strategies["Bankroll"].iloc[0], 0.9)
+        self.assertEqual(report.calibration.loc[report.calibration["Matches"] > 0, "Observed"].tolist(), [0.5, 0.5])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+
+from gamblor.data_collection import SeasonParse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "benchmarks",
+                            "fixtures")
+
+def season_page(year):
+    with open(os.path.join(FIXTURES_DIR, "afl", "{}.html".format(year)), "rb") as page:
+        return page.read()
+
+class IterSeasonRowsTest(unittest.TestCase):
+    def test_engines_read_every_ladder_row(self):
+        # A ladder with one more row than there are teams in a season.
+        content = season_page(2016).replace(b"<td colspan=\"4\">Rd 1 Ladder</td></tr>\n",
+                                            b"<td colspan=\"4\">Rd 1 Ladder</td></tr>\n"
+                                            b"<tr><td>FI</td><td>0</td><td>0</td><td>0.0</td></tr>\n",
+                                            1)
+        ladder_df = SeasonParse(2016, content).round_ladder(1)
+        read_html_df = SeasonParse(2016, content, engine="read_html").round_ladder(1)
+
+        self.assertEqual(len(ladder_df), 19)
+        self.assertEqual(ladder_df["Team"].tolist(), read_html_df["Team"].tolist())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import time
+import unittest
+
+import requests
+
+from gamblor.fetch import Fetcher, HostRateLimiter
+from tests.stand_in import StandInServer
+
+class FetcherTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer().__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def fetcher(self,
+                **kwargs):
+        settings = {"host_interval": 0,
+                    "backoff": 0.05}
+        settings.update(kwargs)
+        return Fetcher(**settings)
+
+    def test_transient_status_is_retried_with_backoff(self):
+        self.server.add("/2015.html", status=503)
+        self.server.add("/2015.html", status=503)
+        self.server.add("/2015.html", body=b"season")
+
+        response = self.fetcher().get(self.server.url("/2015.html"))
+
+        self.assertEqual(response.content, b"season")
+        times = [request["time"] for request in self.server.requests_for("/2015.html")]
+        self.assertEqual(len(times), 3)
+        self.assertGreaterEqual(times[1] - times[0], 0.05)
+        self.assertGreaterEqual(times[2] - times[1], 0.1)
+
+    def test_last_failing_response_is_returned(self):
+        self.server.add("/2015.html", status=503)
+
+        response = self.fetcher(retries=2).get(self.server.url("/2015.html"))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.server.requests_for("/2015.html")), 3)
+
+    def test_other_error_status_is_not_retried(self):
+        self.server.add("/2015.html", status=404)
+
+        response = self.fetcher().get(self.server.url("/2015.html"))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(self.server.requests_for("/2015.html")), 1)
+
+    def test_retry_after_is_honoured(self):
+        self.server.add("/2015.html", status=429, headers={"Retry-After": "1"})
+        self.server.add("/2015.html", body=b"season")
+
+        response = self.fetcher(backoff=0).get(self.server.url("/2015.html"))
+
+        self.assertEqual(response.content, b"season")
+        times = [request["time"] for request in self.server.requests_for("/2015.html")]
+        self.assertGreaterEqual(times[1] - times[0], 1)
+
+    def test_connection_error_is_retried(self):
+        self.server.add("/2015.html", status=None)
+        self.server.add("/2015.html", body=b"season")
+
+        response = self.fetcher().get(self.server.url("/2015.html"))
+
+        self.assertEqual(response.content, b"season")
+        self.assertEqual(len(self.server.requests_for("/2015.html")), 2)
+
+    def test_connection_error_is_raised_after_last_retry(self):
+        self.server.add("/2015.html", status=None)
+
+        with self.assertRaises(requests.ConnectionError):
+            self.fetcher(retries=1).get(self.server.url("/2015.html"))
+        self.assertEqual(len(self.server.requests_for("/2015.html")), 2)
+
+    def test_requests_to_a_host_are_spaced(self):
+        urls = [self.server.url("/{}.html".format(year)) for year in range(2011, 2017)]
+        for url in urls:
+            self.server.add(url[url.index("/", 7):], body=b"season")
+
+        list(self.fetcher(max_workers=4, host_interval=0.1).fetch_many(urls))
+
+        times = sorted(request["time"] for request in self.server.requests)
+        gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+        # Allow for the delay between a slot opening and the server seeing it.
+        self.assertGreaterEqual(min(gaps), 0.08)
+
+    def test_fetch_many_returns_every_url_once(self):
+        urls = [self.server.url("/{}.html".format(year)) for year in range(2011, 2019)]
+        for year, url in zip(range(2011, 2019), urls):
+            self.server.add("/{}.html".format(year), body=str(year).encode())
+
+        results = list(self.fetcher(max_workers=3).fetch_many(urls))
+
+        self.assertEqual(sorted(url for url, _ in results), sorted(urls))
+        for url, response in results:
+            self.assertEqual(response.content, url[-9:-5].encode())
+
+    def test_map_completed_returns_every_item_once(self):
+        results = list(self.fetcher(max_workers=3).map_completed(lambda item: item * 2, range(20)))
+
+        self.assertEqual(sorted(results), [(item, item * 2) for item in range(20)])
+
+class HostRateLimiterTest(unittest.TestCase):
+    def test_hosts_are_spaced_independently(self):
+        limiter = HostRateLimiter(0.2)
+
+        start = time.monotonic()
+        limiter.wait("http://afltables.com/2015.html")
+        limiter.wait("http://betfair.com.au/odds.xlsx")
+        self.assertLess(time.monotonic() - start, 0.1)
+
+        limiter.wait("http://afltables.com/2016.html")
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import shutil
+import tempfile
+import time
+import unittest
+
+import requests
+
+from gamblor.http_cache import PageCache
+from tests.stand_in import StandInServer
+
+class PageCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.server = StandInServer().__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        shutil.rmtree(self.cache_dir)
+
+    def cache(self,
+              **kwargs):
+        return PageCache(cache_dir=self.cache_dir, **kwargs)
+
+    def test_fresh_entry_is_served_from_disk(self):
+        self.server.add("/2015.html", body=b"season")
+        cache = self.cache(ttl=60)
+
+        self.assertEqual(cache.get(self.server.url("/2015.html")), b"season")
+        self.assertEqual(cache.get(self.server.url("/2015.html")), b"season")
+        self.assertEqual(len(self.server.requests_for("/2015.html")), 1)
+
+    def test_stale_entry_is_revalidated(self):
+        self.server.add("/2015.html", body=b"season", headers={"ETag": '"v1"'})
+        self.server.add("/2015.html", status=304)
+        cache = self.cache(ttl=0)
+
+        self.assertEqual(cache.get(self.server.url("/2015.html")), b"season")
+        self.assertEqual(cache.get(self.server.url("/2015.html")), b"season")
+        revalidation = self.server.requests_for("/2015.html")[1]
+        self.assertEqual(revalidation["headers"].get("If-None-Match"), '"v1"')
+
+    def test_changed_page_replaces_entry(self):
+        self.server.add("/2015.html", body=b"season", headers={"ETag": '"v1"'})
+        self.server.add("/2015.html", body=b"updated", headers={"ETag": '"v2"'})
+        cache = self.cache(ttl=0)
+
+        cache.get(self.server.url("/2015.html"))
+        self.assertEqual(cache.get(self.server.url("/2015.html")), b"updated")
+
+    def test_stale_entry_is_served_on_error_status(self):
+        self.server.add("/2015.html", body=b"season")
+        self.server.add("/2015.html", status=503)
+        cache = self.cache(ttl=0)
+
+        cache.get(self.server.url("/2015.html"))
+        self.assertEqual(cache.get(self.server.url("/2015.html")), b"season")
+
+    def test_stale_entry_is_served_on_connection_error(self):
+        self.server.add("/2015.html", body=b"season")
+        self.server.add("/2015.html", status=None)
+        cache = self.cache(ttl=0)
+
+        cache.get(self.server.url("/2015.html"))
+        self.assertEqual(cache.get(self.server.url("/2015.html")), b"season")
+
+    def test_error_status_without_entry_raises(self):
+        self.server.add("/2015.html", status=503)
+
+        with self.assertRaises(requests.HTTPError):
+            self.cache().get(self.server.url("/2015.html"))
+
+    def test_not_modified_without_entry_raises(self):
+        self.server.add("/2015.html", status=304)
+        cache = self.cache()
+
+        with self.assertRaises(requests.HTTPError):
+            cache.get(self.server.url("/2015.html"),
+                      headers={"If-None-Match": '"v1"'})
+        self.assertEqual(cache._all_meta(), [])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for year in (2014, 2015, 2016):
+            self.server.add("/{}.html".format(year), body=str(year).encode() * 10)
+        cache = self.cache(ttl=60,
+                           max_bytes=80)
+
+        cache.get(self.server.url("/2014.html"))
+        time.sleep(0.01)
+        cache.get(self.server.url("/2015.html"))
+        time.sleep(0.01)
+        # Using 2014 again leaves 2015 the least recently used.
+        cache.get(self.server.url("/2014.html"))
+        time.sleep(0.01)
+        cache.get(self.server.url("/2016.html"))
+
+        cached = sorted(meta["url"] for meta in cache._all_meta())
+        self.assertEqual(cached, [self.server.url("/2014.html"), self.server.url("/2016.html")])
+        cache.get(self.server.url("/2015.html"))
+        self.assertEqual(len(self.server.requests_for("/2015.html")), 2)
+        self.assertEqual(len(self.server.requests_for("/2014.html")), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from gamblor.db import connect, dispose_all
+from gamblor.live import LivePoller
+from gamblor.pipeline import create_tables
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "benchmarks",
+                            "fixtures")
+
+# A season without odds, so polls only touch the scores and the ladder.
+YEAR = 2019
+
+class Pages(object):
+    """Serves whatever page the test last set, whatever the url."""
+    def __init__(self,
+                 content):
+        self.content = content
+
+    def get(self,
+            url):
+        return self.content
+
+# The synthetic 2016 page of benchmarks/fixtures, see its README.
+def season_page():
+    with open(os.path.join(FIXTURES_DIR, "afl", "2016.html"), "rb") as page:
+        return page.read().replace(b"-2016 ", "-{} ".format(YEAR).encode())
+
+class LivePollerTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.conn_info = "sqlite:///" + os.path.join(self.data_dir, "stats.db")
+        create_tables(self.conn_info)
+
+    def tearDown(self):
+        dispose_all()
+        shutil.rmtree(self.data_dir)
+
+    def stored(self,
+               query):
+        with connect(self.conn_info) as conn:
+            return pd.read_sql_query(query, conn)
+
+    def test_only_changed_rounds_are_stored(self):
+        pages = Pages(season_page())
+        poller = LivePoller([YEAR],
+                            conn_info=self.conn_info,
+                            cache=pages)
+
+        first = poller.poll()
+        self.assertEqual(len(first), 23)
+        self.assertEqual(poller.poll(), [])
+
+        # A new poller still finds nothing changed from the fingerprints.
+        pages.content = pages.content + b"\n"
+        self.assertEqual(LivePoller([YEAR], conn_info=self.conn_info, cache=pages).poll(), [])
+
+    def test_match_leaving_the_page_is_deleted(self):
+        content = season_page()
+        pages = Pages(content)
+        poller = LivePoller([YEAR],
+                            conn_info=self.conn_info,
+                            cache=pages)
+        poller.poll()
+        before = self.stored("SELECT * FROM Scores WHERE Round = 1")
+
+        # Drop the first match of round 1 from the page.
+        match = re.search(rb'<table><tr><td><a href="x">.*?</table>\n', content, re.S)
+        pages.content = content[:match.start()] + content[match.end():]
+        changed = poller.poll()
+
+        self.assertIn((YEAR, 1), changed)
+        after = self.stored("SELECT * FROM Scores WHERE Round = 1")
+        self.assertEqual(len(after), len(before) - 1)
+        removed = set(before["MatchID"]) - set(after["MatchID"])
+        self.assertEqual(len(removed), 1)
+        ladder = self.stored("SELECT * FROM Ladder WHERE Round = 1")
+        self.assertEqual(ladder["GamesPlayed"].sum(), 2 * (len(after) - (after["AwayTeam"] == 0).sum()))
+
+if __name__ == "__main__":
+    unittest.main()
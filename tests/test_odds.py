@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+import pandas as pd
+
+from gamblor.odds import OddsIndex
+
+def odds_frame(markets):
+    """Return store rows for ``(home, away, settle date, home price, away price)`` markets."""
+    rows = []
+    for home, away, settled, home_price, away_price in markets:
+        for team, price in ((home, home_price), (away, away_price)):
+            rows.append({"Year": 2015,
+                         "HomeTeam": home,
+                         "AwayTeam": away,
+                         "Team": team,
+                         "Odds": price,
+                         "SettleDate": pd.Timestamp(settled) if settled else pd.NaT})
+    return pd.DataFrame(rows)
+
+class OddsIndexTest(unittest.TestCase):
+    def test_market_settled_on_match_day_or_after(self):
+        index = OddsIndex(2015, odds_frame([(1, 2, "2015-04-04", 1.5, 2.6),
+                                            (3, 4, "2015-04-05", 1.8, 2.0)]))
+
+        self.assertEqual(index.lookup(1, 2, pd.Timestamp("2015-04-04 14:10")), (1.5, 2.6))
+        self.assertEqual(index.lookup(3, 4, pd.Timestamp("2015-04-04 19:40")), (1.8, 2.0))
+
+    def test_late_settled_market_falls_back_to_fixture(self):
+        index = OddsIndex(2015, odds_frame([(1, 2, "2015-04-20", 1.5, 2.6)]))
+
+        self.assertEqual(index.lookup(1, 2, pd.Timestamp("2015-04-04 14:10")), (1.5, 2.6))
+
+    def test_repeated_fixture_needs_its_date(self):
+        index = OddsIndex(2015, odds_frame([(1, 2, "2015-04-04", 1.5, 2.6),
+                                            (1, 2, "2015-08-01", 2.1, 1.7)]))
+
+        self.assertEqual(index.lookup(1, 2, pd.Timestamp("2015-08-01 13:45")), (2.1, 1.7))
+        self.assertIsNone(index.lookup(1, 2, pd.Timestamp("2015-06-06 13:45")))
+
+    def test_undated_workbook(self):
+        index = OddsIndex(2015, odds_frame([(1, 2, None, 1.5, 2.6)]))
+
+        self.assertEqual(index.lookup(1, 2, pd.Timestamp("2015-04-04 14:10")), (1.5, 2.6))
+        self.assertIsNone(index.lookup(2, 1, pd.Timestamp("2015-04-04 14:10")))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+import sqlalchemy
+
+from gamblor.db import dispose_all, get_engine
+from gamblor.pipeline import create_tables
+
+class CreateTablesTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.work_dir = tempfile.mkdtemp()
+        self.data_dir = tempfile.mkdtemp()
+        os.chdir(self.work_dir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        dispose_all()
+        shutil.rmtree(self.work_dir)
+        shutil.rmtree(self.data_dir)
+
+    def test_every_table_goes_to_the_given_database(self):
+        conn_info = "sqlite:///" + os.path.join(self.data_dir, "stats.db")
+
+        create_tables(conn_info)
+
+        tables = sqlalchemy.inspect(get_engine(conn_info)).get_table_names()
+        self.assertIn("table_updates", tables)
+        self.assertIn("Scores", tables)
+        self.assertEqual(os.listdir(self.work_dir), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+
+from gamblor import ODD_SEASON_BYE_POINTS, WIN_POINTS
+from gamblor.data_collection import SeasonParse
+from gamblor.db import bulk_insert, dispose_all, get_engine, scores_db_frame
+from gamblor.ladder import season_ladders
+from gamblor.pipeline import create_tables
+from gamblor.simulate import simulate_season
+from gamblor.teams import decode_teams
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "benchmarks",
+                            "fixtures")
+
+# A season of 17 teams, so someone has a bye every round.
+YEAR = 2011
+PLAYED = 12
+
+class SimulateSeasonTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.conn_info = "sqlite:///" + os.path.join(self.data_dir, "stats.db")
+        self.cache_dir = os.path.join(self.data_dir, "simulations")
+        create_tables(self.conn_info)
+
+        with open(os.path.join(FIXTURES_DIR, "afl", "{}.html".format(YEAR)), "rb") as page:
+            self.scores_df = scores_db_frame(SeasonParse(YEAR, page.read()).season_scores())
+        self.fixtures_df = self.remaining(PLAYED)
+
+        engine = get_engine(self.conn_info)
+        scores = sqlalchemy.Table("Scores",
+                                  sqlalchemy.MetaData(),
+                                  autoload_with=engine)
+        with engine.begin() as conn:
+            bulk_insert(conn,
+                        scores,
+                        self.scores_df[self.scores_df["Round"] <= PLAYED])
+
+    def tearDown(self):
+        dispose_all()
+        shutil.rmtree(self.data_dir)
+
+    def remaining(self,
+                  rnd,
+                  byes=False):
+        remaining_df = self.scores_df[self.scores_df["Round"] > rnd]
+        if not byes:
+            remaining_df = remaining_df[remaining_df["AwayTeam"] != 0]
+        fixtures_df = remaining_df[["HomeTeam", "AwayTeam"]].reset_index(drop=True)
+        fixtures_df["ExpectedMargin"] = 0.0
+        return fixtures_df
+
+    def simulate(self,
+                 fixtures_df,
+                 rnd=PLAYED):
+        return simulate_season(YEAR,
+                               rnd,
+                               fixtures_df,
+                               simulations=200,
+                               workers=1,
+                               conn_info=self.conn_info,
+                               cache_dir=self.cache_dir)
+
+    def test_percentage_is_the_ladders(self):
+        # After round 1 the team that had the bye has conceded nothing.
+        ladder_df = season_ladders(self.scores_df[self.scores_df["Round"] <= 1])
+        self.assertIn(0, ladder_df["Percentage"].tolist())
+
+        simulated_df = self.simulate(self.fixtures_df.iloc[:0],
+                                     rnd=1)
+
+        expected = pd.Series(ladder_df["Percentage"].to_numpy(),
+                             index=decode_teams(ladder_df["Team"]).astype(str))
+        simulated = pd.Series(simulated_df["MeanPercentage"].to_numpy(),
+                              index=simulated_df["Team"].astype(str))
+        np.testing.assert_allclose(simulated[expected.index].round(1), expected)
+
+    def test_remaining_byes_earn_points(self):
+        fixtures_df = self.remaining(PLAYED,
+                                     byes=True)
+        byes = int((fixtures_df["AwayTeam"] == 0).sum())
+        self.assertGreater(byes, 0)
+        ladder_df = season_ladders(self.scores_df[self.scores_df["Round"] <= PLAYED])
+        played_points = ladder_df.loc[ladder_df["Round"] == PLAYED, "Points"].sum()
+
+        simulated_df = self.simulate(fixtures_df)
+
+        # Every match hands out a win's worth of points between its teams.
+        expected = played_points + WIN_POINTS * (len(fixtures_df) - byes) + ODD_SEASON_BYE_POINTS * byes
+        self.assertAlmostEqual(simulated_df["MeanPoints"].sum(), expected)
+
+    def test_cache_is_keyed_on_the_fixtures(self):
+        even_df = self.simulate(self.fixtures_df)
+        home_df = self.fixtures_df.copy()
+        home_df["ExpectedMargin"] = 30.0
+        favoured_df = self.simulate(home_df)
+
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        self.assertFalse(even_df["MeanPoints"].sort_values().reset_index(drop=True).equals(
+                         favoured_df["MeanPoints"].sort_values().reset_index(drop=True)))
+        pd.testing.assert_frame_equal(self.simulate(self.fixtures_df), even_df)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+if __name__ == "__main__":
+    unittest.main()